@@ -0,0 +1,114 @@
+import asyncio
+import discord
+from datetime import datetime
+from discord.ext import commands
+
+class Database(commands.Cog):
+    """Admin commands for database maintenance"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_check(self, ctx):
+        # Backups and statistics need the SQLite database
+        if self.bot.get_cog('FileManager').backups is None:
+            await ctx.send("Database commands are not available with the in-memory database backend.")
+            return False
+        return True
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def backup(self, ctx):
+        """Take a database backup now (Admin only)"""
+        file_manager = self.bot.get_cog('FileManager')
+        await ctx.send("Backing up the database...")
+        try:
+            path = await asyncio.to_thread(file_manager.backups.create)
+        except Exception as e:
+            print(f"Error backing up the database: {e}")
+            await ctx.send(f"Backup failed: {e}")
+            return
+        await ctx.send(f"Backup written to `{path}`.")
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def backups(self, ctx):
+        """List the available database backups (Admin only)"""
+        file_manager = self.bot.get_cog('FileManager')
+        backups = await asyncio.to_thread(file_manager.backups.list)
+        if not backups:
+            await ctx.send("There are no backups yet.")
+            return
+
+        embed = discord.Embed(title="💾 Database Backups", color=discord.Color.blue())
+        for backup in backups:
+            embed.add_field(
+                name=backup['name'],
+                value=f"{backup['created'].strftime('%Y-%m-%d %H:%M')} UTC - {backup['size'] / 1024:.0f} KB",
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def restorebackup(self, ctx, name: str):
+        """Replace the database with a backup (Admin only)"""
+        file_manager = self.bot.get_cog('FileManager')
+        try:
+            await file_manager.async_db.run(file_manager.restore_backup, name)
+        except FileNotFoundError:
+            await ctx.send(f"There is no backup named `{name}`. Use `{self.bot.command_prefix}backups` to list them.")
+            return
+        except Exception as e:
+            print(f"Error restoring backup {name}: {e}")
+            await ctx.send(f"Restore failed, the database was not changed: {e}")
+            return
+        await ctx.send(f"Database restored from `{name}`.")
+
+    @commands.command()
+    @commands.has_permissions(administrator=True)
+    async def dbstats(self, ctx, action: str = None):
+        """Show per-method database statistics, or turn them on, off or reset them (Admin only)"""
+        stats = self.bot.get_cog('FileManager').db.stats
+        prefix = self.bot.command_prefix
+        if action == 'on':
+            stats.enable()
+            await ctx.send("Database statistics are now being recorded.")
+            return
+        if action == 'off':
+            stats.disable()
+            await ctx.send("Database statistics are no longer being recorded.")
+            return
+        if action == 'reset':
+            stats.reset()
+            await ctx.send("Database statistics cleared.")
+            return
+        if action is not None:
+            await ctx.send(f"Usage: `{prefix}dbstats [on|off|reset]`")
+            return
+
+        report = stats.snapshot()
+        if not report:
+            hint = "" if stats.enabled else f" Turn recording on with `{prefix}dbstats on`."
+            await ctx.send(f"No database calls recorded yet.{hint}")
+            return
+
+        since = datetime.utcfromtimestamp(stats.since).strftime('%Y-%m-%d %H:%M')
+        embed = discord.Embed(
+            title="📈 Database Statistics",
+            description=f"Recording is {'on' if stats.enabled else 'off'}. Slowest methods since {since} UTC:",
+            color=discord.Color.blue()
+        )
+        # Discord allows 25 fields per embed
+        for name, method in list(report.items())[:15]:
+            embed.add_field(
+                name=name,
+                value=f"{method['calls']} calls, {method['errors']} errors - "
+                      f"mean {method['mean_ms']:.2f} ms, p95 ≤ {method['p95_ms']:.2f} ms, max {method['max_ms']:.1f} ms\n"
+                      f"{method['rows']} rows, {method['commits']} commits ({method['commit_ms']:.1f} ms)",
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Database(bot))
@@ -73,6 +73,10 @@ class HelpCog(commands.Cog):
                       f"{prefix}remove <user> <amount> - Remove points from user\n"
                       f"{prefix}addcoin <user> <amount> - Give fapcoins to user\n"
                       f"{prefix}givesuccubus <user> <succubus> - Give succubus to user\n"
+                      f"{prefix}backup - Back up the database now\n"
+                      f"{prefix}backups - List database backups\n"
+                      f"{prefix}restorebackup <name> - Restore a database backup\n"
+                      f"{prefix}dbstats [on|off|reset] - Database call statistics\n"
                       "```",
                 inline=False
             )
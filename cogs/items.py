@@ -3,6 +3,7 @@ from discord.ext import commands
 from datetime import datetime, timedelta
 import random
 from utils.succubus.manager import SuccubusManager
+from utils.coin_ledger import CoinReason
 
 class Items(commands.Cog):
     def __init__(self, bot):
@@ -13,6 +14,30 @@ class Items(commands.Cog):
     def is_shield_active(self, user_id):
         return user_id in self.shield_active and datetime.now() <= self.shield_active[user_id]
 
+    async def consume_item(self, user_id, item_name, points_to_remove=0):
+        """
+        Use up one unit of an item, optionally removing points from the score,
+        with a single commit.
+        
+        Args:
+            user_id (str): The Discord user ID
+            item_name (str): The item to consume
+            points_to_remove (int): Points to remove from the user's score
+            
+        Returns:
+            bool: True if the item was consumed, False if the user has none
+        """
+        file_manager = self.bot.get_cog('FileManager')
+        async with file_manager.async_db.transaction() as tx:
+            items = await tx.get_user_items(user_id)
+            if items.get(item_name, 0) <= 0:
+                return False
+            await tx.update_item_quantity(user_id, item_name, -1)
+            if points_to_remove:
+                # min_score ensures that the score does not go negative
+                await tx.add_user_score(user_id, score=-points_to_remove, min_score=0)
+        return True
+
     @commands.command(aliases=["ft","trocajusta"])
     async def fairtrade(self, ctx):
         file_manager = self.bot.get_cog('FileManager')
@@ -20,25 +45,26 @@ class Items(commands.Cog):
         username = ctx.author.name
         
         # Check if Selphira is active
-        active_succubus_id = file_manager.db.get_active_succubus(user_id)
+        active_succubus_id = await file_manager.async_db.get_active_succubus(user_id)
         if active_succubus_id != "selphira":
             await ctx.send(f"{username}, you need to have Selphira active to use this command!")
             return
         
-        # Check if the user has enough fapcoins
-        fapcoins = file_manager.db.get_fapcoins(user_id)
-        if fapcoins < 10:
+        # Check the balance, pay and remove the point with a single commit
+        async with file_manager.async_db.transaction() as tx:
+            # Check if the user has enough fapcoins
+            traded = await tx.get_fapcoins(user_id) >= 10
+            if traded:
+                # Deduct 10 fapcoins
+                await tx.update_fapcoins(user_id, -10, CoinReason.FAIR_TRADE)
+                
+                # Remove 1 score, without letting it go negative
+                await tx.add_user_score(user_id, score=-1, min_score=0)
+        
+        if not traded:
             await ctx.send(f"{username}, you need at least 10 fapcoins to use this command!")
             return
         
-        # Deduct 10 fapcoins
-        file_manager.db.update_fapcoins(user_id, -10)
-        
-        # Remove 1 score
-        user_data = file_manager.db.get_user(user_id)
-        new_score = max(0, user_data['score'] - 1)  # Ensures that the score does not go negative
-        file_manager.db.update_user_score(user_id, user_data['faps'], new_score)
-        
         await ctx.send(f"{username}, You spent 10 fapcoins and removed 1 point from your score!")
 
     @commands.command()
@@ -48,9 +74,9 @@ class Items(commands.Cog):
         username = ctx.author.name
         
         # Ensure user exists in database
-        file_manager.db.create_or_update_user(user_id, username)
+        await file_manager.async_db.create_or_update_user(user_id, username)
         
-        user_items = file_manager.db.get_user_items(user_id)
+        user_items = await file_manager.async_db.get_user_items(user_id)
         if user_items:
             embed = discord.Embed(title=f'{username}\'s Items', color=discord.Color.green())
             for item, quantity in user_items.items():
@@ -65,21 +91,16 @@ class Items(commands.Cog):
         user_id = str(ctx.author.id)
         username = ctx.author.name
         
-        items = file_manager.db.get_user_items(user_id)
-        if items.get("Redemption", 0) > 0:
-            # Check item failure
-            if self.succubus_manager.check_item_failure(user_id):
+        # Roll the burden and the modifier first so the item is consumed with one commit
+        failed = await self.succubus_manager.check_item_failure(user_id)
+        # Apply effectiveness modifier
+        original_points = 1
+        points_to_remove = await self.succubus_manager.get_modified_item_effect(user_id, "Redemption", original_points)
+        
+        if await self.consume_item(user_id, "Redemption", 0 if failed else points_to_remove):
+            if failed:
                 await ctx.send(f'{username}, your Redemption failed to work due to Ravienna\'s burden!')
-                file_manager.db.update_item_quantity(user_id, "Redemption", -1)
                 return
-                
-            file_manager.db.update_item_quantity(user_id, "Redemption", -1)
-            user_data = file_manager.db.get_user(user_id)
-            # Apply effectiveness modifier
-            original_points = 1
-            points_to_remove = self.succubus_manager.get_modified_item_effect(user_id, "Redemption", original_points)
-            new_score = max(0, user_data['score'] - points_to_remove)
-            file_manager.db.update_user_score(user_id, user_data['faps'], new_score)
             
             await ctx.send(f'{username}, you used a Redemption and removed {points_to_remove} point(s) from your Score.')
         else:
@@ -91,21 +112,16 @@ class Items(commands.Cog):
         user_id = str(ctx.author.id)
         username = ctx.author.name
         
-        items = file_manager.db.get_user_items(user_id)
-        if items.get("Supreme Redemption", 0) > 0:
-            # Check item failure
-            if self.succubus_manager.check_item_failure(user_id):
+        # Roll the burden and the modifier first so the item is consumed with one commit
+        failed = await self.succubus_manager.check_item_failure(user_id)
+        # Apply effectiveness modifier
+        original_points = 5
+        points_to_remove = await self.succubus_manager.get_modified_item_effect(user_id, "Supreme Redemption", original_points)
+        
+        if await self.consume_item(user_id, "Supreme Redemption", 0 if failed else points_to_remove):
+            if failed:
                 await ctx.send(f'{username}, your Supreme Redemption failed to work due to Ravienna\'s burden!')
-                file_manager.db.update_item_quantity(user_id, "Supreme Redemption", -1)
                 return
-                
-            file_manager.db.update_item_quantity(user_id, "Supreme Redemption", -1)
-            user_data = file_manager.db.get_user(user_id)
-            # Apply effectiveness modifier
-            original_points = 5
-            points_to_remove = self.succubus_manager.get_modified_item_effect(user_id, "Supreme Redemption", original_points)
-            new_score = max(0, user_data['score'] - points_to_remove)
-            file_manager.db.update_user_score(user_id, user_data['faps'], new_score)
             
             await ctx.send(f'{username}, you used a Supreme Redemption and removed {points_to_remove} points from your Score.')
         else:
@@ -117,18 +133,17 @@ class Items(commands.Cog):
         user_id = str(ctx.author.id)
         username = ctx.author.name
         
-        items = file_manager.db.get_user_items(user_id)
-        if items.get("Fap Shield", 0) > 0:
-            # Check item failure
-            if self.succubus_manager.check_item_failure(user_id):
+        # Roll the burden and the modifier first so the item is consumed with one commit
+        failed = await self.succubus_manager.check_item_failure(user_id)
+        # Apply effectiveness modifier
+        original_hours = 1
+        modified_hours = await self.succubus_manager.get_modified_item_effect(user_id, "Fap Shield", original_hours)
+        
+        if await self.consume_item(user_id, "Fap Shield"):
+            if failed:
                 await ctx.send(f'{username}, your Fap Shield failed to work due to Ravienna\'s burden!')
-                file_manager.db.update_item_quantity(user_id, "Fap Shield", -1)
                 return
-                
-            file_manager.db.update_item_quantity(user_id, "Fap Shield", -1)
-            # Apply effectiveness modifier
-            original_hours = 1
-            modified_hours = self.succubus_manager.get_modified_item_effect(user_id, "Fap Shield", original_hours)
+            
             self.shield_active[user_id] = datetime.now() + timedelta(hours=modified_hours)
             await ctx.send(f'{username}, you activated the Fap Shield! For {modified_hours} hours, your points won\'t increase your score.')
         else:
@@ -140,18 +155,17 @@ class Items(commands.Cog):
         user_id = str(ctx.author.id)
         username = ctx.author.name
         
-        items = file_manager.db.get_user_items(user_id)
-        if items.get("Ultra Fap Shield", 0) > 0:
-            # Check item failure
-            if self.succubus_manager.check_item_failure(user_id):
+        # Roll the burden and the modifier first so the item is consumed with one commit
+        failed = await self.succubus_manager.check_item_failure(user_id)
+        # Apply effectiveness modifier
+        original_hours = 2
+        modified_hours = await self.succubus_manager.get_modified_item_effect(user_id, "Ultra Fap Shield", original_hours)
+        
+        if await self.consume_item(user_id, "Ultra Fap Shield"):
+            if failed:
                 await ctx.send(f'{username}, your Ultra Fap Shield failed to work due to Ravienna\'s burden!')
-                file_manager.db.update_item_quantity(user_id, "Ultra Fap Shield", -1)
                 return
-                
-            file_manager.db.update_item_quantity(user_id, "Ultra Fap Shield", -1)
-            # Apply effectiveness modifier
-            original_hours = 2
-            modified_hours = self.succubus_manager.get_modified_item_effect(user_id, "Ultra Fap Shield", original_hours)
+            
             self.shield_active[user_id] = datetime.now() + timedelta(hours=modified_hours)
             await ctx.send(f'{username}, you activated the Ultra Fap Shield! For {modified_hours} hours, your points won\'t increase your score.')
         else:
@@ -164,23 +178,28 @@ class Items(commands.Cog):
         user_id = str(ctx.author.id)
         username = ctx.author.name
 
-        items = file_manager.db.get_user_items(user_id)
-        if items.get("Faproll", 0) > 0:
-            file_manager.db.update_item_quantity(user_id, "Faproll", -1)
+        probabilities = file_manager.get_probabilities()
+        # Filter only item probabilities (excluding ritual_probabilities)
+        item_probabilities = {k: v for k, v in probabilities.items() if k != 'ritual_probabilities'}
+        
+        items_list = list(item_probabilities.keys())
+        weights = list(item_probabilities.values())
+        
+        result = random.choices(items_list, weights=weights, k=1)[0]
 
-            probabilities = file_manager.get_probabilities()
-            # Filter only item probabilities (excluding ritual_probabilities)
-            item_probabilities = {k: v for k, v in probabilities.items() if k != 'ritual_probabilities'}
-            
-            items_list = list(item_probabilities.keys())
-            weights = list(item_probabilities.values())
-            
-            result = random.choices(items_list, weights=weights, k=1)[0]
+        # Spend the Faproll and hand out the prize with a single commit
+        async with file_manager.async_db.transaction() as tx:
+            items = await tx.get_user_items(user_id)
+            rolled = items.get("Faproll", 0) > 0
+            if rolled:
+                await tx.update_item_quantity(user_id, "Faproll", -1)
+                if result != "Nothing":
+                    await tx.update_item_quantity(user_id, result, 1)
 
+        if rolled:
             if result == "Nothing":
                 await ctx.send(f'🎰 {username} spun the slot machine and... won nothing. 😞')
             else:
-                file_manager.db.update_item_quantity(user_id, result, 1)
                 await ctx.send(f'🎰 {username} won **{result}** {file_manager.store_items[result]["emoji"]}!')
         else:
             await ctx.send(f'{username}, you don\'t have any Faproll. Buy one from the store using `{prefix}store`.')
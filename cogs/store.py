@@ -4,9 +4,10 @@ from discord.ui import View, Button
 from datetime import datetime, timedelta
 from utils.succubus.manager import SuccubusManager
 from utils.succubus.trinerva import TrinervaHandler
+from utils.coin_ledger import CoinReason
 
 class PurchaseButton(Button):
-    def __init__(self, item, item_info, user_id, bot):
+    def __init__(self, item, item_info, cost, user_id, bot):
         self.item = item
         self.bot = bot
         self.user_id = user_id
@@ -14,12 +15,8 @@ class PurchaseButton(Button):
         # Get the file manager
         self.file_manager = bot.get_cog('FileManager')
         
-        # Get the succubus manager
-        self.succubus_manager = SuccubusManager(bot)
-        
-        # Get the original cost and apply any active succubus effects
-        original_cost = item_info["cost"]
-        self.cost = self.succubus_manager.get_modified_price(user_id, original_cost)
+        # Cost with any active succubus effects already applied by the store command
+        self.cost = cost
         
         super().__init__(
             label=f"{item}",
@@ -37,12 +34,17 @@ class PurchaseButton(Button):
         username = interaction.user.name
         item = self.item
 
-        # Ensure user exists in database
-        file_manager.db.create_or_update_user(user_id, username)
+        # Check the balance, debit and add the item with a single commit
+        async with file_manager.async_db.transaction() as tx:
+            # Ensure user exists in database
+            await tx.create_or_update_user(user_id, username)
+            
+            purchased = await tx.get_fapcoins(user_id) >= self.cost
+            if purchased:
+                await tx.update_fapcoins(user_id, -self.cost, CoinReason.PURCHASE)
+                await tx.update_item_quantity(user_id, item, 1)
         
-        if file_manager.db.get_fapcoins(user_id) >= self.cost:
-            file_manager.db.update_fapcoins(user_id, -self.cost)
-            file_manager.db.update_item_quantity(user_id, item, 1)
+        if purchased:
             await interaction.response.send_message(
                 f'{username} successfully bought {item} {file_manager.store_items[item]["emoji"]} for {self.cost} Fapcoins!',
                 ephemeral=True
@@ -54,10 +56,10 @@ class PurchaseButton(Button):
             )
 
 class StoreView(View):
-    def __init__(self, store_items, user_id, bot):
+    def __init__(self, store_items, prices, user_id, bot):
         super().__init__(timeout=120)  # 2 minute timeout
         for item, info in store_items.items():
-            self.add_item(PurchaseButton(item, info, user_id, bot))
+            self.add_item(PurchaseButton(item, info, prices[item], user_id, bot))
 
 class Store(commands.Cog):
     def __init__(self, bot):
@@ -71,7 +73,7 @@ class Store(commands.Cog):
         
         # Check if user has Astarielle active
         has_astarielle = False
-        active_succubus_id = file_manager.db.get_active_succubus(user_id)
+        active_succubus_id = await file_manager.async_db.get_active_succubus(user_id)
         if active_succubus_id == "astarielle":
             has_astarielle = True
         
@@ -81,9 +83,11 @@ class Store(commands.Cog):
         if has_astarielle:
             embed.description = "⚠️ Prices are increased by 20% due to Astarielle's burden!"
         
+        prices = {}
         for item, info in file_manager.store_items.items():
             original_cost = info["cost"]
-            modified_cost = self.succubus_manager.get_modified_price(user_id, original_cost)
+            modified_cost = await self.succubus_manager.get_modified_price(user_id, original_cost)
+            prices[item] = modified_cost
             
             # Show price difference if Astarielle is active
             price_text = f"Cost: {modified_cost} Fapcoins"
@@ -95,7 +99,7 @@ class Store(commands.Cog):
                 value=f'{info["description"]}\n{price_text}',
                 inline=False
             )
-        await ctx.send(embed=embed, view=StoreView(file_manager.store_items, user_id, self.bot))
+        await ctx.send(embed=embed, view=StoreView(file_manager.store_items, prices, user_id, self.bot))
 
     @commands.command()
     async def daily(self, ctx):
@@ -104,35 +108,38 @@ class Store(commands.Cog):
         username = ctx.author.name
         now = datetime.utcnow()  # Use UTC time for consistency
         
-        # Ensure user exists in database
-        file_manager.db.create_or_update_user(user_id, username)
-        
         # Get the succubus handler for the user
-        handler = self.succubus_manager.get_handler_for_user(user_id)
+        handler = await self.succubus_manager.get_handler_for_user(user_id)
         
         # Check if Mimi is active for the user
         if handler and handler.get_succubus_id() == "mimi":
+            await file_manager.async_db.create_or_update_user(user_id, username)
             await ctx.send(f"{username}, you cannot use !daily manually while Mimi is active. Your daily reward is granted automatically!")
             return
         
         # Get the daily cooldown based on active succubus
         daily_cooldown = handler.get_daily_cooldown() if handler else 12
         
-        last_daily = file_manager.db.get_last_daily(user_id)
-        if not last_daily or (now - last_daily) >= timedelta(hours=daily_cooldown):
-            # Check if Trinerva's ability grants double reward
-            if handler and isinstance(handler, TrinervaHandler) and handler.check_double_reward():
-                reward = 2
-            else:
-                reward = 1
-                
-            file_manager.db.update_fapcoins(user_id, reward)
-            file_manager.db.update_daily_timestamp(user_id)
-            coins = file_manager.db.get_fapcoins(user_id)
-            
+        # Check if Trinerva's ability grants double reward
+        if handler and isinstance(handler, TrinervaHandler) and handler.check_double_reward():
+            reward = 2
+        else:
+            reward = 1
+        
+        # Check the cooldown and grant the reward with a single commit, so two
+        # concurrent !daily calls can never both be paid
+        async with file_manager.async_db.transaction() as tx:
+            # Ensure user exists in database
+            await tx.create_or_update_user(user_id, username)
+            last_daily = await tx.get_last_daily(user_id)
+            claimed = not last_daily or (now - last_daily) >= timedelta(hours=daily_cooldown)
+            if claimed:
+                coins = await tx.add_fapcoins(user_id, reward, CoinReason.DAILY)
+                await tx.update_daily_timestamp(user_id, daily_cooldown)
+        
+        if claimed:
             # Add note about Astarielle if active
-            active_succubus_id = file_manager.db.get_active_succubus(user_id)
-            if active_succubus_id == "astarielle":
+            if handler and handler.get_succubus_id() == "astarielle":
                 await ctx.send(f'{username}, you received {reward} Fapcoin! 💰 Total: {coins} Fapcoins.\n'
                               f'*Astarielle\'s ability reduced your daily cooldown to {daily_cooldown} hours.*')
             else:
@@ -141,29 +148,6 @@ class Store(commands.Cog):
             time_since_last = now - last_daily
             remaining_time = timedelta(hours=daily_cooldown) - time_since_last
             
-            # Make sure remaining time is positive
-            if remaining_time.total_seconds() <= 0:
-                # If we get here, there's a timezone issue - allow claiming daily
-                if handler and isinstance(handler, TrinervaHandler) and handler.check_double_reward():
-                    reward = 2
-                else:
-                    reward = 1
-                file_manager.db.update_fapcoins(user_id, reward)
-                file_manager.db.update_daily_timestamp(user_id)
-                coins = file_manager.db.get_fapcoins(user_id)
-                
-                # Log the timezone issue
-                print(f"WARNING: Timezone issue detected for user {user_id}, allowing daily claim")
-                
-                # Add note about Astarielle if active
-                active_succubus_id = file_manager.db.get_active_succubus(user_id)
-                if active_succubus_id == "astarielle":
-                    await ctx.send(f'{username}, you received {reward} Fapcoin! 💰 Total: {coins} Fapcoins.\n'
-                                  f'*Astarielle\'s ability reduced your daily cooldown to {daily_cooldown} hours.*')
-                else:
-                    await ctx.send(f'{username}, you received {reward} Fapcoin! 💰 Total: {coins} Fapcoins.')
-                return
-            
             # Extract hours and minutes
             total_seconds = int(remaining_time.total_seconds())
             hours, remainder = divmod(total_seconds, 3600)
@@ -182,7 +166,7 @@ class Store(commands.Cog):
         file_manager = self.bot.get_cog('FileManager')
         user_id = str(ctx.author.id)
         username = ctx.author.name
-        coins = file_manager.db.get_fapcoins(user_id)
+        coins = await file_manager.async_db.get_fapcoins(user_id)
         await ctx.send(f'{username}, you have {coins} Fapcoins.')
 
     @commands.command()
@@ -197,13 +181,10 @@ class Store(commands.Cog):
         user_id = str(user.id)
         
         # Ensure user exists in database
-        file_manager.db.create_or_update_user(user_id, user.name)
-        
-        # Add Fapcoins
-        file_manager.db.update_fapcoins(user_id, amount)
+        await file_manager.async_db.create_or_update_user(user_id, user.name)
         
-        # Get updated balance
-        new_balance = file_manager.db.get_fapcoins(user_id)
+        # Add Fapcoins and get the updated balance
+        new_balance = await file_manager.async_db.add_fapcoins(user_id, amount, CoinReason.ADMIN)
         
         embed = discord.Embed(
             title="💰 Fapcoins Added!",
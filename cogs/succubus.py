@@ -28,42 +28,45 @@ class Succubus(commands.Cog):
                 print("ERROR: FileManager not found, cannot initialize succubus")
                 return
                 
+            # Register the timed effects, then load the saved jobs due soon with one indexed query
+            for handler in self.succubus_manager.handlers.values():
+                handler.register_jobs(file_manager.scheduler)
+            await file_manager.scheduler.start()
+            
             # Get all users with active succubus
-            conn, cur = file_manager.db.get_connection()
-            cur.execute("SELECT user_id, active_succubus FROM users WHERE active_succubus IS NOT NULL")
-            users_with_active = cur.fetchall()
-            conn.close()
+            users_with_active = await file_manager.async_db.get_users_with_active_succubus()
             
             print(f"Initializing {len(users_with_active)} active succubus...")
             
-            # Initialize each active succubus
+            # Load their rows with a few batched queries instead of one per user,
+            # so the handlers' first is_active_for_user checks hit the cache
+            await file_manager.async_db.get_users_many([user_data.user_id for user_data in users_with_active])
+            
+            # Jobs saved before the restart keep their times; this only creates the missing ones
             for user_data in users_with_active:
-                user_id = user_data['user_id']
-                succubus_id = user_data['active_succubus']
+                user_id = user_data.user_id
+                succubus_id = user_data.active_succubus
                 
                 # Get the handler
                 handler = self.succubus_manager.handlers.get(succubus_id)
                 if handler:
-                    # Get the user object
-                    user = await self.bot.fetch_user(int(user_id))
-                    if user:
-                        # Create a context-like object with just the necessary attributes
-                        ctx = type('obj', (object,), {
-                            'author': user,
-                            'bot': self.bot,
-                            'guild': None,
-                            'channel': None,
-                            'message': None,
-                            'command': None
-                        })
-                        
-                        # Apply ability and burden
-                        try:
-                            await handler.apply_ability(ctx)
-                            await handler.apply_burden(ctx)
-                            print(f"Initialized {succubus_id} for user {user_id}")
-                        except Exception as e:
-                            print(f"Error initializing {succubus_id} for user {user_id}: {e}")
+                    # Handlers only need the user's ID, so there's no need to fetch the user
+                    ctx = type('obj', (object,), {
+                        'author': discord.Object(id=int(user_id)),
+                        'bot': self.bot,
+                        'guild': None,
+                        'channel': None,
+                        'message': None,
+                        'command': None
+                    })
+                    
+                    # Apply ability and burden
+                    try:
+                        await handler.apply_ability(ctx)
+                        await handler.apply_burden(ctx)
+                        print(f"Initialized {succubus_id} for user {user_id}")
+                    except Exception as e:
+                        print(f"Error initializing {succubus_id} for user {user_id}: {e}")
         except Exception as e:
             print(f"Error in initialize_active_succubus: {e}")
 
@@ -94,7 +97,7 @@ class Succubus(commands.Cog):
         file_manager = self.bot.get_cog('FileManager')
         user_id = str(ctx.author.id)
         
-        user_succubus = file_manager.db.get_user_succubus(user_id)
+        user_succubus = await file_manager.async_db.get_user_succubus(user_id)
         if not user_succubus:
             await ctx.send("You don't have any succubus yet!")
             return
@@ -102,10 +105,10 @@ class Succubus(commands.Cog):
         embed = discord.Embed(title=f"{ctx.author.name}'s Succubus Collection", color=discord.Color.purple())
         
         for user_succ in user_succubus:
-            succubus = self.get_succubus_by_id(user_succ['succubus_id'])
+            succubus = self.get_succubus_by_id(user_succ.succubus_id)
             if succubus:
-                level = user_succ.get('level', 1)
-                xp = user_succ.get('xp', 0)
+                level = user_succ.level
+                xp = user_succ.xp
                 xp_needed = self.calculate_xp_needed(level)
                 embed.add_field(
                     name=f"{succubus['name']} ({succubus['rarity'].capitalize()}) - Level {level}",
@@ -149,15 +152,6 @@ class Succubus(commands.Cog):
         user = ctx.author.name
         user_id = str(ctx.author.id)
 
-        # Check if user has a Ritual item
-        user_items = file_manager.db.get_user_items(user_id)
-        if not user_items.get("Ritual", 0) > 0:
-            await ctx.send(f"{user}, you don't have any Ritual items! Buy one from the store using `{self.bot.command_prefix}store`")
-            return
-
-        # Use the Ritual item
-        file_manager.db.update_item_quantity(user_id, "Ritual", -1)
-
         # Get probabilities from JSON
         probabilities = file_manager.get_probabilities()
         rarity_probs = probabilities.get("ritual_probabilities", {})
@@ -177,34 +171,45 @@ class Succubus(commands.Cog):
 
         # Randomly select a succubus
         chosen_succubus = random.choice(available_succubus)
-        
-        # Check if user already has this succubus
-        user_succubus = file_manager.db.get_user_succubus(user_id)
-        existing_succubus = next((s for s in user_succubus if s['succubus_id'] == chosen_succubus['id']), None)
+
+        # Use the Ritual item and grant the succubus with a single commit
+        leveled_up = False
+        async with file_manager.async_db.transaction() as tx:
+            # Check if user has a Ritual item
+            user_items = await tx.get_user_items(user_id)
+            has_ritual = user_items.get("Ritual", 0) > 0
+            if has_ritual:
+                await tx.update_item_quantity(user_id, "Ritual", -1)
+                
+                # Add XP to the succubus if the user already has it
+                progress = await tx.add_succubus_xp(user_id, chosen_succubus['id'], 1)
+                
+                if progress:
+                    new_xp = progress['xp']
+                    xp_needed = self.calculate_xp_needed(progress['level'])
+                    
+                    if new_xp >= xp_needed:
+                        # Level up the succubus
+                        leveled_up = True
+                        new_level = progress['level'] + 1
+                        new_xp = new_xp - xp_needed  # Reset XP after leveling up
+                        await tx.update_succubus_level(user_id, chosen_succubus['id'], new_level, new_xp)
+                else:
+                    # Add new succubus with XP=0 and LVL=1
+                    await tx.add_user_succubus(user_id, chosen_succubus['id'], xp=0, level=1)
+
+        if not has_ritual:
+            await ctx.send(f"{user}, you don't have any Ritual items! Buy one from the store using `{self.bot.command_prefix}store`")
+            return
 
         await ctx.send("<:roulette:1352049721413206016> Rolling...")
         await asyncio.sleep(3)  # Use asyncio.sleep instead of time.sleep for async compatibility
         
-        if existing_succubus:
-            # Add XP to the existing succubus
-            current_xp = existing_succubus.get('xp', 0)
-            current_level = existing_succubus.get('level', 1)
-            new_xp = current_xp + 1
-            xp_needed = self.calculate_xp_needed(current_level)
-            
-            if new_xp >= xp_needed:
-                # Level up the succubus
-                new_level = current_level + 1
-                new_xp = new_xp - xp_needed  # Reset XP after leveling up
-                file_manager.db.update_succubus_level(user_id, chosen_succubus['id'], new_level, new_xp)
-                await ctx.send(f"Your {chosen_succubus['name']} leveled up to level {new_level}!")
-            else:
-                # Just update XP
-                file_manager.db.update_succubus_xp(user_id, chosen_succubus['id'], new_xp)
-                await ctx.send(f"Your {chosen_succubus['name']} gained 1 XP! Current XP: {new_xp}/{xp_needed}")
+        if leveled_up:
+            await ctx.send(f"Your {chosen_succubus['name']} leveled up to level {new_level}!")
+        elif progress:
+            await ctx.send(f"Your {chosen_succubus['name']} gained 1 XP! Current XP: {new_xp}/{xp_needed}")
         else:
-            # Add new succubus with XP=0 and LVL=1
-            file_manager.db.add_user_succubus(user_id, chosen_succubus['id'], xp=0, level=1)
             await ctx.send(f"You obtained a new succubus: {chosen_succubus['name']} (Level 1)!")
 
         # Display succubus info
@@ -244,7 +249,7 @@ class Succubus(commands.Cog):
         user_id = str(ctx.author.id)
         
         # Check if the user has a succubus
-        user_succubus = file_manager.db.get_user_succubus(user_id)
+        user_succubus = await file_manager.async_db.get_user_succubus(user_id)
         if not user_succubus:
             await ctx.send("You don't own any succubus yet!")
             ctx.command.reset_cooldown(ctx)  # Reset cooldown if it fails
@@ -264,13 +269,13 @@ class Succubus(commands.Cog):
             return
             
         # Check if the user owns this succubus
-        if not any(s['succubus_id'] == succubus_id for s in user_succubus):
+        if not any(s.succubus_id == succubus_id for s in user_succubus):
             await ctx.send(f"You do not own the succubus {name}!")
             ctx.command.reset_cooldown(ctx)  # Reset cooldown if it fails
             return
             
         # Check the timestamp of the last activation
-        last_activation = file_manager.db.get_succubus_activation_time(user_id)
+        last_activation = await file_manager.async_db.get_succubus_activation_time(user_id)
         if last_activation:
             time_diff = datetime.utcnow() - last_activation
             if time_diff < timedelta(days=7):
@@ -300,14 +305,14 @@ class Succubus(commands.Cog):
             response = await self.bot.wait_for('message', check=check, timeout=30.0)
             if response.content.strip().lower() == "yes":
                 # Clean up any existing active succubus tasks
-                active_succubus_id = file_manager.db.get_active_succubus(user_id)
+                active_succubus_id = await file_manager.async_db.get_active_succubus(user_id)
                 if active_succubus_id:
                     old_handler = self.succubus_manager.handlers.get(active_succubus_id)
                     if old_handler and hasattr(old_handler, 'cleanup_tasks'):
                         old_handler.cleanup_tasks(user_id)
                 
                 # Activate the succubus
-                success = file_manager.db.activate_succubus(user_id, succubus_id)
+                success = await file_manager.async_db.activate_succubus(user_id, succubus_id)
                 if success:
                     embed = discord.Embed(
                         title="✨ Succubus Activated! ✨",
@@ -324,6 +329,8 @@ class Succubus(commands.Cog):
                     # Apply the succubus ability and burden
                     handler = self.succubus_manager.handlers.get(succubus_id)
                     if handler:
+                        if hasattr(handler, 'on_activate'):
+                            await handler.on_activate(user_id)
                         await handler.apply_ability(ctx)
                         await handler.apply_burden(ctx)
                         
@@ -344,7 +351,7 @@ class Succubus(commands.Cog):
         file_manager = self.bot.get_cog('FileManager')
         user_id = str(ctx.author.id)
         
-        active_succubus_id = file_manager.db.get_active_succubus(user_id)
+        active_succubus_id = await file_manager.async_db.get_active_succubus(user_id)
         if not active_succubus_id:
             await ctx.send("You don't have any active succubus at the moment!")
             return
@@ -356,7 +363,7 @@ class Succubus(commands.Cog):
             return
             
         # Get activation timestamp
-        activation_time = file_manager.db.get_succubus_activation_time(user_id)
+        activation_time = await file_manager.async_db.get_succubus_activation_time(user_id)
         if activation_time:
             time_diff = datetime.utcnow() - activation_time
             days_active = time_diff.days
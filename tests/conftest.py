@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The bot runs from the repository root, where `utils` and `cogs` are top-level packages
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,70 @@
+import gzip
+import os
+import sqlite3
+import threading
+from utils.backup_manager import BackupManager, BACKUP_PREFIX, BACKUP_SUFFIX
+from utils.database_manager import DatabaseManager
+
+UIDS = [str(100000000000000200 + i) for i in range(500)]
+
+def _open_backup(path: str, folder: str) -> sqlite3.Connection:
+    raw_path = os.path.join(folder, 'check.db')
+    with gzip.open(path, 'rb') as compressed, open(raw_path, 'wb') as raw:
+        raw.write(compressed.read())
+    return sqlite3.connect(raw_path)
+
+def test_backup_during_writes_is_consistent_and_restores(tmp_path):
+    db_path = str(tmp_path / 'fapbot.db')
+    db = DatabaseManager(db_path)
+    try:
+        for user_id in UIDS:
+            db.create_or_update_user(user_id, 'backup')
+            db.add_fapcoins(user_id, 10)
+        # One page per step, so the copy spans many of the writer's commits
+        backups = BackupManager(db_path, str(tmp_path / 'backups'), pages_per_step=1, step_sleep_ms=1)
+
+        stop = threading.Event()
+        writes = []
+
+        def writer():
+            while not stop.is_set():
+                user_id = UIDS[len(writes) % len(UIDS)]
+                db.add_fapcoins(user_id, 1)
+                writes.append(user_id)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            path = backups.create()
+        finally:
+            stop.set()
+            thread.join()
+        assert writes
+
+        backup = _open_backup(path, str(tmp_path))
+        try:
+            assert backup.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+            # One read snapshot: every balance matches the ledger entries copied with it
+            assert backup.execute("""
+                SELECT COUNT(*) FROM users u
+                WHERE u.fapcoins <> (SELECT COALESCE(SUM(amount), 0) FROM coin_ledger l WHERE l.user_id = u.user_id)
+            """).fetchone()[0] == 0
+            saved = dict(backup.execute("SELECT user_id, fapcoins FROM users").fetchall())
+        finally:
+            backup.close()
+
+        db.add_fapcoins(UIDS[0], 1000)
+        backups.restore(os.path.basename(path))
+        assert {int(user_id): db.get_fapcoins(user_id) for user_id in UIDS} == saved
+        assert db.ledger.rebuild() == {}
+    finally:
+        db.close()
+
+def test_rotate_keeps_the_newest(tmp_path):
+    backups = BackupManager(str(tmp_path / 'fapbot.db'), str(tmp_path / 'backups'), keep=2)
+    names = [f"{BACKUP_PREFIX}2024050{day}-101500{BACKUP_SUFFIX}" for day in range(1, 5)]
+    for name in names:
+        open(os.path.join(backups.backup_folder, name), 'wb').close()
+
+    assert sorted(backups.rotate()) == names[:2]
+    assert [backup['name'] for backup in backups.list()] == names[:1:-1]
@@ -0,0 +1,184 @@
+"""
+Statistical tests of the scheduler's sampled "every hour, X% chance" jobs.
+
+Simulates the same users three ways: the reference draws random() < chance
+for every user every hour, "hourly" rolls every hour with bernoulli_hits
+like that chance_rolls mode, and "sampled" sleeps from hit to hit with
+scheduler.advance like the other one. Fails if any departs from the
+independent-rolls model, or if either mode disagrees with the reference,
+which shares no code with geometric_trials.
+
+The runs are seeded, so the results are the same every time. Each test is
+at significance ALPHA: after a change to the sampling, a correct
+implementation still fails about once in 1/ALPHA seeds per test.
+"""
+import math
+import random
+from statistics import NormalDist
+from typing import Dict, List, Tuple
+import pytest
+from utils.sampling import bernoulli_hits
+from utils.scheduler import advance
+
+SEED = 20240601
+CHANCE = 0.3
+USERS = 500
+HOURS = 2000
+ALPHA = 0.001
+
+# Bins of the chi-square tests are merged until each expects at least this many counts
+MIN_EXPECTED = 5
+
+def simulate_reference(users: int, hours: int, chance: float) -> List[List[int]]:
+    """Hours (1 to `hours`) each user was hit, with one draw per user and hour."""
+    hits: List[List[int]] = [[] for _ in range(users)]
+    for hour in range(1, hours + 1):
+        for user in range(users):
+            if random.random() < chance:
+                hits[user].append(hour)
+    return hits
+
+def simulate_hourly(users: int, hours: int, chance: float) -> List[List[int]]:
+    """Hours (1 to `hours`) each user was hit, rolling every user every hour with bernoulli_hits."""
+    hits: List[List[int]] = [[] for _ in range(users)]
+    for hour in range(1, hours + 1):
+        for user in bernoulli_hits(users, chance):
+            hits[user].append(hour)
+    return hits
+
+def simulate_sampled(users: int, hours: int, chance: float) -> List[List[int]]:
+    """Hours (1 to `hours`) each user was hit, jumping from one hit to the next like the scheduler."""
+    hits: List[List[int]] = [[] for _ in range(users)]
+    for user in range(users):
+        # As Scheduler.ensure does for a new job, in one-hour units starting at hour 0
+        hour = advance(0, 0, 1, chance)
+        while hour <= hours:
+            hits[user].append(int(hour))
+            hour = advance(hour, hour, 1, chance)
+    return hits
+
+def _gaps(hits: List[List[int]]) -> List[int]:
+    # Counted from hour 0 for the first hit, like the time from activation
+    return [hour - previous for user_hits in hits for previous, hour in zip([0] + user_hits, user_hits)]
+
+def _histogram(values: List[int]) -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    return counts
+
+def _merge_bins(expected: List[float], observed: List[List[int]]) -> Tuple[List[float], List[List[int]]]:
+    """Merge neighbouring bins, low ones up and high ones down, until each expects MIN_EXPECTED."""
+    merged_expected: List[float] = []
+    merged_observed: List[List[int]] = [[] for _ in observed]
+    pending = 0.0
+    pending_observed = [0] * len(observed)
+    for i, value in enumerate(expected):
+        pending += value
+        for row, counts in enumerate(observed):
+            pending_observed[row] += counts[i]
+        if pending >= MIN_EXPECTED:
+            merged_expected.append(pending)
+            for row in range(len(observed)):
+                merged_observed[row].append(pending_observed[row])
+            pending = 0.0
+            pending_observed = [0] * len(observed)
+    if merged_expected:
+        merged_expected[-1] += pending
+        for row in range(len(observed)):
+            merged_observed[row][-1] += pending_observed[row]
+    return merged_expected, merged_observed
+
+def _chi_square_critical(degrees: int, alpha: float) -> float:
+    # Wilson-Hilferty approximation of the chi-square quantile, close enough from a few degrees of freedom
+    z = NormalDist().inv_cdf(1 - alpha)
+    return degrees * (1 - 2 / (9 * degrees) + z * math.sqrt(2 / (9 * degrees))) ** 3
+
+def _goodness_of_fit(values: List[int], pmf, support: range) -> Tuple[float, int]:
+    """Chi-square statistic and degrees of freedom of `values` against `pmf` over `support`, tail in the last bin."""
+    counts = _histogram(values)
+    total = len(values)
+    expected = [total * pmf(k) for k in support]
+    # Whatever the pmf puts past the support goes in the last bin
+    expected[-1] += total - sum(expected)
+    observed = [counts.get(k, 0) for k in support]
+    observed[-1] += sum(count for k, count in counts.items() if k > support[-1])
+    expected, (observed,) = _merge_bins(expected, [observed])
+    statistic = sum((o - e) ** 2 / e for o, e in zip(observed, expected))
+    return statistic, len(expected) - 1
+
+def _homogeneity(first: List[int], second: List[int], support: range) -> Tuple[float, int]:
+    """Chi-square statistic and degrees of freedom for `first` and `second` coming from one distribution."""
+    rows = []
+    for values in (first, second):
+        counts = _histogram(values)
+        row = [counts.get(k, 0) for k in support]
+        row[-1] += sum(count for k, count in counts.items() if k > support[-1])
+        rows.append(row)
+    totals = [len(first), len(second)]
+    grand = sum(totals)
+    pooled = [a + b for a, b in zip(*rows)]
+    # Merged on the smaller sample's expectation, so every cell of both rows expects enough
+    smallest = min(totals)
+    expected, rows = _merge_bins([smallest * count / grand for count in pooled], rows)
+    pooled = [a + b for a, b in zip(*rows)]
+    statistic = 0.0
+    for row, total in zip(rows, totals):
+        for observed, column in zip(row, pooled):
+            cell = total * column / grand
+            statistic += (observed - cell) ** 2 / cell
+    return statistic, len(expected) - 1
+
+@pytest.fixture(scope='module')
+def models() -> Dict[str, List[List[int]]]:
+    # Every simulation draws from the module-level generator, like the bot
+    state = random.getstate()
+    random.seed(SEED)
+    try:
+        return {
+            'reference': simulate_reference(USERS, HOURS, CHANCE),
+            'hourly': simulate_hourly(USERS, HOURS, CHANCE),
+            'sampled': simulate_sampled(USERS, HOURS, CHANCE),
+        }
+    finally:
+        random.setstate(state)
+
+@pytest.fixture(scope='module')
+def gap_support(models) -> range:
+    return range(1, max(max(_gaps(hits), default=1) for hits in models.values()) + 1)
+
+@pytest.mark.parametrize('model', ['reference', 'hourly', 'sampled'])
+def test_hit_rate(models, model):
+    # Every user-hour is one roll
+    total = sum(len(user_hits) for user_hits in models[model])
+    rolls = USERS * HOURS
+    z = (total - rolls * CHANCE) / math.sqrt(rolls * CHANCE * (1 - CHANCE))
+    assert abs(z) <= NormalDist().inv_cdf(1 - ALPHA / 2), f"{total / rolls:.5f} (expected {CHANCE}, z = {z:+.2f})"
+
+@pytest.mark.parametrize('model', ['reference', 'hourly', 'sampled'])
+def test_gaps_are_geometric(models, gap_support, model):
+    # Time between hits is geometric: the rolls are independent
+    statistic, degrees = _goodness_of_fit(
+        _gaps(models[model]), lambda k: (1 - CHANCE) ** (k - 1) * CHANCE, gap_support)
+    critical = _chi_square_critical(degrees, ALPHA)
+    assert statistic <= critical, f"chi2 = {statistic:.1f} on {degrees} df (limit {critical:.1f})"
+
+@pytest.mark.parametrize('model', ['reference', 'hourly', 'sampled'])
+def test_hits_per_hour_are_binomial(models, model):
+    # Hits per hour are binomial: users are independent of each other
+    per_hour = [0] * HOURS
+    for user_hits in models[model]:
+        for hour in user_hits:
+            per_hour[hour - 1] += 1
+    log_miss = math.log1p(-CHANCE)
+    statistic, degrees = _goodness_of_fit(per_hour, lambda k: math.exp(
+        math.lgamma(USERS + 1) - math.lgamma(k + 1) - math.lgamma(USERS - k + 1)
+        + k * math.log(CHANCE) + (USERS - k) * log_miss), range(0, USERS + 1))
+    critical = _chi_square_critical(degrees, ALPHA)
+    assert statistic <= critical, f"chi2 = {statistic:.1f} on {degrees} df (limit {critical:.1f})"
+
+@pytest.mark.parametrize('model', ['hourly', 'sampled'])
+def test_gaps_agree_with_the_reference(models, gap_support, model):
+    statistic, degrees = _homogeneity(_gaps(models['reference']), _gaps(models[model]), gap_support)
+    critical = _chi_square_critical(degrees, ALPHA)
+    assert statistic <= critical, f"chi2 = {statistic:.1f} on {degrees} df (limit {critical:.1f})"
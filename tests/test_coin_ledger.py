@@ -0,0 +1,56 @@
+import random
+import pytest
+from utils.coin_ledger import CoinReason
+from utils.database_manager import DatabaseManager
+
+UIDS = [str(100000000000000100 + i) for i in range(20)]
+
+@pytest.fixture(params=[False, True], ids=['direct', 'write_behind'])
+def db(tmp_path, request):
+    db = DatabaseManager(str(tmp_path / 'fapbot.db'), write_behind=request.param, cache_size=100)
+    for user_id in UIDS:
+        db.create_or_update_user(user_id, 'ledger')
+    yield db
+    db.close()
+
+def _spend(db: DatabaseManager, rng: random.Random, rounds: int):
+    for _ in range(rounds):
+        user_id = rng.choice(UIDS)
+        amount = rng.randint(-20, 50)
+        kind = rng.randrange(3)
+        if kind == 0:
+            db.add_fapcoins(user_id, amount, CoinReason.OTHER)
+        elif kind == 1:
+            db.update_fapcoins(user_id, amount, CoinReason.OTHER)
+        else:
+            with db.transaction() as tx:
+                tx.add_fapcoins(user_id, amount, CoinReason.OTHER)
+
+def test_rebuild_matches_balances_across_snapshots_and_compaction(db):
+    rng = random.Random(7)
+    _spend(db, rng, 300)
+    assert db.ledger.snapshot() is not None
+    _spend(db, rng, 300)
+    assert db.ledger.snapshot() is not None
+    _spend(db, rng, 300)
+    assert db.ledger.compact(keep_snapshots=1) > 0
+    _spend(db, rng, 100)
+
+    assert db.ledger.rebuild() == {}
+    for user_id in UIDS:
+        assert db.ledger.balance(user_id) == db.get_fapcoins(user_id)
+
+def test_rebuild_reports_and_repairs_drift(db):
+    _spend(db, random.Random(8), 100)
+    db.ledger.snapshot()
+    user_id = UIDS[0]
+    expected = db.get_fapcoins(user_id)
+    # A write that bypassed the ledger
+    with db.connection() as (conn, cur):
+        cur.execute("UPDATE users SET fapcoins = fapcoins + 1000 WHERE user_id = ?", (user_id,))
+        conn.commit()
+
+    assert db.ledger.rebuild() == {user_id: (expected + 1000, expected)}
+    assert db.ledger.rebuild(apply=True) == {user_id: (expected + 1000, expected)}
+    assert db.ledger.rebuild() == {}
+    assert db.get_fapcoins(user_id) == expected
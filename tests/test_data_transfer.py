@@ -0,0 +1,50 @@
+import sqlite3
+import pytest
+from utils.data_transfer import TABLES, export_tables, import_tables
+from utils.database_manager import DatabaseManager
+
+UID = '100000000000000300'
+OTHER_UID = '100000000000000301'
+
+def _rows(db_path: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {
+            table: sorted(conn.execute(f"SELECT {', '.join(columns)} FROM {table}").fetchall(), key=repr)
+            for table, columns in TABLES.items()
+        }
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize('fmt', ['jsonl', 'csv'])
+def test_export_then_import_gives_back_identical_rows(tmp_path, fmt):
+    source = str(tmp_path / 'source.db')
+    db = DatabaseManager(source)
+    try:
+        # Quotes, commas, newlines and non-ASCII survive both formats; NULLs stay NULL
+        db.create_or_update_user(UID, 'Ná, "quoted"\nname')
+        db.create_or_update_user(OTHER_UID, '')
+        db.add_user_score(UID, faps=3, score=-2)
+        db.add_fapcoins(UID, 125)
+        db.update_daily_timestamp(UID)
+        db.add_item_quantity(UID, 'Fap Shield', 2)
+        db.add_item_quantity(OTHER_UID, 'Ritual', 1)
+        db.add_user_succubus(UID, 'mimi', xp=40, level=3)
+        db.activate_succubus(UID, 'mimi')
+    finally:
+        db.close()
+
+    folder = str(tmp_path / 'export')
+    counts = export_tables(source, folder, fmt, batch=1)
+    assert counts == {'users': 2, 'items': 2, 'user_succubus': 1}
+
+    target = str(tmp_path / 'target.db')
+    assert import_tables(target, folder, fmt, batch=1) == counts
+    assert _rows(target) == _rows(source)
+
+    db = DatabaseManager(target)
+    try:
+        # The imported balances are in the target's coin ledger
+        assert db.ledger.rebuild() == {}
+    finally:
+        db.close()
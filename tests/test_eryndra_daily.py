@@ -0,0 +1,107 @@
+import asyncio
+import time
+import pytest
+
+pytest.importorskip('discord')
+
+from utils.async_database_manager import AsyncDatabaseManager
+from utils.memory_backend import MemoryBackend
+from utils.scheduler import Scheduler
+from utils.succubus.eryndra import EryndraHandler
+
+UID = '100000000000000001'
+
+class Notifications:
+    def __init__(self):
+        self.sent = []
+
+    def notify(self, user_id, title, description, color, footer=None, channel_id=None):
+        self.sent.append(user_id)
+
+class FileManager:
+    def __init__(self):
+        self.db = MemoryBackend()
+        self.async_db = AsyncDatabaseManager(self.db)
+        self.scheduler = Scheduler()
+        self.notifications = Notifications()
+
+class Bot:
+    def __init__(self):
+        self.config = {'allowed_channels': [1]}
+        self.file_manager = FileManager()
+
+    def get_cog(self, name):
+        return self.file_manager if name == 'FileManager' else None
+
+class Ctx:
+    class author:
+        id = int(UID)
+
+def _eryndra_user(monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    bot = Bot()
+    db, scheduler = bot.file_manager.db, bot.file_manager.scheduler
+    db.create_or_update_user(UID, 'eryndra')
+    db.add_user_succubus(UID, 'eryndra')
+    db.activate_succubus(UID, 'eryndra')
+
+    async def run_round():
+        # What the scheduler does when the round comes due
+        clock[0] = scheduler.next_run('eryndra_daily')
+        job = next(job for job in scheduler.jobs() if job.key == 'eryndra_daily')
+        scheduler.cancel('eryndra_daily')
+        await job.callback(*job.args)
+
+    return clock, bot, EryndraHandler(bot), run_round
+
+def test_daily_claimed_after_activation_with_nothing_due_is_notified(monkeypatch):
+    clock, bot, handler, run_round = _eryndra_user(monkeypatch)
+    db, scheduler = bot.file_manager.db, bot.file_manager.scheduler
+
+    async def scenario():
+        # No daily pending at activation: a round is still scheduled, one cooldown ahead
+        await handler.apply_ability(Ctx())
+        assert scheduler.next_run('eryndra_daily') == clock[0] + 12 * 3600
+
+        # Claimed a minute later, so due a minute after that round
+        clock[0] += 60
+        db.update_daily_timestamp(UID, 12)
+        due = db.get_user(UID).next_daily_at
+
+        await run_round()
+        assert bot.file_manager.notifications.sent == []
+        assert scheduler.next_run('eryndra_daily') == due
+
+        await run_round()
+        assert bot.file_manager.notifications.sent == [UID]
+        assert scheduler.next_run('eryndra_daily') == clock[0] + 12 * 3600
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        bot.file_manager.async_db.close()
+
+def test_daily_never_claimed_is_notified_on_activation(monkeypatch):
+    clock, bot, handler, run_round = _eryndra_user(monkeypatch)
+    scheduler = bot.file_manager.scheduler
+
+    async def scenario():
+        # Activated through the succubus command, without ever claiming a daily
+        await handler.on_activate(UID)
+        await handler.apply_ability(Ctx())
+        assert scheduler.next_run('eryndra_daily') == clock[0]
+
+        await run_round()
+        assert bot.file_manager.notifications.sent == [UID]
+
+        # Turned off and on again without claiming: announced once more
+        await handler.on_activate(UID)
+        await handler.apply_ability(Ctx())
+        await run_round()
+        assert bot.file_manager.notifications.sent == [UID, UID]
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        bot.file_manager.async_db.close()
@@ -0,0 +1,48 @@
+import os
+from utils.journaled_backend import JournaledBackend
+
+UID = '100000000000000005'
+
+def _segments(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if '.journal.' in name)
+
+def test_only_the_active_segment_stays_on_disk(tmp_path):
+    path = str(tmp_path / 'fapbot.db')
+    for restart in range(3):
+        db = JournaledBackend(path)
+        try:
+            # A restart with nothing written yet: any segment left over is compacted away
+            db.compact()
+            assert _segments(tmp_path) == [f'fapbot.journal.{db.segment}']
+            db.create_or_update_user(UID, 'journal')
+            db.add_fapcoins(UID, 10)
+            assert db.compact() > 0
+            assert _segments(tmp_path) == [f'fapbot.journal.{db.segment}']
+            db.add_fapcoins(UID, 1)
+        finally:
+            db.close()
+        assert _segments(tmp_path) == []
+
+    db = JournaledBackend(path)
+    try:
+        assert db.get_fapcoins(UID) == 33
+    finally:
+        db.close()
+
+def test_uncompacted_commits_survive_a_crash(tmp_path):
+    path = str(tmp_path / 'fapbot.db')
+    db = JournaledBackend(path)
+    db.create_or_update_user(UID, 'journal')
+    db.add_fapcoins(UID, 10)
+    # No close(), like a crash: the commit is only in the journal
+    db.journal.close()
+    db.conn.close()
+
+    db = JournaledBackend(path)
+    try:
+        assert db.get_fapcoins(UID) == 10
+        db.compact()
+        assert _segments(tmp_path) == [f'fapbot.journal.{db.segment}']
+    finally:
+        db.close()
+    assert _segments(tmp_path) == []
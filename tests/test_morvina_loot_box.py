@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+
+pytest.importorskip('discord')
+
+from utils.succubus.morvina import MorvinaHandler
+
+UID = '100000000000000003'
+
+class Message:
+    id = 1
+
+    def __init__(self, content, embed):
+        self.content = content
+        self.embed = embed
+        self.reactions = []
+
+    async def add_reaction(self, emoji):
+        self.reactions.append(emoji)
+
+    async def clear_reactions(self):
+        self.reactions.clear()
+
+class Channel:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, embed=None):
+        message = Message(content, embed)
+        self.sent.append(message)
+        return message
+
+class Bot:
+    def __init__(self):
+        self.channel = Channel()
+        self.waited_on = None
+
+    def get_channel(self, channel_id):
+        return self.channel
+
+    async def wait_for(self, event, check, timeout):
+        self.waited_on = self.channel.sent[-1]
+        raise asyncio.TimeoutError
+
+def test_loot_box_pings_the_user_in_the_message_it_waits_on(monkeypatch):
+    monkeypatch.setattr(MorvinaHandler, 'load_config', lambda self: {'allowed_channels': [1]})
+    bot = Bot()
+    asyncio.run(MorvinaHandler(bot).spawn_loot_box(UID))
+
+    box, expired = bot.channel.sent
+    assert box.content == f"<@{UID}>" and box.embed is not None
+    assert bot.waited_on is box
+    assert expired.content == "The loot box expired!"
@@ -0,0 +1,178 @@
+"""
+Query-plan regression tests for DatabaseManager.
+
+Runs every public DatabaseManager method (and every Transaction method)
+against a scratch database, records each statement it executes and fails
+if EXPLAIN QUERY PLAN shows a full table scan or a temporary sort.
+
+When you add a method to DatabaseManager, add a call for it to CALLS below.
+"""
+from typing import Callable, Dict, List, Set
+import pytest
+from utils.database_manager import DatabaseManager
+
+UID = '100000000000000001'
+OTHER_UID = '100000000000000002'
+
+# Statements that are meant to read the whole table
+ALLOWED_SCANS = (
+    'SELECT user_id FROM users',  # get_all_users
+    'SELECT snapshot_id, ledger_id FROM coin_snapshots ORDER BY snapshot_id DESC',  # newest rowids first, stops early
+    'INSERT INTO coin_snapshot_balances',  # CoinLedger.snapshot folds the whole ledger tail
+    'SELECT u.user_id, u.fapcoins',  # CoinLedger.rebuild compares every balance
+)
+
+# Public methods that don't issue queries of their own or target tables that don't exist
+SKIPPED = {
+    'get_connection', 'connection', 'tuple_cursor', 'close', 'setup_database', 'transaction',
+    'add_available_succubus', 'get_succubus_by_rarity', 'get_all_succubus',
+}
+
+def _transaction_flow(db: DatabaseManager):
+    with db.transaction() as tx:
+        tx.get_user(UID)
+        tx.get_fapcoins(UID)
+        tx.get_last_daily(UID)
+        tx.get_active_succubus(UID)
+        tx.get_user_items(UID)
+        tx.get_user_succubus(UID)
+        tx.create_or_update_user(UID, 'plan')
+        tx.update_user_score(UID, 1, 1)
+        tx.update_fapcoins(UID, 1)
+        tx.update_item_quantity(UID, 'Ritual', 1)
+        tx.add_user_score(UID, 1, 1, min_score=0)
+        tx.add_fapcoins(UID, 1)
+        tx.add_item_quantity(UID, 'Ritual', 1)
+        tx.update_daily_timestamp(UID)
+        tx.init_next_daily(UID)
+        tx.activate_succubus(UID, 'mimi')
+        tx.update_succubus_xp(UID, 'mimi', 1)
+        tx.update_succubus_level(UID, 'mimi', 2, 0)
+        tx.add_succubus_xp(UID, 'mimi', 1)
+        tx.add_user_succubus(UID, 'mimi')
+
+def _ledger_flow(db: DatabaseManager):
+    db.ledger.balance(UID)
+    db.ledger.history(UID)
+    db.ledger.snapshot()
+    db.ledger.rebuild()
+    db.ledger.compact(keep_snapshots=1)
+
+CALLS: Dict[str, Callable[[DatabaseManager], object]] = {
+    'get_user': lambda db: db.get_user(UID),
+    'create_or_update_user': lambda db: db.create_or_update_user(UID, 'plan'),
+    'update_user_score': lambda db: db.update_user_score(UID, 2, 2),
+    'add_user_score': lambda db: db.add_user_score(UID, faps=1, score=-1, min_score=0),
+    'get_scoreboard': lambda db: db.get_scoreboard(),
+    'get_all_users': lambda db: db.get_all_users(),
+    'get_users_with_active_succubus': lambda db: db.get_users_with_active_succubus(),
+    'get_active_user_ids': lambda db: db.get_active_user_ids('mimi'),
+    'get_user_items': lambda db: db.get_user_items(UID),
+    'update_item_quantity': lambda db: db.update_item_quantity(UID, 'Faproll', 1),
+    'add_item_quantity': lambda db: db.add_item_quantity(UID, 'Faproll', 1),
+    'get_fapcoins': lambda db: db.get_fapcoins(UID),
+    'update_fapcoins': lambda db: db.update_fapcoins(UID, 1),
+    'add_fapcoins': lambda db: db.add_fapcoins(UID, 1),
+    'update_daily_timestamp': lambda db: db.update_daily_timestamp(UID),
+    'get_last_daily': lambda db: db.get_last_daily(UID),
+    'get_user_succubus': lambda db: db.get_user_succubus(UID),
+    'activate_succubus': lambda db: db.activate_succubus(UID, 'mimi'),
+    'get_active_succubus': lambda db: db.get_active_succubus(UID),
+    'get_succubus_activation_time': lambda db: db.get_succubus_activation_time(UID),
+    'update_succubus_xp': lambda db: db.update_succubus_xp(UID, 'mimi', 1),
+    'update_succubus_level': lambda db: db.update_succubus_level(UID, 'mimi', 2, 0),
+    'add_succubus_xp': lambda db: db.add_succubus_xp(UID, 'mimi', 1),
+    'add_user_succubus': lambda db: db.add_user_succubus(UID, 'mimi'),
+    'get_users_many': lambda db: db.get_users_many([UID, OTHER_UID]),
+    'get_active_succubus_many': lambda db: db.get_active_succubus_many([UID, OTHER_UID]),
+    'get_items_many': lambda db: db.get_items_many([UID, OTHER_UID]),
+    'iter_users_with_active_succubus': lambda db: list(db.iter_users_with_active_succubus('mimi', batch_size=1)),
+    'sample_user': lambda db: db.sample_user(exclude=UID),
+    # A cutoff in the future archives every user without an active succubus...
+    'archive_inactive': lambda db: db.archive_inactive(-1, batch_size=1, pause=0),
+    # ...and this brings them all back for the calls after it
+    'restore_archived_user': lambda db: [db.restore_archived_user(user_id) for user_id in (UID, OTHER_UID)],
+    'get_next_daily_due': lambda db: db.get_next_daily_due('mimi'),
+    'init_next_daily': lambda db: db.init_next_daily(UID),
+    'take_dailies_due': lambda db: db.take_dailies_due('mimi', 2 ** 40),
+    'add_scheduled_job': lambda db: db.add_scheduled_job('mimi_daily', UID, 100),
+    'get_scheduled_jobs': lambda db: db.get_scheduled_jobs(200, 50),
+    'set_scheduled_jobs': lambda db: db.set_scheduled_jobs([('mimi_daily', UID, 300), ('mimi_daily', OTHER_UID, None)]),
+    'Transaction': _transaction_flow,
+    'ledger': _ledger_flow,
+}
+
+def _is_query(sql: str) -> bool:
+    return sql.lstrip().split(None, 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+def _plan_problems(cur, sql: str) -> List[str]:
+    cur.execute(f"EXPLAIN QUERY PLAN {sql}")
+    problems = []
+    for row in cur.fetchall():
+        detail = row['detail']
+        # Constant rows and materialized subqueries aren't tables
+        full_scan = (detail.startswith('SCAN ') and ' USING ' not in detail
+                     and not detail.startswith(('SCAN CONSTANT ROW', 'SCAN (')))
+        if full_scan or detail.startswith('USE TEMP B-TREE'):
+            problems.append(detail)
+    return problems
+
+def _record(db: DatabaseManager, label: str, call: Callable[[DatabaseManager], object],
+            statements: Dict[str, Set[str]]):
+    seen: List[str] = []
+    db.pool.trace_callback = seen.append
+    db.pool.close()  # Reopen every connection with the trace callback set
+    try:
+        call(db)
+        if db.write_behind:
+            db.write_behind.flush()
+    finally:
+        db.pool.trace_callback = None
+        db.pool.close()
+    for sql in seen:
+        if _is_query(sql):
+            statements.setdefault(' '.join(sql.split()), set()).add(label)
+
+@pytest.fixture(scope='module')
+def plans(tmp_path_factory) -> Dict[str, List[str]]:
+    """The labels and plan problems of every statement the calls ran, keyed by statement."""
+    folder = tmp_path_factory.mktemp('plans')
+    statements: Dict[str, Set[str]] = {}
+    # Once without and once with the write-behind queue, so its flush statements are covered too
+    for write_behind in (False, True):
+        db = DatabaseManager(str(folder / f'plan_{write_behind}.db'), pool_size=1,
+                             write_behind=write_behind, flush_interval_ms=60000)
+        try:
+            db.create_or_update_user(UID, 'plan')
+            db.create_or_update_user(OTHER_UID, 'other')
+            db.add_user_succubus(UID, 'mimi')
+            for label, call in CALLS.items():
+                _record(db, label, call, statements)
+        finally:
+            db.close()
+
+    results = {}
+    try:
+        with db.connection() as (conn, cur):
+            for sql, labels in statements.items():
+                problems = [] if sql.startswith(ALLOWED_SCANS) else _plan_problems(cur, sql)
+                results[sql] = [', '.join(sorted(labels))] + problems
+    finally:
+        db.close()
+    return results
+
+def test_every_public_method_has_a_call():
+    missing = sorted(
+        name for name in dir(DatabaseManager)
+        if not name.startswith('_') and callable(getattr(DatabaseManager, name))
+        and name not in CALLS and name not in SKIPPED
+    )
+    assert not missing, f"DatabaseManager methods with no entry in CALLS: {', '.join(missing)}"
+
+def test_statements_use_indexes(plans):
+    assert plans
+    regressions = [
+        f"{labels}: {'; '.join(problems)}\n    {sql}"
+        for sql, (labels, *problems) in plans.items() if problems
+    ]
+    assert not regressions, "Full table scans or temporary sorts:\n" + '\n'.join(regressions)
@@ -0,0 +1,30 @@
+import asyncio
+from utils.async_database_manager import AsyncDatabaseManager
+from utils.database_manager import DatabaseManager
+from utils.scheduler import Scheduler
+
+UID = '100000000000000004'
+
+def test_saved_jobs_of_unregistered_effects_are_deleted_on_load(tmp_path):
+    # As after switching chance_rolls: the per-user loot boxes are saved, the running bot doesn't register them
+    db = DatabaseManager(str(tmp_path / 'fapbot.db'))
+    try:
+        db.set_scheduled_jobs([('morvina_loot_box', UID, 100), ('mimi_daily', UID, 200)])
+
+        async def daily(user_id):
+            pass
+
+        async def scenario():
+            async_db = AsyncDatabaseManager(db)
+            scheduler = Scheduler(async_db)
+            scheduler.register('mimi_daily', daily)
+            await scheduler.start()
+            assert ('mimi_daily', UID) in scheduler
+            assert ('morvina_loot_box', UID) not in scheduler
+            # What the run loop saves
+            await async_db.set_scheduled_jobs(scheduler.take_unsaved())
+
+        asyncio.run(scenario())
+        assert db.get_scheduled_jobs(2 ** 40) == [('mimi_daily', UID, 200)]
+    finally:
+        db.close()
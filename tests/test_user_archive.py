@@ -0,0 +1,83 @@
+import pytest
+from utils.database_manager import DatabaseManager
+from utils.journaled_backend import JournaledBackend
+from utils.user_archive import is_archived
+
+UID = '100000000000000002'
+
+@pytest.fixture(params=[False, True], ids=['direct', 'write_behind'])
+def db(tmp_path, request):
+    # With write-behind, flushed by hand only
+    db = DatabaseManager(str(tmp_path / 'fapbot.db'), write_behind=request.param, flush_interval_ms=10 ** 9,
+                         cache_size=100)
+    db.create_or_update_user(UID, 'archived')
+    db.add_fapcoins(UID, 50)
+    db.add_user_score(UID, faps=2, score=7)
+    db.update_item_quantity(UID, 'Vibrator', 3)
+    if db.write_behind:
+        db.write_behind.flush()
+    with db.connection() as (conn, cur):
+        cur.execute("UPDATE users SET last_seen = 0 WHERE user_id = ?", (UID,))
+        conn.commit()
+    assert db.archive_inactive(idle_days=1, pause=0) == 1
+    assert db.get_user(UID) is None
+    yield db
+    db.close()
+
+def _assert_restored(db, faps: int, score: int, fapcoins: int, vibrators: int):
+    if db.write_behind:
+        db.write_behind.flush()
+    with db.tuple_cursor() as cur:
+        assert not is_archived(cur, UID)
+    user = db.get_user(UID)
+    assert (user.faps, user.score, user.fapcoins) == (faps, score, fapcoins)
+    assert db.get_user_items(UID) == {'Vibrator': vibrators}
+    assert db.sample_user() == UID
+
+def test_add_user_score_restores_archived_user(db):
+    assert db.add_user_score(UID, score=-1, min_score=0) == {'faps': 2, 'score': 6}
+    _assert_restored(db, 2, 6, 50, 3)
+
+def test_add_fapcoins_restores_archived_user(db):
+    assert db.add_fapcoins(UID, 10) == 60
+    _assert_restored(db, 2, 7, 60, 3)
+
+def test_update_fapcoins_restores_archived_user(db):
+    db.update_fapcoins(UID, 10)
+    _assert_restored(db, 2, 7, 60, 3)
+
+def test_item_write_restores_archived_user(db):
+    db.update_item_quantity(UID, 'Vibrator', 1)
+    _assert_restored(db, 2, 7, 50, 4)
+
+def test_transaction_read_restores_archived_user(db):
+    with db.transaction() as tx:
+        assert tx.get_fapcoins(UID) == 50
+        tx.update_fapcoins(UID, -20)
+    _assert_restored(db, 2, 7, 30, 3)
+
+def test_live_row_wins_and_drops_the_stale_archive(db):
+    # Created again by a backend without archiving, while the old rows sit in the archive
+    with db.connection() as (conn, cur):
+        cur.execute("INSERT INTO users (user_id, username, fapcoins) VALUES (?, 'again', 5)", (UID,))
+        cur.execute("INSERT INTO items (user_id, item_name, quantity) VALUES (?, 'Ritual', 1)", (UID,))
+        conn.commit()
+    if db.cache:
+        db.cache.invalidate(UID)
+
+    assert db.add_fapcoins(UID, 1) == 6
+    if db.write_behind:
+        db.write_behind.flush()
+    with db.connection() as (conn, cur):
+        for table in ('users_archive', 'items_archive', 'user_succubus_archive'):
+            cur.execute(f"SELECT COUNT(*) FROM {table} WHERE user_id = ?", (UID,))
+            assert cur.fetchone()[0] == 0, table
+    db.close()
+
+    # The journaled backend loads the archive too, after the live rows
+    journaled = JournaledBackend(db.db_path)
+    try:
+        assert journaled.get_fapcoins(UID) == 6
+        assert journaled.get_user_items(UID) == {'Ritual': 1}
+    finally:
+        journaled.close()
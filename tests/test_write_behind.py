@@ -0,0 +1,36 @@
+import threading
+from contextlib import contextmanager
+from utils.database_manager import DatabaseManager
+
+UID = '100000000000000001'
+
+def test_transaction_right_after_flush_commit_sees_each_delta_once(tmp_path):
+    # Flushed by hand only
+    db = DatabaseManager(str(tmp_path / 'fapbot.db'), write_behind=True, flush_interval_ms=10 ** 9)
+    try:
+        db.create_or_update_user(UID, 'flush')
+        db.write_behind.add_user_delta(UID, score=5)
+        seen = []
+
+        def read_in_transaction():
+            with db.transaction() as tx:
+                seen.append(tx.get_user(UID).score)
+
+        # Runs a transaction in another thread as soon as the flush's commit has released the write lock
+        connection = db.connection
+        @contextmanager
+        def connection_then_transaction():
+            with connection() as pair:
+                yield pair
+            thread = threading.Thread(target=read_in_transaction)
+            thread.start()
+            thread.join()
+
+        db.connection = connection_then_transaction
+        db.write_behind.flush()
+        db.connection = connection
+
+        assert seen == [5]
+        assert db.get_user(UID).score == 5
+    finally:
+        db.close()
@@ -0,0 +1,108 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from .storage_backend import StorageBackend, StorageTransaction
+
+class AsyncTransaction:
+    """
+    Awaitable counterpart of Transaction, returned by
+    `AsyncDatabaseManager.transaction()`:
+
+        async with file_manager.async_db.transaction() as tx:
+            if await tx.get_fapcoins(user_id) >= cost:
+                await tx.update_fapcoins(user_id, -cost)
+
+    Async transactions run one at a time on their own thread. Otherwise
+    queued writes could fill the shared executor while waiting for the
+    SQLite write lock that this transaction holds, and it could never
+    finish. Don't await Discord calls inside the block: the write lock is
+    held until it exits.
+    """
+
+    def __init__(self, async_db: 'AsyncDatabaseManager', tx: StorageTransaction):
+        self.async_db = async_db
+        self.tx = tx
+
+    async def _run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.async_db.tx_executor, functools.partial(func, *args, **kwargs))
+
+    async def __aenter__(self) -> 'AsyncTransaction':
+        await self.async_db.tx_lock.acquire()
+        try:
+            await self._run(self.tx.begin)
+        except BaseException:
+            self.async_db.tx_lock.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                await self._run(self.tx.commit)
+            else:
+                await self._run(self.tx.rollback)
+        finally:
+            self.async_db.tx_lock.release()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.tx, name)
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await self._run(attr, *args, **kwargs)
+
+        setattr(self, name, wrapper)
+        return wrapper
+
+class AsyncDatabaseManager:
+    """
+    Awaitable facade over a StorageBackend (normally DatabaseManager).
+
+    Every public backend method is exposed here as a coroutine with the
+    same name and arguments. Calls run on a dedicated, bounded thread pool
+    so SQLite I/O never blocks the event loop, e.g.:
+
+        coins = await file_manager.async_db.get_fapcoins(user_id)
+    """
+
+    def __init__(self, db: StorageBackend, max_workers: Optional[int] = None):
+        self.db = db
+        # One worker per pooled connection by default
+        pool = getattr(db, 'pool', None)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or (pool.size if pool else 4),
+            thread_name_prefix='fapbot-db'
+        )
+        # Async transactions get a thread of their own, see AsyncTransaction
+        self.tx_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fapbot-db-tx')
+        self.tx_lock = asyncio.Lock()
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run any blocking callable on the database executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def transaction(self) -> AsyncTransaction:
+        """Awaitable version of DatabaseManager.transaction(), used with `async with`."""
+        return AsyncTransaction(self, self.db.transaction())
+
+    def __getattr__(self, name: str):
+        # Only called for attributes not found on the facade itself
+        attr = getattr(self.db, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        # Cache the wrapper so the lookup only happens once per method
+        setattr(self, name, wrapper)
+        return wrapper
+
+    def close(self):
+        """Wait for queued calls to finish, then release the executor."""
+        self.executor.shutdown(wait=True)
+        self.tx_executor.shutdown(wait=True)
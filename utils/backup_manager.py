@@ -0,0 +1,159 @@
+"""
+Online backups of fapbot.db using the SQLite backup API.
+
+    python -m utils.backup_manager create
+    python -m utils.backup_manager list
+    python -m utils.backup_manager restore fapbot-20240501-101500.db.gz
+
+Stop the bot before restoring from the command line; from Discord use the
+admin `restorebackup` command instead.
+"""
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+BACKUP_PREFIX = 'fapbot-'
+BACKUP_SUFFIX = '.db.gz'
+
+class BackupManager:
+    """
+    Takes rotating, gzip-compressed snapshots of a live database.
+
+    The copy runs in steps of `pages_per_step` pages with a short pause in
+    between, on a dedicated connection that holds one read snapshot for the
+    whole copy. In WAL mode readers never block writers, so normal traffic
+    keeps committing while a backup runs, and the snapshot keeps those
+    commits from restarting the copy.
+    """
+
+    def __init__(self, db_path: str, backup_folder: str, keep: int = 7,
+                 pages_per_step: int = 256, step_sleep_ms: int = 5):
+        self.db_path = db_path
+        self.backup_folder = backup_folder
+        self.keep = max(1, keep)
+        self.pages_per_step = max(1, pages_per_step)
+        self.step_sleep = step_sleep_ms / 1000
+        os.makedirs(self.backup_folder, exist_ok=True)
+
+    def _pause(self, status, remaining, total):
+        # Called between steps: let other threads have the GIL and the disk
+        if remaining:
+            time.sleep(self.step_sleep)
+
+    def create(self) -> str:
+        """
+        Take a snapshot and rotate old ones.
+
+        Returns:
+            str: The path of the new compressed snapshot.
+        """
+        name = f"{BACKUP_PREFIX}{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}{BACKUP_SUFFIX}"
+        path = os.path.join(self.backup_folder, name)
+        raw_path = path[:-len('.gz')] + '.tmp'
+
+        source = sqlite3.connect(self.db_path)
+        target = sqlite3.connect(raw_path)
+        try:
+            # Pin a single read snapshot so concurrent commits can't restart the copy
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            source.backup(target, pages=self.pages_per_step, progress=self._pause)
+            source.rollback()
+        finally:
+            target.close()
+            source.close()
+
+        try:
+            with open(raw_path, 'rb') as raw, gzip.open(path + '.part', 'wb', compresslevel=6) as compressed:
+                shutil.copyfileobj(raw, compressed, 1024 * 1024)
+            os.replace(path + '.part', path)
+        finally:
+            os.remove(raw_path)
+
+        self.rotate()
+        return path
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Available snapshots, newest first."""
+        backups = []
+        for name in os.listdir(self.backup_folder):
+            if name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX):
+                stat = os.stat(os.path.join(self.backup_folder, name))
+                backups.append({'name': name, 'size': stat.st_size, 'created': datetime.utcfromtimestamp(stat.st_mtime)})
+        # Names embed the UTC timestamp, so they sort chronologically
+        return sorted(backups, key=lambda backup: backup['name'], reverse=True)
+
+    def rotate(self) -> List[str]:
+        """Delete all but the `keep` newest snapshots and return the deleted names."""
+        expired = [backup['name'] for backup in self.list()[self.keep:]]
+        for name in expired:
+            os.remove(os.path.join(self.backup_folder, name))
+        return expired
+
+    def path_for(self, name: str) -> str:
+        """Resolve a snapshot name inside the backup folder."""
+        name = os.path.basename(name)
+        path = os.path.join(self.backup_folder, name)
+        if not (name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX) and os.path.exists(path)):
+            raise FileNotFoundError(f"No backup named {name}")
+        return path
+
+    def restore(self, name: str):
+        """
+        Replace the contents of the database with a snapshot.
+
+        The snapshot is decompressed and checked first; the database is then
+        overwritten in a single backup step, so other connections either see
+        the old data or the restored data, never a mix.
+        """
+        path = self.path_for(name)
+        raw_path = os.path.join(self.backup_folder, '.restore.tmp')
+        with gzip.open(path, 'rb') as compressed, open(raw_path, 'wb') as raw:
+            shutil.copyfileobj(compressed, raw, 1024 * 1024)
+
+        try:
+            source = sqlite3.connect(raw_path)
+            try:
+                result = source.execute("PRAGMA quick_check").fetchone()[0]
+                if result != 'ok':
+                    raise sqlite3.DatabaseError(f"Backup {name} is corrupt: {result}")
+                target = sqlite3.connect(self.db_path, timeout=30)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+            finally:
+                source.close()
+        finally:
+            os.remove(raw_path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Back up or restore the FapBot database.')
+    parser.add_argument('--db', default=os.path.join('data', 'fapbot.db'), help='database file')
+    parser.add_argument('--folder', default=os.path.join('data', 'backups'), help='backup folder')
+    parser.add_argument('--keep', type=int, default=7, help='snapshots to keep when creating')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('create', help='take a snapshot now')
+    subparsers.add_parser('list', help='list snapshots')
+    restore_parser = subparsers.add_parser('restore', help='restore a snapshot (stop the bot first)')
+    restore_parser.add_argument('name')
+    args = parser.parse_args()
+
+    backups = BackupManager(args.db, args.folder, keep=args.keep)
+    if args.command == 'create':
+        print(f"Backup written to {backups.create()}")
+    elif args.command == 'list':
+        for backup in backups.list():
+            print(f"{backup['name']}  {backup['size'] / 1024:.0f} KB")
+    else:
+        backups.restore(args.name)
+        print(f"Restored {args.db} from {args.name}")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+class CoinReason:
+    """Reason codes stored with every coin_ledger entry."""
+    DAILY = 'daily'
+    MIMI_DAILY = 'mimi_daily'
+    PURCHASE = 'purchase'
+    FAIR_TRADE = 'fair_trade'
+    MORVINA_BURDEN = 'morvina_burden'
+    ADMIN = 'admin'
+    IMPORT = 'import'
+    REPAIR = 'repair'
+    OTHER = 'other'
+
+# Ledger rows deleted per transaction while compacting
+COMPACT_BATCH = 10000
+
+def record(cur: sqlite3.Cursor, user_id: str, amount: int, reason: str):
+    """Append one entry. Runs inside the transaction that changes users.fapcoins."""
+    if amount:
+        cur.execute("""
+            INSERT INTO coin_ledger (user_id, amount, reason, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (user_id, amount, reason, int(time.time())))
+
+def record_many(cur: sqlite3.Cursor, entries: List[Tuple[str, int, str]]):
+    """Append (user_id, amount, reason) entries, skipping users that don't exist."""
+    now = int(time.time())
+    cur.executemany("""
+        INSERT INTO coin_ledger (user_id, amount, reason, created_at)
+        SELECT ?, ?, ?, ?
+        WHERE EXISTS (SELECT 1 FROM users WHERE user_id = ?)
+    """, [(user_id, amount, reason, now, user_id) for user_id, amount, reason in entries if amount])
+
+def _latest_snapshot(cur: sqlite3.Cursor) -> Tuple[Optional[int], int]:
+    cur.execute("SELECT snapshot_id, ledger_id FROM coin_snapshots ORDER BY snapshot_id DESC LIMIT 1")
+    row = cur.fetchone()
+    return (row[0], row[1]) if row else (None, 0)
+
+# Balances at `ledger_id`: the snapshot balances plus the ledger entries after it
+BALANCES_SQL = """
+    SELECT user_id, SUM(amount) AS balance
+    FROM (
+        SELECT user_id, balance AS amount FROM coin_snapshot_balances WHERE snapshot_id = :snapshot_id
+        UNION ALL
+        SELECT user_id, amount FROM coin_ledger WHERE id > :from_id AND id <= :to_id
+    )
+    GROUP BY user_id
+"""
+
+class CoinLedger:
+    """
+    Append-only history of every fapcoin credit and debit.
+
+    Every change to `users.fapcoins` appends a `coin_ledger` row in the same
+    transaction, so the hot path is a single extra INSERT. `snapshot()`
+    periodically folds the ledger into per-user balances, which lets
+    `rebuild()` replay only the tail and `compact()` drop everything older
+    than the snapshots it keeps.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def _flush(self):
+        # Pending write-behind deltas are not in the ledger yet
+        if self.db.write_behind:
+            self.db.write_behind.flush()
+
+    def balance(self, user_id: str) -> int:
+        """A single user's balance according to the ledger."""
+        self._flush()
+        with self.db.connection() as (conn, cur):
+            cur.execute("BEGIN")
+            snapshot_id, ledger_id = _latest_snapshot(cur)
+            cur.execute("""
+                SELECT
+                    COALESCE((SELECT balance FROM coin_snapshot_balances WHERE snapshot_id = ? AND user_id = ?), 0)
+                    + COALESCE((SELECT SUM(amount) FROM coin_ledger WHERE user_id = ? AND id > ?), 0)
+            """, (snapshot_id, user_id, user_id, ledger_id))
+            balance = cur.fetchone()[0]
+            conn.rollback()
+        return balance
+
+    def history(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent ledger entries for a user, newest first."""
+        self._flush()
+        with self.db.connection() as (conn, cur):
+            cur.execute("""
+                SELECT id, amount, reason, created_at
+                FROM coin_ledger
+                WHERE user_id = ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (user_id, limit))
+            return [dict(row) for row in cur.fetchall()]
+
+    def snapshot(self) -> Optional[int]:
+        """
+        Record every user's balance as of the newest ledger entry.
+
+        Returns:
+            Optional[int]: The new snapshot id, or None if nothing changed since the last one.
+        """
+        self._flush()
+        with self.db.connection() as (conn, cur):
+            try:
+                cur.execute("BEGIN IMMEDIATE")
+                snapshot_id, ledger_id = _latest_snapshot(cur)
+                cur.execute("SELECT COALESCE(MAX(id), 0) FROM coin_ledger")
+                last_id = cur.fetchone()[0]
+                if last_id <= ledger_id:
+                    conn.rollback()
+                    return None
+                cur.execute("INSERT INTO coin_snapshots (ledger_id, created_at) VALUES (?, ?)",
+                            (last_id, int(time.time())))
+                new_id = cur.lastrowid
+                cur.execute(f"""
+                    INSERT INTO coin_snapshot_balances (snapshot_id, user_id, balance)
+                    SELECT :new_id, user_id, balance FROM ({BALANCES_SQL}) WHERE balance <> 0
+                """, {'new_id': new_id, 'snapshot_id': snapshot_id, 'from_id': ledger_id, 'to_id': last_id})
+                conn.commit()
+                return new_id
+            except Exception:
+                conn.rollback()
+                raise
+
+    def rebuild(self, apply: bool = False) -> Dict[str, Tuple[int, int]]:
+        """
+        Recompute every balance from the latest snapshot and the ledger tail.
+
+        Args:
+            apply (bool): Overwrite users.fapcoins with the ledger balance where they differ.
+
+        Returns:
+            Dict[str, Tuple[int, int]]: user_id -> (stored balance, ledger balance) for every mismatch.
+        """
+        self._flush()
+        with self.db.connection() as (conn, cur):
+            try:
+                cur.execute("BEGIN IMMEDIATE" if apply else "BEGIN")
+                snapshot_id, ledger_id = _latest_snapshot(cur)
+                cur.execute(f"""
+                    SELECT u.user_id, u.fapcoins, COALESCE(b.balance, 0) AS balance
+                    FROM users u
+                    LEFT JOIN ({BALANCES_SQL}) b ON b.user_id = u.user_id
+                    WHERE u.fapcoins <> COALESCE(b.balance, 0)
+                """, {'snapshot_id': snapshot_id, 'from_id': ledger_id, 'to_id': 1 << 62})
+                mismatches = {str(row['user_id']): (row['fapcoins'], row['balance']) for row in cur.fetchall()}
+                if apply and mismatches:
+                    cur.executemany("UPDATE users SET fapcoins = ? WHERE user_id = ?",
+                                    [(balance, user_id) for user_id, (_, balance) in mismatches.items()])
+                    conn.commit()
+                    if self.db.cache:
+                        for user_id in mismatches:
+                            self.db.cache.invalidate(user_id)
+                else:
+                    conn.rollback()
+                return mismatches
+            except Exception:
+                conn.rollback()
+                raise
+
+    def compact(self, keep_snapshots: int = 2) -> int:
+        """
+        Delete ledger entries and snapshots older than the `keep_snapshots` most recent snapshots.
+
+        Returns:
+            int: The number of ledger entries deleted.
+        """
+        with self.db.connection() as (conn, cur):
+            cur.execute("""
+                SELECT snapshot_id, ledger_id FROM coin_snapshots
+                ORDER BY snapshot_id DESC LIMIT 1 OFFSET ?
+            """, (max(1, keep_snapshots) - 1,))
+            oldest_kept = cur.fetchone()
+            if not oldest_kept:
+                return 0
+            snapshot_id, ledger_id = oldest_kept
+
+            # Delete in batches so writers are never locked out for long
+            deleted = 0
+            while True:
+                cur.execute("BEGIN IMMEDIATE")
+                cur.execute("""
+                    DELETE FROM coin_ledger
+                    WHERE id IN (SELECT id FROM coin_ledger WHERE id <= ? ORDER BY id LIMIT ?)
+                """, (ledger_id, COMPACT_BATCH))
+                batch = cur.rowcount
+                conn.commit()
+                deleted += batch
+                if batch < COMPACT_BATCH:
+                    break
+
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("DELETE FROM coin_snapshot_balances WHERE snapshot_id < ?", (snapshot_id,))
+            cur.execute("DELETE FROM coin_snapshots WHERE snapshot_id < ?", (snapshot_id,))
+            conn.commit()
+            return deleted
@@ -0,0 +1,232 @@
+"""
+Streaming export and import of users, items and succubus collections.
+
+    python -m utils.data_transfer export exports/
+    python -m utils.data_transfer export exports/ --format csv --tables users
+    python -m utils.data_transfer import exports/ --on-conflict skip
+
+Export writes one `<table>.jsonl` (or `.csv`) per table. It reads through a
+read-only connection inside a single read transaction, `batch` rows at a
+time, so it is safe to run next to the live bot and memory use doesn't grow
+with the table. Users archived by `archive_inactive` are not included.
+
+Import reads the same files and writes `batch` rows per transaction. Stop
+the bot first: its cache would not see the imported rows. Changes to
+fapcoin balances are recorded in the coin ledger with the reason "import".
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from . import coin_ledger
+from .coin_ledger import CoinReason
+from .migrations import run_migrations
+
+# Columns of each table, in export order; the first ones are the primary key
+TABLES: Dict[str, Tuple[str, ...]] = {
+    'users': ('user_id', 'username', 'faps', 'score', 'fapcoins', 'last_daily',
+              'active_succubus', 'last_succubus_activation', 'last_seen', 'next_daily_at'),
+    'items': ('user_id', 'item_name', 'quantity'),
+    'user_succubus': ('user_id', 'succubus_id', 'acquired_date', 'xp', 'level'),
+}
+
+# Empty CSV fields in these columns are NULL, everywhere else they are empty strings
+NULLABLE = {'last_daily', 'active_succubus', 'last_succubus_activation', 'last_seen', 'next_daily_at'}
+
+FORMATS = ('jsonl', 'csv')
+DEFAULT_BATCH = 5000
+
+def _read_only(db_path: str) -> sqlite3.Connection:
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(db_path)
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+def _stream(cur: sqlite3.Cursor, batch: int) -> Iterator[tuple]:
+    while True:
+        rows = cur.fetchmany(batch)
+        if not rows:
+            return
+        yield from rows
+
+def export_tables(db_path: str, folder: str, fmt: str = 'jsonl', tables: Optional[List[str]] = None,
+                  batch: int = DEFAULT_BATCH) -> Dict[str, int]:
+    """
+    Write every row of `tables` to `<folder>/<table>.<fmt>`.
+
+    Args:
+        db_path (str): The database file, opened read-only.
+        folder (str): Where the files are written; created if needed.
+        fmt (str): "jsonl" or "csv".
+        tables (Optional[List[str]]): Table names, all of TABLES by default.
+        batch (int): Rows fetched per `fetchmany`.
+
+    Returns:
+        Dict[str, int]: table -> rows written.
+    """
+    os.makedirs(folder, exist_ok=True)
+    counts = {}
+    conn = _read_only(db_path)
+    try:
+        cur = conn.cursor()
+        # One snapshot for all tables, so items never refer to users that aren't in users.jsonl
+        cur.execute("BEGIN")
+        for table in tables or list(TABLES):
+            columns = TABLES[table]
+            path = os.path.join(folder, f"{table}.{fmt}")
+            # Written next to the target and renamed, so a failed export never leaves half a file
+            with open(path + '.tmp', 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f) if fmt == 'csv' else None
+                if writer:
+                    writer.writerow(columns)
+                cur.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                count = 0
+                for row in _stream(cur, batch):
+                    # Discord ids don't fit in a JavaScript number, so they're exported as strings
+                    row = (str(row[0]),) + row[1:]
+                    if writer:
+                        writer.writerow(row)
+                    else:
+                        f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n')
+                    count += 1
+            os.replace(path + '.tmp', path)
+            counts[table] = count
+        conn.rollback()
+    finally:
+        conn.close()
+    return counts
+
+def _read_rows(path: str, fmt: str, columns: Tuple[str, ...]) -> Iterator[tuple]:
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            for record in csv.DictReader(f):
+                yield tuple(
+                    None if record.get(column) in (None, '') and column in NULLABLE else record.get(column)
+                    for column in columns
+                )
+        else:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield tuple(record.get(column) for column in columns)
+
+def _batches(rows: Iterator[tuple], size: int) -> Iterator[List[tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _balances(cur: sqlite3.Cursor, user_ids: List[Any]) -> Dict[str, int]:
+    balances = {}
+    for start in range(0, len(user_ids), 500):
+        chunk = user_ids[start:start + 500]
+        cur.execute(f"SELECT user_id, fapcoins FROM users WHERE user_id IN ({', '.join('?' * len(chunk))})", chunk)
+        balances.update((str(user_id), fapcoins) for user_id, fapcoins in cur.fetchall())
+    return balances
+
+def _import_batch(cur: sqlite3.Cursor, table: str, columns: Tuple[str, ...], rows: List[tuple], replace: bool):
+    placeholders = ', '.join('?' * len(columns))
+    if table != 'users':
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT OR IGNORE'
+        cur.executemany(f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        return
+
+    before = _balances(cur, [row[0] for row in rows])
+    if replace:
+        updates = ', '.join(f"{column} = excluded.{column}" for column in columns[1:])
+        cur.executemany(f"""
+            INSERT INTO users ({', '.join(columns)}) VALUES ({placeholders})
+            ON CONFLICT(user_id) DO UPDATE SET {updates}
+        """, rows)
+    else:
+        cur.executemany(f"INSERT OR IGNORE INTO users ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+    # Keep the coin ledger in step with the balances that changed
+    fapcoins = columns.index('fapcoins')
+    entries = []
+    for row in rows:
+        user_id = str(row[0])
+        if user_id in before and not replace:
+            continue
+        amount = int(row[fapcoins] or 0) - before.get(user_id, 0)
+        entries.append((user_id, amount, CoinReason.IMPORT))
+    coin_ledger.record_many(cur, entries)
+
+def import_tables(db_path: str, folder: str, fmt: str = 'jsonl', tables: Optional[List[str]] = None,
+                  batch: int = DEFAULT_BATCH, replace: bool = True) -> Dict[str, int]:
+    """
+    Load `<folder>/<table>.<fmt>` files written by `export_tables`. Tables without a file are skipped.
+
+    Args:
+        db_path (str): The database file; created and migrated if needed.
+        folder (str): Where the files are.
+        fmt (str): "jsonl" or "csv".
+        tables (Optional[List[str]]): Table names, all of TABLES by default.
+        batch (int): Rows written per transaction.
+        replace (bool): Overwrite rows that already exist instead of keeping them.
+
+    Returns:
+        Dict[str, int]: table -> rows read.
+    """
+    counts = {}
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        run_migrations(conn)
+        cur = conn.cursor()
+        # Users first, items and succubus refer to them
+        for table in tables or list(TABLES):
+            path = os.path.join(folder, f"{table}.{fmt}")
+            if not os.path.exists(path):
+                continue
+            columns = TABLES[table]
+            count = 0
+            for rows in _batches(_read_rows(path, fmt, columns), batch):
+                try:
+                    cur.execute("BEGIN IMMEDIATE")
+                    _import_batch(cur, table, columns, rows, replace)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                count += len(rows)
+            counts[table] = count
+    finally:
+        conn.close()
+    return counts
+
+def main():
+    # Shared by both commands; given after the command so --tables can't swallow it
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('folder')
+    options.add_argument('--format', choices=FORMATS, default='jsonl')
+    options.add_argument('--tables', nargs='+', choices=list(TABLES), help='tables to transfer (default: all)')
+    options.add_argument('--batch', type=int, default=DEFAULT_BATCH, help='rows per fetch or transaction')
+
+    parser = argparse.ArgumentParser(description='Export or import FapBot users, items and succubus.')
+    parser.add_argument('--db', default=os.path.join('data', 'fapbot.db'), help='database file')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('export', parents=[options], help='write the tables to a folder (safe while the bot runs)')
+    import_parser = subparsers.add_parser('import', parents=[options], help='load exported tables (stop the bot first)')
+    import_parser.add_argument('--on-conflict', choices=('replace', 'skip'), default='replace',
+                               help='what to do with rows that already exist')
+    args = parser.parse_args()
+
+    batch = max(1, args.batch)
+    if args.command == 'export':
+        counts = export_tables(args.db, args.folder, args.format, args.tables, batch)
+    else:
+        counts = import_tables(args.db, args.folder, args.format, args.tables, batch,
+                               replace=args.on_conflict == 'replace')
+    for table, count in counts.items():
+        print(f"{args.command.capitalize()}ed {count} rows of {table}")
+
+if __name__ == '__main__':
+    sys.exit(main())
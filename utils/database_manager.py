@@ -1,354 +1,1303 @@
 import sqlite3
 import json
+import queue
+import time
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Set, Tuple, Iterator, Iterable, Callable
+from .write_behind import WriteBehindQueue
+from .user_state_cache import UserStateCache
+from .migrations import run_migrations
+from .coin_ledger import CoinLedger, CoinReason, record as record_coins
+from .user_sampler import UserSampler
+from .query_stats import QueryStats, instrumented
+from .rows import UserRow, ScoreboardRow, ActiveSuccubusRow, UserSuccubusRow
+from . import user_archive
+
+# Pragmas applied to every connection handed out by the pool.
+# journal_mode=WAL is persistent in the database file, the others are per-connection.
+CONNECTION_PRAGMAS = (
+    # Only takes effect on a new file (or on the next full VACUUM), so it must come before WAL
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8000",       # ~8 MB page cache per connection
+    "PRAGMA mmap_size = 134217728",    # 128 MB memory-mapped I/O
+    "PRAGMA busy_timeout = 5000",      # wait up to 5s for the write lock
+    "PRAGMA temp_store = MEMORY",
+)
+
+class ConnectionPool:
+    """
+    Keeps up to `size` long-lived SQLite connections around for reuse.
+
+    When every pooled connection is in use an extra one is opened instead of
+    blocking, and it is closed again on release if the pool is already full.
+    """
+
+    def __init__(self, db_path: str, size: int = 4):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=self.size)
+        # Set before connections are opened to see every statement, e.g. by tests/test_query_plans.py
+        self.trace_callback: Optional[Callable[[str], None]] = None
+        # Applied on every acquire, so they can be swapped at runtime (see QueryStats)
+        self.row_factory: Callable[[sqlite3.Cursor, tuple], Any] = sqlite3.Row
+        self.tuple_factory: Optional[Callable[[sqlite3.Cursor, tuple], Any]] = None
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        if self.trace_callback:
+            conn.set_trace_callback(self.trace_callback)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        conn.row_factory = self.row_factory
+        return conn
+
+    def tuple_cursor(self, conn: sqlite3.Connection) -> sqlite3.Cursor:
+        """A cursor that returns plain tuples, for the queries that build row models."""
+        cur = conn.cursor()
+        cur.row_factory = self.tuple_factory
+        return cur
+
+    def release(self, conn: sqlite3.Connection):
+        # Never hand a connection with an open transaction to the next caller
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+# Ids per IN (...) list, well under SQLite's bound parameter limit
+BATCH_SIZE = 500
+
+def _chunks(ids: List[str], size: int = BATCH_SIZE) -> Iterator[List[str]]:
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+def _placeholders(values: List[Any]) -> str:
+    return ', '.join('?' * len(values))
+
+def _from_epoch(timestamp: Optional[int]) -> Optional[datetime]:
+    """Stored epoch seconds to the naive UTC datetime the bot works with."""
+    return datetime.utcfromtimestamp(timestamp) if timestamp is not None else None
+
+# In UserRow order; listed instead of * so new columns don't shift the tuples
+USER_COLUMNS = ("user_id, username, faps, score, fapcoins, last_daily, active_succubus, last_succubus_activation, "
+                "next_daily_at")
+
+def _fetch_user(cur: sqlite3.Cursor, user_id: str) -> Optional[UserRow]:
+    """Read a user with a tuple cursor (see ConnectionPool.tuple_cursor)."""
+    # A str id is converted by the column's INTEGER affinity; non-numeric ids match nothing
+    cur.execute(f"SELECT {USER_COLUMNS} FROM users WHERE user_id = ?", (user_id,))
+    result = cur.fetchone()
+    return UserRow.from_db(result) if result else None
+
+def _fetch_user_succubus(cur: sqlite3.Cursor, user_id: str) -> List[UserSuccubusRow]:
+    """Read a user's succubus with a tuple cursor."""
+    cur.execute("""
+        SELECT succubus_id, acquired_date, xp, level
+        FROM user_succubus
+        WHERE user_id = ?
+    """, (user_id,))
+    return [UserSuccubusRow(user_id, *row) for row in cur.fetchall()]
+
+def _fetch_items(cur: sqlite3.Cursor, user_id: str) -> Dict[str, int]:
+    """All item rows for a user, including empty ones, so pending deltas can be merged."""
+    cur.execute("SELECT item_name, quantity FROM items WHERE user_id = ?", (user_id,))
+    return dict(cur.fetchall())
+
+def _apply_user_delta(user: Optional[UserRow], delta: Optional[List[int]]) -> Optional[UserRow]:
+    if user and delta:
+        user.faps += delta[0]
+        user.score += delta[1]
+        user.fapcoins += delta[2]
+    return user
+
+def _apply_item_deltas(items: Dict[str, int], deltas: Dict[str, int]) -> Dict[str, int]:
+    for item_name, quantity in deltas.items():
+        items[item_name] = items.get(item_name, 0) + quantity
+    return {item_name: quantity for item_name, quantity in items.items() if quantity > 0}
+
+class Transaction:
+    """
+    Unit of work on a single pooled connection.
+
+    Created by `DatabaseManager.transaction()`. Every read and write inside
+    the `with` block runs in one BEGIN IMMEDIATE ... COMMIT, so a flow like
+    "check fapcoins, debit, add item" can't interleave with another command.
+    Cache updates are applied only once the commit succeeds.
+    """
+
+    def __init__(self, db: 'DatabaseManager'):
+        self.db = db
+        self.stats = db.stats
+        self.conn: Optional[sqlite3.Connection] = None
+        self.cur: Optional[sqlite3.Cursor] = None
+        self.rows: Optional[sqlite3.Cursor] = None
+        self._after_commit: List[Callable[[], None]] = []
+        self._cache_writes: List[str] = []
+        # Users already looked up in the archive by this transaction
+        self._live: Set[str] = set()
+
+    def begin(self) -> 'Transaction':
+        self.conn = self.db.pool.acquire()
+        self.cur = self.conn.cursor()
+        self.rows = self.db.pool.tuple_cursor(self.conn)
+        try:
+            # Take the write lock up front so reads can't go stale before our writes
+            self.cur.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self._release()
+            raise
+        return self
+
+    def commit(self):
+        try:
+            try:
+                if self.stats.enabled:
+                    start = time.perf_counter()
+                    self.conn.commit()
+                    self.stats.record_commit(time.perf_counter() - start)
+                else:
+                    self.conn.commit()
+            finally:
+                self._release()
+            for cache_update in self._after_commit:
+                cache_update()
+        finally:
+            self._end_cache_writes()
+
+    def rollback(self):
+        try:
+            self.conn.rollback()
+        finally:
+            self._release()
+            self._end_cache_writes()
+
+    def _release(self):
+        if self.conn is not None:
+            self.db.pool.release(self.conn)
+            self.conn = self.cur = self.rows = None
+
+    def __enter__(self) -> 'Transaction':
+        return self.begin()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def _end_cache_writes(self):
+        for user_id in self._cache_writes:
+            self.db.cache.end_write(user_id)
+        self._cache_writes.clear()
+
+    def _on_commit(self, method: str, user_id: str, *args, **kwargs):
+        """Queue a write-through cache update for after the commit."""
+        cache = self.db.cache
+        if cache:
+            # Until the update is applied, a fresh read would already include this write
+            cache.begin_write(user_id)
+            self._cache_writes.append(user_id)
+            self._after_commit.append(lambda: getattr(cache, method)(user_id, *args, **kwargs))
+
+    def _restore_archived(self, user_id: str) -> bool:
+        """
+        Move the user back from the archive before their rows are read or
+        written, so a command never acts on a user that seems missing. Only
+        the first call per user in a transaction does a lookup.
+
+        Returns:
+            bool: True if the user was archived and has been restored.
+        """
+        if user_id in self._live:
+            return False
+        self._live.add(user_id)
+        if not user_archive.restore(self.cur, user_id):
+            return False
+        self._on_commit('invalidate', user_id)
+        self._after_commit.append(lambda: self.db.sampler.add(user_id))
+        return True
+
+    def _pending_user(self, user_id: str) -> Optional[List[int]]:
+        # No lock needed: a flush swaps out the deltas it writes before its commit releases the
+        # write lock, so while we hold that lock the pending deltas are exactly the ones not in the rows
+        wb = self.db.write_behind
+        delta = wb.user_delta(user_id) if wb else None
+        return list(delta) if delta else None
+
+    # Reads
+    @instrumented
+    def get_user(self, user_id: str) -> Optional[UserRow]:
+        self._restore_archived(user_id)
+        return _apply_user_delta(_fetch_user(self.rows, user_id), self._pending_user(user_id))
+
+    @instrumented
+    def get_fapcoins(self, user_id: str) -> int:
+        user = self.get_user(user_id)
+        return user.fapcoins if user else 0
+
+    @instrumented
+    def get_last_daily(self, user_id: str) -> Optional[datetime]:
+        user = self.get_user(user_id)
+        return _from_epoch(user.last_daily) if user else None
+
+    @instrumented
+    def get_active_succubus(self, user_id: str) -> Optional[str]:
+        user = self.get_user(user_id)
+        return user.active_succubus if user else None
+
+    @instrumented
+    def get_user_items(self, user_id: str) -> Dict[str, int]:
+        self._restore_archived(user_id)
+        wb = self.db.write_behind
+        deltas = dict(wb.item_deltas(user_id)) if wb else {}
+        return _apply_item_deltas(_fetch_items(self.rows, user_id), deltas)
+
+    @instrumented
+    def get_user_succubus(self, user_id: str) -> List[UserSuccubusRow]:
+        self._restore_archived(user_id)
+        return _fetch_user_succubus(self.rows, user_id)
+
+    # Writes
+    @instrumented
+    def create_or_update_user(self, user_id: str, username: str):
+        self._restore_archived(user_id)
+        self.cur.execute("""
+            INSERT INTO users (user_id, username, last_seen)
+            VALUES (?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET username = excluded.username, last_seen = excluded.last_seen
+        """, (user_id, username, int(time.time())))
+        self._on_commit('update_user', user_id, username=username)
+        self._after_commit.append(lambda: self.db.sampler.add(user_id))
+
+    @instrumented
+    def update_user_score(self, user_id: str, faps: int, score: int):
+        self._restore_archived(user_id)
+        # Pending write-behind deltas still get added on flush, so store the target minus them
+        delta = self._pending_user(user_id) or [0, 0, 0]
+        self.cur.execute("""
+            UPDATE users
+            SET faps = ?, score = ?
+            WHERE user_id = ?
+        """, (faps - delta[0], score - delta[1], user_id))
+        self._on_commit('update_user', user_id, faps=faps, score=score)
+
+    @instrumented
+    def update_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER):
+        self._restore_archived(user_id)
+        self.cur.execute("""
+            UPDATE users
+            SET fapcoins = fapcoins + ?
+            WHERE user_id = ?
+        """, (amount, user_id))
+        if self.cur.rowcount:
+            record_coins(self.cur, user_id, amount, reason)
+        self._on_commit('add_to_user', user_id, fapcoins=amount)
+
+    @instrumented
+    def update_item_quantity(self, user_id: str, item_name: str, quantity: int):
+        self._restore_archived(user_id)
+        self.cur.execute("""
+            INSERT INTO items (user_id, item_name, quantity)
+            VALUES (?, ?, ?)
+            ON CONFLICT(user_id, item_name)
+            DO UPDATE SET quantity = quantity + ?
+        """, (user_id, item_name, quantity, quantity))
+        self._on_commit('add_item', user_id, item_name, quantity)
+
+    @instrumented
+    def add_user_score(self, user_id: str, faps: int = 0, score: int = 0,
+                       min_score: Optional[int] = None) -> Optional[Dict[str, int]]:
+        self._restore_archived(user_id)
+        delta = self._pending_user(user_id) or [0, 0, 0]
+        # Stored values exclude pending deltas, so shift the floor by them too
+        floor = min_score - delta[1] if min_score is not None else None
+        self.cur.execute("""
+            UPDATE users
+            SET faps = faps + ?, score = CASE WHEN ? IS NULL THEN score + ? ELSE MAX(?, score + ?) END
+            WHERE user_id = ?
+            RETURNING faps, score
+        """, (faps, floor, score, floor, score, user_id))
+        result = self.cur.fetchone()
+        if not result:
+            return None
+        new_faps, new_score = result['faps'] + delta[0], result['score'] + delta[1]
+        if min_score is not None and new_score <= min_score:
+            # The floor may have kicked in, so the applied delta is unknown
+            self._on_commit('update_user', user_id, faps=new_faps, score=new_score)
+        else:
+            self._on_commit('add_to_user', user_id, faps=faps, score=score)
+        return {'faps': new_faps, 'score': new_score}
+
+    @instrumented
+    def add_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER) -> Optional[int]:
+        self._restore_archived(user_id)
+        self.cur.execute("""
+            UPDATE users
+            SET fapcoins = fapcoins + ?
+            WHERE user_id = ?
+            RETURNING fapcoins
+        """, (amount, user_id))
+        result = self.cur.fetchone()
+        if not result:
+            return None
+        record_coins(self.cur, user_id, amount, reason)
+        self._on_commit('add_to_user', user_id, fapcoins=amount)
+        delta = self._pending_user(user_id)
+        return result['fapcoins'] + (delta[2] if delta else 0)
+
+    @instrumented
+    def add_item_quantity(self, user_id: str, item_name: str, quantity: int) -> int:
+        self._restore_archived(user_id)
+        self.cur.execute("""
+            INSERT INTO items (user_id, item_name, quantity)
+            VALUES (?, ?, ?)
+            ON CONFLICT(user_id, item_name)
+            DO UPDATE SET quantity = quantity + ?
+            RETURNING quantity
+        """, (user_id, item_name, quantity, quantity))
+        new_quantity = self.cur.fetchone()['quantity']
+        self._on_commit('add_item', user_id, item_name, quantity)
+        wb = self.db.write_behind
+        return new_quantity + (wb.item_deltas(user_id).get(item_name, 0) if wb else 0)
+
+    @instrumented
+    def update_daily_timestamp(self, user_id: str, cooldown_hours: float = 12):
+        self._restore_archived(user_id)
+        current_time = int(time.time())
+        next_daily_at = current_time + int(cooldown_hours * 3600)
+        self.cur.execute("""
+            UPDATE users
+            SET last_daily = ?, next_daily_at = ?
+            WHERE user_id = ?
+        """, (current_time, next_daily_at, user_id))
+        self._on_commit('update_user', user_id, last_daily=current_time, next_daily_at=next_daily_at)
+
+    @instrumented
+    def init_next_daily(self, user_id: str, cooldown_hours: float = 12):
+        self._restore_archived(user_id)
+        self.cur.execute("""
+            UPDATE users
+            SET next_daily_at = COALESCE(last_daily + ?, ?)
+            WHERE user_id = ? AND next_daily_at IS NULL
+            RETURNING next_daily_at
+        """, (int(cooldown_hours * 3600), int(time.time()), user_id))
+        result = self.cur.fetchone()
+        if result:
+            self._on_commit('update_user', user_id, next_daily_at=result['next_daily_at'])
+
+    @instrumented
+    def take_dailies_due(self, succubus_id: str, now: int) -> List[str]:
+        self.cur.execute("""
+            UPDATE users
+            SET next_daily_at = NULL
+            WHERE active_succubus = ? AND next_daily_at <= ?
+            RETURNING user_id
+        """, (succubus_id, now))
+        user_ids = [str(row[0]) for row in self.cur.fetchall()]
+        for user_id in user_ids:
+            self._on_commit('update_user', user_id, next_daily_at=None)
+        return user_ids
+
+    @instrumented
+    def activate_succubus(self, user_id: str, succubus_id: str) -> bool:
+        self._restore_archived(user_id)
+        # Verifica se o usuário possui essa succubus
+        self.cur.execute("""
+            SELECT COUNT(*) as count FROM user_succubus
+            WHERE user_id = ? AND succubus_id = ?
+        """, (user_id, succubus_id))
+
+        result = self.cur.fetchone()
+        if not result or result['count'] == 0:
+            return False
+
+        # Usar UTC para consistência
+        current_time = int(time.time())
+
+        # Ativa a succubus e atualiza o timestamp
+        self.cur.execute("""
+            UPDATE users
+            SET active_succubus = ?,
+                last_succubus_activation = ?
+            WHERE user_id = ?
+        """, (succubus_id, current_time, user_id))
+        self._on_commit('update_user', user_id, active_succubus=succubus_id, last_succubus_activation=current_time)
+        return True
+
+    @instrumented
+    def update_succubus_xp(self, user_id: str, succubus_id: str, new_xp: int):
+        self._restore_archived(user_id)
+        self.cur.execute("""
+            UPDATE user_succubus
+            SET xp = ?
+            WHERE user_id = ? AND succubus_id = ?
+        """, (new_xp, user_id, succubus_id))
+
+    @instrumented
+    def update_succubus_level(self, user_id: str, succubus_id: str, new_level: int, new_xp: int):
+        self._restore_archived(user_id)
+        self.cur.execute("""
+            UPDATE user_succubus
+            SET level = ?, xp = ?
+            WHERE user_id = ? AND succubus_id = ?
+        """, (new_level, new_xp, user_id, succubus_id))
+
+    @instrumented
+    def add_succubus_xp(self, user_id: str, succubus_id: str, xp: int) -> Optional[Dict[str, int]]:
+        self._restore_archived(user_id)
+        self.cur.execute("""
+            UPDATE user_succubus
+            SET xp = xp + ?
+            WHERE user_id = ? AND succubus_id = ?
+            RETURNING xp, level
+        """, (xp, user_id, succubus_id))
+        result = self.cur.fetchone()
+        return dict(result) if result else None
+
+    @instrumented
+    def add_user_succubus(self, user_id: str, succubus_id: str, xp: int = 0, level: int = 1):
+        self._restore_archived(user_id)
+        self.cur.execute("""
+            INSERT INTO user_succubus (user_id, succubus_id, xp, level)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, succubus_id) DO NOTHING
+        """, (user_id, succubus_id, xp, level))
+
+    # Archive
+    @instrumented
+    def archive_inactive_users(self, cutoff: int, limit: int) -> List[str]:
+        user_ids = user_archive.archive(self.cur, cutoff, limit)
+        # A later lookup in this transaction has to find them in the archive again
+        self._live.difference_update(user_ids)
+        for user_id in user_ids:
+            self._on_commit('invalidate', user_id)
+            self._after_commit.append(lambda user_id=user_id: self.db.sampler.remove(user_id))
+        return user_ids
+
+    @instrumented
+    def restore_archived_user(self, user_id: str) -> bool:
+        return self._restore_archived(user_id)
 
 class DatabaseManager:
-    def __init__(self, db_path: str = 'data/fapbot.db'):
+    def __init__(self, db_path: str = 'data/fapbot.db', pool_size: int = 4,
+                 write_behind: bool = False, flush_interval_ms: int = 50, flush_max_ops: int = 256,
+                 cache_size: int = 0, cache_ttl: float = 300, query_stats: bool = False):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, pool_size)
         self.setup_database()
 
+        # Per-method call counts and latencies, can be switched on and off at runtime
+        self.stats = QueryStats(self.pool)
+        if query_stats:
+            self.stats.enable()
+
+        # Optional group commit for fapcoins, score and item counters
+        self.write_behind = WriteBehindQueue(self, flush_interval_ms, flush_max_ops) if write_behind else None
+
+        # Optional read-through cache of user rows and items, kept current by every mutation
+        self.cache = UserStateCache(cache_size, cache_ttl) if cache_size > 0 else None
+
+        # Audit trail of every fapcoin change, see CoinLedger
+        self.ledger = CoinLedger(self)
+
+        # Constant-time random user selection, loaded on first use
+        self.sampler = UserSampler(self.get_all_users)
+
     def get_connection(self) -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
+        """
+        Open a standalone connection that the caller is responsible for closing.
+        Kept for scripts; bot code should use `connection()` instead.
+        """
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         return conn, conn.cursor()
 
+    @contextmanager
+    def connection(self) -> Iterator[Tuple[sqlite3.Connection, sqlite3.Cursor]]:
+        """Borrow a pooled connection for the duration of the `with` block."""
+        conn = self.pool.acquire()
+        try:
+            yield conn, conn.cursor()
+        finally:
+            self.pool.release(conn)
+
+    @contextmanager
+    def tuple_cursor(self) -> Iterator[sqlite3.Cursor]:
+        """Borrow a pooled connection with a cursor that returns plain tuples, for building row models."""
+        conn = self.pool.acquire()
+        try:
+            yield self.pool.tuple_cursor(conn)
+        finally:
+            self.pool.release(conn)
+
+    def transaction(self) -> Transaction:
+        """
+        Run several reads and writes with a single commit:
+
+            with db.transaction() as tx:
+                if tx.get_fapcoins(user_id) >= cost:
+                    tx.update_fapcoins(user_id, -cost)
+                    tx.update_item_quantity(user_id, item, 1)
+        """
+        return Transaction(self)
+
+    def close(self):
+        """Flush pending writes and close every idle pooled connection."""
+        if self.write_behind:
+            self.write_behind.close()
+        self.pool.close()
+
     def setup_database(self):
-        conn, cur = self.get_connection()
-        
-        # Create tables
-        cur.executescript("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id TEXT PRIMARY KEY,
-                username TEXT NOT NULL,
-                faps INTEGER DEFAULT 0,
-                score INTEGER DEFAULT 0,
-                fapcoins INTEGER DEFAULT 0,
-                last_daily TIMESTAMP,
-                active_succubus TEXT,
-                last_succubus_activation TIMESTAMP
-            );
-
-            CREATE TABLE IF NOT EXISTS items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT,
-                item_name TEXT,
-                quantity INTEGER DEFAULT 0,
-                FOREIGN KEY (user_id) REFERENCES users(user_id),
-                UNIQUE(user_id, item_name)
-            );
-
-            CREATE TABLE IF NOT EXISTS user_succubus (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT,
-                succubus_id TEXT,
-                acquired_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                xp INTEGER DEFAULT 0,
-                level INTEGER DEFAULT 1,
-                FOREIGN KEY (user_id) REFERENCES users(user_id),
-                UNIQUE(user_id, succubus_id)
-            );
-        """)
-        
-        conn.commit()
-        conn.close()
+        """Create the tables or migrate an existing database to the current schema."""
+        with self.connection() as (conn, cur):
+            run_migrations(conn)
 
     # User methods
-    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
-        conn, cur = self.get_connection()
-        cur.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-        result = cur.fetchone()
-        conn.close()
-        return dict(result) if result else None
+    @instrumented
+    def get_user(self, user_id: str) -> Optional[UserRow]:
+        if self.cache:
+            hit, user = self.cache.get_user(user_id)
+            if hit:
+                return user
+            token = self.cache.begin(user_id)
+            user = self._read_user(user_id)
+            self.cache.fill_user(user_id, token, user)
+            return user
+        return self._read_user(user_id)
+
+    def _read_user(self, user_id: str) -> Optional[UserRow]:
+        wb = self.write_behind
+        if wb and wb.has_pending(user_id):
+            # Read and merge under the queue lock so a flush can't double count
+            with wb.lock, self.tuple_cursor() as cur:
+                return _apply_user_delta(_fetch_user(cur, user_id), wb.user_delta(user_id))
+        with self.tuple_cursor() as cur:
+            return _fetch_user(cur, user_id)
 
+    def _get_live_user(self, user_id: str) -> Optional[UserRow]:
+        """get_user for a write: an archived user is restored first, as transactions do."""
+        user = self.get_user(user_id)
+        # Only a miss can be an archived user, so hits cost nothing extra
+        if user is None and self.restore_archived_user(user_id):
+            user = self.get_user(user_id)
+        return user
+
+    @instrumented
     def create_or_update_user(self, user_id: str, username: str):
-        conn, cur = self.get_connection()
-        cur.execute("""
-            INSERT INTO users (user_id, username)
-            VALUES (?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET username = ?
-        """, (user_id, username, username))
-        conn.commit()
-        conn.close()
+        with self.transaction() as tx:
+            tx.create_or_update_user(user_id, username)
 
+    @instrumented
     def update_user_score(self, user_id: str, faps: int, score: int):
-        conn, cur = self.get_connection()
-        cur.execute("""
-            UPDATE users 
-            SET faps = ?, score = ?
-            WHERE user_id = ?
-        """, (faps, score, user_id))
-        conn.commit()
-        conn.close()
-
-    def get_scoreboard(self) -> List[Dict[str, Any]]:
-        conn, cur = self.get_connection()
-        cur.execute("""
-            SELECT user_id, username, faps, score
-            FROM users
-            WHERE faps > 0
-            ORDER BY score ASC, username ASC
-        """)
-        result = [dict(row) for row in cur.fetchall()]
-        conn.close()
-        return result
+        if self.write_behind:
+            # Queue the difference to the visible value so it coalesces with other deltas
+            with self.write_behind.lock:
+                user = self._get_live_user(user_id)
+                if user:
+                    self.write_behind.add_user_delta(user_id, faps - user.faps, score - user.score)
+                    if self.cache:
+                        self.cache.update_user(user_id, faps=faps, score=score)
+            return
+
+        with self.transaction() as tx:
+            tx.update_user_score(user_id, faps, score)
+
+    @instrumented
+    def add_user_score(self, user_id: str, faps: int = 0, score: int = 0,
+                       min_score: Optional[int] = None) -> Optional[Dict[str, int]]:
+        """
+        Add to a user's faps and score and return the new values.
+
+        Args:
+            user_id (str): The Discord user ID.
+            faps (int): Faps to add.
+            score (int): Points to add, negative to remove.
+            min_score (Optional[int]): Floor for the resulting score.
+
+        Returns:
+            Optional[Dict[str, int]]: The new 'faps' and 'score', or None if the user does not exist.
+        """
+        if self.write_behind:
+            with self.write_behind.lock:
+                user = self._get_live_user(user_id)
+                if not user:
+                    return None
+                new_faps = user.faps + faps
+                new_score = user.score + score
+                if min_score is not None:
+                    new_score = max(min_score, new_score)
+                self.write_behind.add_user_delta(user_id, faps, new_score - user.score)
+                if self.cache:
+                    self.cache.update_user(user_id, faps=new_faps, score=new_score)
+                return {'faps': new_faps, 'score': new_score}
+
+        with self.transaction() as tx:
+            return tx.add_user_score(user_id, faps, score, min_score)
+
+    @instrumented
+    def get_scoreboard(self) -> List[ScoreboardRow]:
+        if self.write_behind:
+            self.write_behind.flush()
 
+        with self.tuple_cursor() as cur:
+            cur.execute("""
+                SELECT user_id, username, faps, score
+                FROM users
+                WHERE faps > 0
+                ORDER BY score ASC, username ASC
+            """)
+            return [ScoreboardRow(str(user_id), username, faps, score) for user_id, username, faps, score in cur.fetchall()]
+
+    @instrumented
     def get_all_users(self) -> List[str]:
-        conn, cur = self.get_connection()
-        cur.execute("SELECT user_id FROM users")
-        result = [row['user_id'] for row in cur.fetchall()]
-        conn.close()
-        return result
+        with self.tuple_cursor() as cur:
+            cur.execute("SELECT user_id FROM users")
+            return [str(user_id) for user_id, in cur.fetchall()]
+
+    @instrumented
+    def sample_user(self, exclude: Optional[str] = None, seen_within: Optional[float] = None) -> Optional[str]:
+        """
+        Pick a uniformly random user in constant time, without loading every id.
+
+        Args:
+            exclude (Optional[str]): A user that must not be picked, e.g. the caller.
+            seen_within (Optional[float]): Only pick users seen in the last `seen_within`
+                seconds (tracked since the bot started).
+
+        Returns:
+            Optional[str]: A user ID, or None if there is no other user.
+        """
+        return self.sampler.sample(exclude, seen_within)
+
+    @instrumented
+    def get_users_with_active_succubus(self) -> List[ActiveSuccubusRow]:
+        with self.tuple_cursor() as cur:
+            cur.execute("SELECT user_id, active_succubus FROM users WHERE active_succubus IS NOT NULL")
+            return [ActiveSuccubusRow(str(user_id), succubus_id) for user_id, succubus_id in cur.fetchall()]
+
+    @instrumented
+    def get_active_user_ids(self, succubus_id: str) -> List[str]:
+        """
+        Every user whose active succubus is `succubus_id`, in one query.
+
+        Returns:
+            List[str]: The user IDs, in no particular order.
+        """
+        with self.tuple_cursor() as cur:
+            cur.execute("SELECT user_id FROM users WHERE active_succubus = ?", (succubus_id,))
+            return [str(user_id) for (user_id,) in cur.fetchall()]
+
+    # Batch methods
+    @instrumented
+    def get_users_many(self, user_ids: Iterable[str]) -> Dict[str, UserRow]:
+        """
+        Fetch many users with one query per BATCH_SIZE ids.
+
+        Args:
+            user_ids (Iterable[str]): Discord user IDs.
+
+        Returns:
+            Dict[str, UserRow]: user_id -> user row, without the users that don't exist.
+        """
+        ids = list(dict.fromkeys(user_ids))
+        users: Dict[str, UserRow] = {}
+        tokens: Dict[str, object] = {}
+        if self.cache:
+            misses = []
+            for user_id in ids:
+                hit, user = self.cache.get_user(user_id)
+                if not hit:
+                    misses.append(user_id)
+                    tokens[user_id] = self.cache.begin(user_id)
+                elif user:
+                    users[user_id] = user
+            ids = misses
+
+        fetched = self._read_users_many(ids)
+        for user_id, token in tokens.items():
+            self.cache.fill_user(user_id, token, fetched.get(user_id))
+        users.update(fetched)
+        return users
+
+    def _read_users_many(self, user_ids: List[str]) -> Dict[str, UserRow]:
+        users: Dict[str, UserRow] = {}
+        if not user_ids:
+            return users
+        wb = self.write_behind
+        # Hold the queue lock so a flush can't commit between the reads and the merge
+        with wb.lock if wb else nullcontext(), self.tuple_cursor() as cur:
+            for chunk in _chunks(user_ids):
+                cur.execute(f"SELECT {USER_COLUMNS} FROM users WHERE user_id IN ({_placeholders(chunk)})", chunk)
+                for row in cur.fetchall():
+                    user = UserRow.from_db(row)
+                    users[user.user_id] = _apply_user_delta(user, wb.user_delta(user.user_id) if wb else None)
+        return users
+
+    @instrumented
+    def get_active_succubus_many(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Fetch the active succubus of many users.
+
+        Returns:
+            Dict[str, str]: user_id -> succubus_id, only for users with an active succubus.
+        """
+        if self.cache:
+            users = self.get_users_many(user_ids)
+            return {user_id: user.active_succubus for user_id, user in users.items() if user.active_succubus}
+
+        active: Dict[str, str] = {}
+        with self.tuple_cursor() as cur:
+            for chunk in _chunks(list(dict.fromkeys(user_ids))):
+                cur.execute(f"""
+                    SELECT user_id, active_succubus
+                    FROM users
+                    WHERE user_id IN ({_placeholders(chunk)}) AND active_succubus IS NOT NULL
+                """, chunk)
+                active.update((str(user_id), succubus_id) for user_id, succubus_id in cur.fetchall())
+        return active
+
+    @instrumented
+    def get_items_many(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        """
+        Fetch the items of many users.
+
+        Returns:
+            Dict[str, Dict[str, int]]: user_id -> {item_name: quantity} for every requested user,
+            empty when the user has no items.
+        """
+        ids = list(dict.fromkeys(user_ids))
+        items: Dict[str, Dict[str, int]] = {}
+        tokens: Dict[str, object] = {}
+        if self.cache:
+            misses = []
+            for user_id in ids:
+                hit, user_items = self.cache.get_items(user_id)
+                if hit:
+                    items[user_id] = user_items
+                else:
+                    misses.append(user_id)
+                    tokens[user_id] = self.cache.begin(user_id)
+            ids = misses
+
+        fetched = self._read_items_many(ids)
+        for user_id, token in tokens.items():
+            self.cache.fill_items(user_id, token, fetched[user_id])
+        items.update(fetched)
+        return items
+
+    def _read_items_many(self, user_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        stored: Dict[str, Dict[str, int]] = {user_id: {} for user_id in user_ids}
+        if not user_ids:
+            return stored
+        wb = self.write_behind
+        with wb.lock if wb else nullcontext(), self.tuple_cursor() as cur:
+            for chunk in _chunks(user_ids):
+                # Empty rows are kept so pending deltas can be merged into them
+                cur.execute(f"""
+                    SELECT user_id, item_name, quantity
+                    FROM items
+                    WHERE user_id IN ({_placeholders(chunk)})
+                """, chunk)
+                for user_id, item_name, quantity in cur.fetchall():
+                    stored[str(user_id)][item_name] = quantity
+            return {
+                user_id: _apply_item_deltas(user_items, dict(wb.item_deltas(user_id)) if wb else {})
+                for user_id, user_items in stored.items()
+            }
+
+    def iter_users_with_active_succubus(self, succubus_id: str, batch_size: int = BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every user whose active succubus is `succubus_id`, one page at a time.
+
+        Each page is a separate short query (keyset pagination on user_id), so
+        no connection is held between pages. It blocks while fetching a page:
+        from the event loop, wrap it as `await async_db.run(list, db.iter_users_with_active_succubus(...))`.
+
+        Yields:
+            Dict[str, Any]: user_id and last_succubus_activation (as a datetime).
+        """
+        last_id = -1
+        while True:
+            with self.tuple_cursor() as cur:
+                cur.execute("""
+                    SELECT user_id, last_succubus_activation
+                    FROM users
+                    WHERE active_succubus = ? AND user_id > ?
+                    ORDER BY user_id
+                    LIMIT ?
+                """, (succubus_id, last_id, batch_size))
+                rows = cur.fetchall()
+            for user_id, activated in rows:
+                yield {'user_id': str(user_id), 'last_succubus_activation': _from_epoch(activated)}
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
 
     # Item methods
+    @instrumented
     def get_user_items(self, user_id: str) -> Dict[str, int]:
-        conn, cur = self.get_connection()
-        cur.execute("""
-            SELECT item_name, quantity
-            FROM items
-            WHERE user_id = ? AND quantity > 0
-        """, (user_id,))
-        items = {row['item_name']: row['quantity'] for row in cur.fetchall()}
-        conn.close()
-        return items
+        if self.cache:
+            hit, items = self.cache.get_items(user_id)
+            if hit:
+                return items
+            token = self.cache.begin(user_id)
+            items = self._read_user_items(user_id)
+            self.cache.fill_items(user_id, token, items)
+            return items
+        return self._read_user_items(user_id)
+
+    def _read_user_items(self, user_id: str) -> Dict[str, int]:
+        wb = self.write_behind
+        if wb and wb.has_pending(user_id):
+            with wb.lock, self.tuple_cursor() as cur:
+                return _apply_item_deltas(_fetch_items(cur, user_id), wb.item_deltas(user_id))
+
+        with self.tuple_cursor() as cur:
+            cur.execute("""
+                SELECT item_name, quantity
+                FROM items
+                WHERE user_id = ? AND quantity > 0
+            """, (user_id,))
+            return dict(cur.fetchall())
 
+    @instrumented
     def update_item_quantity(self, user_id: str, item_name: str, quantity: int):
-        conn, cur = self.get_connection()
-        cur.execute("""
-            INSERT INTO items (user_id, item_name, quantity)
-            VALUES (?, ?, ?)
-            ON CONFLICT(user_id, item_name) 
-            DO UPDATE SET quantity = quantity + ?
-        """, (user_id, item_name, quantity, quantity))
-        conn.commit()
-        conn.close()
+        if self.write_behind:
+            with self.write_behind.lock:
+                self.write_behind.add_item_delta(user_id, item_name, quantity)
+                if self.cache:
+                    self.cache.add_item(user_id, item_name, quantity)
+            return
+
+        with self.transaction() as tx:
+            tx.update_item_quantity(user_id, item_name, quantity)
+
+    @instrumented
+    def add_item_quantity(self, user_id: str, item_name: str, quantity: int) -> int:
+        """Add to an item quantity and return the new quantity."""
+        if self.write_behind:
+            with self.write_behind.lock:
+                self.update_item_quantity(user_id, item_name, quantity)
+                with self.connection() as (conn, cur):
+                    cur.execute("SELECT quantity FROM items WHERE user_id = ? AND item_name = ?", (user_id, item_name))
+                    result = cur.fetchone()
+                return (result['quantity'] if result else 0) + self.write_behind.item_deltas(user_id).get(item_name, 0)
+
+        with self.transaction() as tx:
+            return tx.add_item_quantity(user_id, item_name, quantity)
 
     # Fapcoin methods
+    @instrumented
     def get_fapcoins(self, user_id: str) -> int:
-        conn, cur = self.get_connection()
-        cur.execute("SELECT fapcoins FROM users WHERE user_id = ?", (user_id,))
-        result = cur.fetchone()
-        conn.close()
+        if self.cache or (self.write_behind and self.write_behind.has_pending(user_id)):
+            user = self.get_user(user_id)
+            return user.fapcoins if user else 0
+
+        with self.connection() as (conn, cur):
+            cur.execute("SELECT fapcoins FROM users WHERE user_id = ?", (user_id,))
+            result = cur.fetchone()
         return result['fapcoins'] if result else 0
 
-    def update_fapcoins(self, user_id: str, amount: int):
-        conn, cur = self.get_connection()
-        cur.execute("""
-            UPDATE users 
-            SET fapcoins = fapcoins + ?
-            WHERE user_id = ?
-        """, (amount, user_id))
-        conn.commit()
-        conn.close()
+    @instrumented
+    def update_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER):
+        if self.write_behind:
+            # Hold the queue lock until the cache has the delta too, or a read in between counts it twice
+            with self.write_behind.lock:
+                self.write_behind.add_user_delta(user_id, fapcoins=amount, reason=reason)
+                if self.cache:
+                    self.cache.add_to_user(user_id, fapcoins=amount)
+            return
+
+        with self.transaction() as tx:
+            tx.update_fapcoins(user_id, amount, reason)
+
+    @instrumented
+    def add_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER) -> Optional[int]:
+        """
+        Add (or, with a negative amount, remove) fapcoins and return the new balance.
+
+        Args:
+            user_id (str): The Discord user ID.
+            amount (int): Fapcoins to add.
+            reason (str): A CoinReason code recorded in the coin ledger.
 
-    def update_daily_timestamp(self, user_id: str):
+        Returns:
+            Optional[int]: The new balance, or None if the user does not exist.
+        """
+        if self.write_behind:
+            with self.write_behind.lock:
+                # Don't queue a delta for a missing user, it would land on them once they're created
+                user = self._get_live_user(user_id)
+                if not user:
+                    return None
+                self.update_fapcoins(user_id, amount, reason)
+                return user.fapcoins + amount
+
+        with self.transaction() as tx:
+            return tx.add_fapcoins(user_id, amount, reason)
+
+    @instrumented
+    def update_daily_timestamp(self, user_id: str, cooldown_hours: float = 12):
         """
         Update the last_daily timestamp for a user.
         Using current UTC time for consistency.
+
+        Args:
+            user_id (str): The Discord user ID.
+            cooldown_hours (float): Hours until the next daily, stored as next_daily_at.
         """
-        current_time = datetime.utcnow().isoformat()
-        conn, cur = self.get_connection()
-        cur.execute("""
-            UPDATE users 
-            SET last_daily = ?
-            WHERE user_id = ?
-        """, (current_time, user_id))
-        conn.commit()
-        conn.close()
+        with self.transaction() as tx:
+            tx.update_daily_timestamp(user_id, cooldown_hours)
 
+    @instrumented
     def get_last_daily(self, user_id: str) -> Optional[datetime]:
-        conn, cur = self.get_connection()
-        cur.execute("SELECT last_daily FROM users WHERE user_id = ?", (user_id,))
-        result = cur.fetchone()
-        conn.close()
-        
-        last_daily = datetime.fromisoformat(result['last_daily']) if result and result['last_daily'] else None
-        
+        if self.cache:
+            user = self.get_user(user_id)
+            return _from_epoch(user.last_daily) if user else None
+
+        with self.connection() as (conn, cur):
+            cur.execute("SELECT last_daily FROM users WHERE user_id = ?", (user_id,))
+            result = cur.fetchone()
+
+        last_daily = _from_epoch(result['last_daily']) if result else None
+
         return last_daily
 
+    @instrumented
+    def get_next_daily_due(self, succubus_id: str) -> Optional[int]:
+        """
+        The earliest next_daily_at among users with `succubus_id` active.
+
+        Returns:
+            Optional[int]: Epoch seconds, or None if none of them has a daily coming.
+        """
+        with self.tuple_cursor() as cur:
+            cur.execute("""
+                SELECT MIN(next_daily_at)
+                FROM users
+                WHERE active_succubus = ? AND next_daily_at IS NOT NULL
+            """, (succubus_id,))
+            return cur.fetchone()[0]
+
+    @instrumented
+    def init_next_daily(self, user_id: str, cooldown_hours: float = 12):
+        """
+        Set next_daily_at, if it is NULL, to when the user's daily is available:
+        one cooldown after the last claim, or now if they never claimed one.
+        A NULL left by `take_dailies_due` is set again too, so a daily that was
+        announced and not claimed is announced once more.
+
+        Args:
+            user_id (str): The Discord user ID.
+            cooldown_hours (float): Hours between dailies.
+        """
+        with self.transaction() as tx:
+            tx.init_next_daily(user_id, cooldown_hours)
+
+    @instrumented
+    def take_dailies_due(self, succubus_id: str, now: int) -> List[str]:
+        """
+        Clear next_daily_at for the users with `succubus_id` active whose daily
+        is available by `now`, so each daily is announced once.
+
+        Args:
+            succubus_id (str): The active succubus to look at.
+            now (int): Epoch seconds.
+
+        Returns:
+            List[str]: The user IDs whose daily is available.
+        """
+        with self.transaction() as tx:
+            return tx.take_dailies_due(succubus_id, now)
+
     # Succubus methods
+    @instrumented
     def add_available_succubus(self, succubus_data: Dict[str, Any]):
-        conn, cur = self.get_connection()
-        cur.execute("""
-            INSERT INTO available_succubus 
-            (succubus_id, name, image_url, ability, ability_description, 
-             burden, burden_description, rarity)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(succubus_id) DO UPDATE SET
-                name = ?, image_url = ?, ability = ?, ability_description = ?,
-                burden = ?, burden_description = ?, rarity = ?
-        """, (
-            succubus_data['id'], succubus_data['name'], succubus_data['image'],
-            succubus_data['ability'], succubus_data['ability_description'],
-            succubus_data['burden'], succubus_data['burden_description'],
-            succubus_data['rarity'],
-            succubus_data['name'], succubus_data['image'],
-            succubus_data['ability'], succubus_data['ability_description'],
-            succubus_data['burden'], succubus_data['burden_description'],
-            succubus_data['rarity']
-        ))
-        conn.commit()
-        conn.close()
-
-    def get_user_succubus(self, user_id: str) -> List[Dict[str, Any]]:
-        conn, cur = self.get_connection()
-        cur.execute("""
-            SELECT succubus_id, acquired_date, xp, level
-            FROM user_succubus
-            WHERE user_id = ?
-        """, (user_id,))
-        result = [dict(row) for row in cur.fetchall()]
-        conn.close()
-        return result
-
-    def add_user_succubus(self, user_id: str, succubus_id: str):
-        conn, cur = self.get_connection()
-        cur.execute("""
-            INSERT INTO user_succubus (user_id, succubus_id)
-            VALUES (?, ?)
-            ON CONFLICT(user_id, succubus_id) DO NOTHING
-        """, (user_id, succubus_id))
-        conn.commit()
-        conn.close()
+        with self.connection() as (conn, cur):
+            cur.execute("""
+                INSERT INTO available_succubus
+                (succubus_id, name, image_url, ability, ability_description,
+                 burden, burden_description, rarity)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(succubus_id) DO UPDATE SET
+                    name = ?, image_url = ?, ability = ?, ability_description = ?,
+                    burden = ?, burden_description = ?, rarity = ?
+            """, (
+                succubus_data['id'], succubus_data['name'], succubus_data['image'],
+                succubus_data['ability'], succubus_data['ability_description'],
+                succubus_data['burden'], succubus_data['burden_description'],
+                succubus_data['rarity'],
+                succubus_data['name'], succubus_data['image'],
+                succubus_data['ability'], succubus_data['ability_description'],
+                succubus_data['burden'], succubus_data['burden_description'],
+                succubus_data['rarity']
+            ))
+            conn.commit()
+
+    @instrumented
+    def get_user_succubus(self, user_id: str) -> List[UserSuccubusRow]:
+        with self.tuple_cursor() as cur:
+            return _fetch_user_succubus(cur, user_id)
 
+    @instrumented
     def get_succubus_by_rarity(self, rarity: str) -> List[Dict[str, Any]]:
-        conn, cur = self.get_connection()
-        cur.execute("""
-            SELECT *
-            FROM available_succubus
-            WHERE rarity = ?
-        """, (rarity,))
-        result = [dict(row) for row in cur.fetchall()]
-        conn.close()
-        return result
+        with self.connection() as (conn, cur):
+            cur.execute("""
+                SELECT *
+                FROM available_succubus
+                WHERE rarity = ?
+            """, (rarity,))
+            return [dict(row) for row in cur.fetchall()]
 
+    @instrumented
     def get_all_succubus(self) -> List[Dict[str, Any]]:
-        conn, cur = self.get_connection()
-        cur.execute("SELECT * FROM available_succubus")
-        result = [dict(row) for row in cur.fetchall()]
-        conn.close()
-        return result
-        
+        with self.connection() as (conn, cur):
+            cur.execute("SELECT * FROM available_succubus")
+            return [dict(row) for row in cur.fetchall()]
+
     # Active Succubus methods
+    @instrumented
     def activate_succubus(self, user_id: str, succubus_id: str) -> bool:
         """Ativa uma succubus para o usuário, retorna True se bem sucedido"""
-        conn, cur = self.get_connection()
-        
-        # Verifica se o usuário possui essa succubus
-        cur.execute("""
-            SELECT COUNT(*) as count FROM user_succubus 
-            WHERE user_id = ? AND succubus_id = ?
-        """, (user_id, succubus_id))
-        
-        result = cur.fetchone()
-        if not result or result['count'] == 0:
-            conn.close()
-            return False
-        
-        # Usar UTC para consistência
-        current_time = datetime.utcnow().isoformat()
-            
-        # Ativa a succubus e atualiza o timestamp
-        cur.execute("""
-            UPDATE users 
-            SET active_succubus = ?, 
-                last_succubus_activation = ?
-            WHERE user_id = ?
-        """, (succubus_id, current_time, user_id))
-        
-        conn.commit()
-        conn.close()
-        return True
-        
+        with self.transaction() as tx:
+            return tx.activate_succubus(user_id, succubus_id)
+
+    @instrumented
     def get_active_succubus(self, user_id: str) -> Optional[str]:
         """Retorna o ID da succubus ativa do usuário"""
-        conn, cur = self.get_connection()
-        cur.execute("""
-            SELECT active_succubus, last_succubus_activation 
-            FROM users 
-            WHERE user_id = ?
-        """, (user_id,))
-        
-        result = cur.fetchone()
-        conn.close()
-        
+        if self.cache:
+            user = self.get_user(user_id)
+            return user.active_succubus if user else None
+
+        with self.connection() as (conn, cur):
+            cur.execute("""
+                SELECT active_succubus, last_succubus_activation
+                FROM users
+                WHERE user_id = ?
+            """, (user_id,))
+
+            result = cur.fetchone()
+
         if not result or not result['active_succubus']:
             return None
-            
+
         return result['active_succubus']
-        
+
+    @instrumented
     def get_succubus_activation_time(self, user_id: str) -> Optional[datetime]:
         """Retorna o timestamp da última ativação de succubus"""
-        conn, cur = self.get_connection()
-        cur.execute("""
-            SELECT last_succubus_activation 
-            FROM users 
-            WHERE user_id = ?
-        """, (user_id,))
-        
-        result = cur.fetchone()
-        conn.close()
-        
-        if not result or not result['last_succubus_activation']:
+        if self.cache:
+            user = self.get_user(user_id)
+            return _from_epoch(user.last_succubus_activation) if user else None
+
+        with self.connection() as (conn, cur):
+            cur.execute("""
+                SELECT last_succubus_activation
+                FROM users
+                WHERE user_id = ?
+            """, (user_id,))
+
+            result = cur.fetchone()
+
+        if not result:
             return None
-        
-        # Parse the ISO timestamp from the database
-        activation_time = datetime.fromisoformat(result['last_succubus_activation'])
-            
-        return activation_time
 
+        return _from_epoch(result['last_succubus_activation'])
+
+    @instrumented
     def update_succubus_xp(self, user_id: str, succubus_id: str, new_xp: int):
         """
         Update the XP of a user's succubus.
-        
+
         Args:
             user_id (str): The Discord user ID.
             succubus_id (str): The ID of the succubus.
             new_xp (int): The new XP value.
         """
-        conn, cur = self.get_connection()
-        cur.execute("""
-            UPDATE user_succubus
-            SET xp = ?
-            WHERE user_id = ? AND succubus_id = ?
-        """, (new_xp, user_id, succubus_id))
-        conn.commit()
-        conn.close()
+        with self.transaction() as tx:
+            tx.update_succubus_xp(user_id, succubus_id, new_xp)
 
+    @instrumented
     def update_succubus_level(self, user_id: str, succubus_id: str, new_level: int, new_xp: int):
         """
         Update the level and XP of a user's succubus.
-        
+
         Args:
             user_id (str): The Discord user ID.
             succubus_id (str): The ID of the succubus.
             new_level (int): The new level value.
             new_xp (int): The remaining XP after leveling up.
         """
-        conn, cur = self.get_connection()
-        cur.execute("""
-            UPDATE user_succubus
-            SET level = ?, xp = ?
-            WHERE user_id = ? AND succubus_id = ?
-        """, (new_level, new_xp, user_id, succubus_id))
-        conn.commit()
-        conn.close()
+        with self.transaction() as tx:
+            tx.update_succubus_level(user_id, succubus_id, new_level, new_xp)
+
+    @instrumented
+    def add_succubus_xp(self, user_id: str, succubus_id: str, xp: int) -> Optional[Dict[str, int]]:
+        """
+        Add XP to a user's succubus and return its new state.
+
+        Args:
+            user_id (str): The Discord user ID.
+            succubus_id (str): The ID of the succubus.
+            xp (int): XP to add.
+
+        Returns:
+            Optional[Dict[str, int]]: The new 'xp' and 'level', or None if the user does not own the succubus.
+        """
+        with self.transaction() as tx:
+            return tx.add_succubus_xp(user_id, succubus_id, xp)
 
+    @instrumented
     def add_user_succubus(self, user_id: str, succubus_id: str, xp: int = 0, level: int = 1):
         """
         Add a new succubus to a user's collection with initial XP and level.
-        
+
         Args:
             user_id (str): The Discord user ID.
             succubus_id (str): The ID of the succubus.
             xp (int): Initial XP (default: 0).
             level (int): Initial level (default: 1).
         """
-        conn, cur = self.get_connection()
-        cur.execute("""
-            INSERT INTO user_succubus (user_id, succubus_id, xp, level)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(user_id, succubus_id) DO NOTHING
-        """, (user_id, succubus_id, xp, level))
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        with self.transaction() as tx:
+            tx.add_user_succubus(user_id, succubus_id, xp, level)
+
+    # Archive methods
+    @instrumented
+    def archive_inactive(self, idle_days: float, batch_size: int = BATCH_SIZE, pause: float = 0.05) -> int:
+        """
+        Move users not seen for `idle_days` to the archive tables, with their
+        items and succubus, so the live tables only hold people who still play.
+        They are moved back by `create_or_update_user` or `restore_archived_user`
+        on their next interaction. Users with an active succubus are kept.
+
+        Each batch is its own short transaction, with a `pause` between batches
+        so live writes get the lock in between. Blocking, run it with `async_db.run`.
+
+        Args:
+            idle_days (float): Days since last_seen after which a user is archived.
+            batch_size (int): Users moved per transaction.
+            pause (float): Seconds to wait between batches.
+
+        Returns:
+            int: The number of users archived.
+        """
+        cutoff = int(time.time() - idle_days * 86400)
+        archived = 0
+        while True:
+            # Hold the queue so no delta is queued for a user that's being moved out
+            with self.write_behind.lock if self.write_behind else nullcontext():
+                if self.write_behind:
+                    self.write_behind.flush()
+                with self.transaction() as tx:
+                    moved = len(tx.archive_inactive_users(cutoff, batch_size))
+            archived += moved
+            if moved < batch_size:
+                return archived
+            time.sleep(pause)
+
+    @instrumented
+    def restore_archived_user(self, user_id: str) -> bool:
+        """
+        Move an archived user back into the live tables, e.g. before running
+        one of their commands. Costs a single primary-key lookup when the
+        user isn't archived.
+
+        Args:
+            user_id (str): The Discord user ID.
+
+        Returns:
+            bool: True if the user was archived and has been restored.
+        """
+        with self.tuple_cursor() as cur:
+            if not user_archive.is_archived(cur, user_id):
+                return False
+        with self.transaction() as tx:
+            return tx.restore_archived_user(user_id)
+
+    # Scheduled job methods
+    @instrumented
+    def get_scheduled_jobs(self, before: int, after: int = 0) -> List[Tuple[str, str, int]]:
+        """
+        Saved scheduler jobs due in [after, before), soonest first.
+
+        Args:
+            before (int): Epoch seconds, exclusive.
+            after (int): Epoch seconds, inclusive.
+
+        Returns:
+            List[Tuple[str, str, int]]: (job, user_id, run_at) rows.
+        """
+        with self.tuple_cursor() as cur:
+            cur.execute("""
+                SELECT job, user_id, run_at
+                FROM scheduled_jobs
+                WHERE run_at >= ? AND run_at < ?
+                ORDER BY run_at
+            """, (after, before))
+            return [(job, str(user_id), run_at) for job, user_id, run_at in cur.fetchall()]
+
+    @instrumented
+    def set_scheduled_jobs(self, jobs: List[Tuple[str, str, Optional[int]]]):
+        """
+        Save scheduler jobs in one transaction.
+
+        Args:
+            jobs (List[Tuple[str, str, Optional[int]]]): (job, user_id, run_at) rows;
+                a run_at of None deletes the job.
+        """
+        saved = [(job, user_id, run_at) for job, user_id, run_at in jobs if run_at is not None]
+        deleted = [(job, user_id) for job, user_id, run_at in jobs if run_at is None]
+        with self.connection() as (conn, cur):
+            try:
+                cur.execute("BEGIN IMMEDIATE")
+                cur.executemany("INSERT OR REPLACE INTO scheduled_jobs (job, user_id, run_at) VALUES (?, ?, ?)", saved)
+                cur.executemany("DELETE FROM scheduled_jobs WHERE job = ? AND user_id = ?", deleted)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    @instrumented
+    def add_scheduled_job(self, job: str, user_id: str, run_at: int) -> int:
+        """
+        Save a scheduler job unless it is already saved.
+
+        Args:
+            job (str): The job name.
+            user_id (str): The Discord user ID.
+            run_at (int): Epoch seconds of the first run.
+
+        Returns:
+            int: The saved run_at, which is the existing one if there was one.
+        """
+        with self.connection() as (conn, cur):
+            try:
+                cur.execute("BEGIN IMMEDIATE")
+                cur.execute("INSERT OR IGNORE INTO scheduled_jobs (job, user_id, run_at) VALUES (?, ?, ?)",
+                            (job, user_id, run_at))
+                cur.execute("SELECT run_at FROM scheduled_jobs WHERE job = ? AND user_id = ?", (job, user_id))
+                saved = cur.fetchone()[0]
+                conn.commit()
+                return saved
+            except Exception:
+                conn.rollback()
+                raise
@@ -1,7 +1,14 @@
+import asyncio
 import json
 import os
 from discord.ext import commands
 from .database_manager import DatabaseManager
+from .journaled_backend import JournaledBackend
+from .storage_backend import create_backend
+from .async_database_manager import AsyncDatabaseManager
+from .backup_manager import BackupManager
+from .scheduler import Scheduler
+from .notification_queue import NotificationQueue
 
 class FileManager(commands.Cog):
     def __init__(self, bot):
@@ -9,14 +16,142 @@ class FileManager(commands.Cog):
         self.data_folder = 'data'
         self.ensure_data_folder_exists()
         
-        # Initialize database
-        self.db = DatabaseManager(os.path.join(self.data_folder, 'fapbot.db'))
+        # Initialize database; "backend": "memory" keeps everything in RAM (nothing is saved),
+        # "journaled" keeps it in RAM too but journals every write and compacts into fapbot.db
+        db_config = bot.config.get('database', {})
+        self.db = create_backend(db_config, self.data_folder)
+        # Awaitable facade for cogs and handlers; self.db stays available for scripts
+        self.async_db = AsyncDatabaseManager(self.db)
+        
+        # One timer loop for every per-user succubus effect, instead of a sleeping task per user.
+        # Their next runs are saved; only the ones due within the horizon are kept in memory.
+        self.scheduler = Scheduler(self.async_db, horizon=db_config.get('scheduler_horizon_minutes', 120) * 60)
+        self.scheduler_task = bot.loop.create_task(self.scheduler.run())
+        
+        # Handler notifications are batched per channel and kept under Discord's rate limits
+        notification_config = bot.config.get('notifications', {})
+        self.notifications = NotificationQueue(
+            bot,
+            window=notification_config.get('window_seconds', 2),
+            rate=notification_config.get('per_second', 1),
+            burst=notification_config.get('burst', 5)
+        )
+        
+        # The coin ledger and backups only exist for the SQLite database file
+        self.ledger_task = None
+        self.backups = None
+        self.backup_task = None
+        self.archive_task = None
+        self.compact_task = None
+        if isinstance(self.db, JournaledBackend):
+            self.journal_compact_minutes = db_config.get('journal_compact_minutes', 10)
+            self.compact_task = bot.loop.create_task(self.compact_journal())
+        if isinstance(self.db, DatabaseManager):
+            # Periodic coin ledger snapshots and compaction
+            self.ledger_snapshot_hours = db_config.get('ledger_snapshot_hours', 24)
+            self.ledger_keep_snapshots = db_config.get('ledger_keep_snapshots', 7)
+            self.ledger_task = bot.loop.create_task(self.snapshot_coin_ledger())
+            
+            # Scheduled online backups; backup_interval_hours 0 disables the schedule
+            self.backups = BackupManager(
+                self.db.db_path,
+                os.path.join(self.data_folder, 'backups'),
+                keep=db_config.get('backup_keep', 7),
+                pages_per_step=db_config.get('backup_pages_per_step', 256),
+                step_sleep_ms=db_config.get('backup_step_sleep_ms', 5)
+            )
+            self.backup_interval_hours = db_config.get('backup_interval_hours', 6)
+            if self.backup_interval_hours > 0:
+                self.backup_task = bot.loop.create_task(self.run_backups())
+            
+            # Move users inactive for archive_after_days to the archive tables; 0 disables it
+            self.archive_after_days = db_config.get('archive_after_days', 90)
+            self.archive_interval_hours = db_config.get('archive_interval_hours', 24)
+            self.archive_batch_size = db_config.get('archive_batch_size', 500)
+            if self.archive_after_days > 0:
+                self.archive_task = bot.loop.create_task(self.archive_inactive_users())
         
         # Load static data
         self.store_file = os.path.join(self.data_folder, 'store.json')
         self.probabilities_file = os.path.join(self.data_folder, 'probabilities.json')
         self.store_items = self.load_json(self.store_file, {})
 
+    def cog_unload(self):
+        for task in (self.scheduler_task, self.ledger_task, self.backup_task, self.archive_task, self.compact_task):
+            if task:
+                task.cancel()
+        self.notifications.close()
+        self.async_db.close()
+        # Timer changes the scheduler hadn't saved yet
+        unsaved = self.scheduler.take_unsaved()
+        if unsaved:
+            self.db.set_scheduled_jobs(unsaved)
+        self.db.close()
+
+    async def snapshot_coin_ledger(self):
+        """Fold the coin ledger into a balance snapshot every `ledger_snapshot_hours`, then compact it."""
+        while True:
+            await asyncio.sleep(self.ledger_snapshot_hours * 3600)
+            try:
+                snapshot_id = await self.async_db.run(self.db.ledger.snapshot)
+                if snapshot_id:
+                    deleted = await self.async_db.run(self.db.ledger.compact, self.ledger_keep_snapshots)
+                    print(f"Coin ledger snapshot {snapshot_id} taken, {deleted} old entries compacted")
+            except Exception as e:
+                print(f"Error taking coin ledger snapshot: {e}")
+
+    async def compact_journal(self):
+        """Fold the write journal into fapbot.db every `journal_compact_minutes`."""
+        while True:
+            await asyncio.sleep(self.journal_compact_minutes * 60)
+            try:
+                written = await self.async_db.run(self.db.compact)
+                if written:
+                    print(f"Journal compacted, {written} rows written to the database")
+            except Exception as e:
+                print(f"Error compacting the journal: {e}")
+
+    async def archive_inactive_users(self):
+        """Archive inactive users every `archive_interval_hours`, a small batch at a time."""
+        while True:
+            await asyncio.sleep(self.archive_interval_hours * 3600)
+            try:
+                archived = await self.async_db.run(
+                    self.db.archive_inactive, self.archive_after_days, self.archive_batch_size)
+                if archived:
+                    print(f"Archived {archived} users inactive for {self.archive_after_days} days")
+            except Exception as e:
+                print(f"Error archiving inactive users: {e}")
+
+    async def bot_check_once(self, ctx):
+        # Not a real check: brings an archived author back before any command reads their data.
+        # Writes restore the users they target themselves, e.g. the target of an admin command
+        if isinstance(self.db, DatabaseManager):
+            await self.async_db.restore_archived_user(str(ctx.author.id))
+        return True
+
+    async def run_backups(self):
+        """Take a snapshot every `backup_interval_hours` without blocking the event loop."""
+        while True:
+            await asyncio.sleep(self.backup_interval_hours * 3600)
+            try:
+                path = await asyncio.to_thread(self.backups.create)
+                print(f"Database backup written to {path}")
+            except Exception as e:
+                print(f"Error backing up the database: {e}")
+
+    def restore_backup(self, name):
+        """
+        Restore a snapshot into the live database. Blocking, run it with `async_db.run`.
+        Pending writes are flushed first and then overwritten, and the cache is emptied.
+        """
+        if self.db.write_behind:
+            self.db.write_behind.flush()
+        self.backups.restore(name)
+        if self.db.cache:
+            self.db.cache.clear()
+        self.db.sampler.reset()
+
     def ensure_data_folder_exists(self):
         if not os.path.exists(self.data_folder):
             os.makedirs(self.data_folder)
@@ -36,5 +171,4 @@ class FileManager(commands.Cog):
 
 async def setup(bot):
     cog = FileManager(bot)
-    await bot.add_cog(cog)
-    # Uncomment the following line to migrate data when setting up the bot
\ No newline at end of file
+    await bot.add_cog(cog)
\ No newline at end of file
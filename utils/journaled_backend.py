@@ -0,0 +1,288 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from . import coin_ledger, user_archive
+from .database_manager import CONNECTION_PRAGMAS, USER_COLUMNS
+from .memory_backend import MemoryBackend, MemoryTransaction, _MISSING
+from .migrations import run_migrations
+from .rows import UserRow, UserSuccubusRow
+
+def _encode(value: Any) -> Any:
+    if value is _MISSING:
+        return None
+    if isinstance(value, (UserRow, UserSuccubusRow)):
+        return list(value.astuple())
+    return value
+
+def _decode(table: str, value: Any) -> Any:
+    if value is None:
+        return _MISSING
+    if table == 'users':
+        return UserRow(*value)
+    if table == 'user_succubus':
+        return UserSuccubusRow(*value)
+    return value
+
+class JournaledBackend(MemoryBackend):
+    """
+    MemoryBackend that survives restarts, for guilds where even WAL SQLite
+    is too slow at peak.
+
+    Reads never touch the disk and a commit is one buffered append: a JSON
+    line with the new value of every row it wrote, added to the current
+    journal segment (`fapbot.journal.<n>` next to the database). `compact()`
+    writes the rows changed since the last compaction, with their coin ledger
+    entries, into the SQLite file in one transaction and deletes the segments
+    it covered. On startup the tables are loaded and the segments newer than
+    the last compaction are replayed on top.
+
+    Lines are flushed to the OS on every commit, so a crash of the bot loses
+    nothing; with `fsync` a power cut doesn't either, at the cost of a disk
+    sync per commit.
+    """
+
+    def __init__(self, db_path: str, fsync: bool = False):
+        super().__init__()
+        self.db_path = db_path
+        self.fsync = fsync
+        self.journal_prefix = os.path.splitext(db_path)[0] + '.journal.'
+        # Rows written since the last compaction, and the fapcoin changes that go with them
+        self._dirty: Dict[Tuple[str, Any], None] = {}
+        self._coin_entries: List[Tuple[str, int, str]] = []
+        self._compact_lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            self.conn.execute(pragma)
+        run_migrations(self.conn)
+        self._load()
+
+        compacted = self.conn.execute("SELECT segment FROM journal_state").fetchone()[0]
+        segments = self._segments()
+        for segment in segments:
+            if segment > compacted and os.path.getsize(self._segment_path(segment)):
+                self._replay(segment)
+            else:
+                # Left behind by a compaction that stopped after its commit, or with nothing to replay
+                os.remove(self._segment_path(segment))
+        self.segment = max(segments + [compacted]) + 1
+        self.journal = open(self._segment_path(self.segment), 'a', encoding='utf-8')
+
+    def _segment_path(self, segment: int) -> str:
+        return f"{self.journal_prefix}{segment}"
+
+    def _segments(self) -> List[int]:
+        """Numbers of the journal segments on disk, oldest first."""
+        folder = os.path.dirname(self.journal_prefix) or '.'
+        prefix = os.path.basename(self.journal_prefix)
+        return sorted(
+            int(name[len(prefix):]) for name in os.listdir(folder)
+            if name.startswith(prefix) and name[len(prefix):].isdigit()
+        )
+
+    def _remove_segments(self, before: int):
+        """Delete the journal segments older than `before`, whose rows are all in the SQLite file."""
+        for old in self._segments():
+            if old < before:
+                os.remove(self._segment_path(old))
+
+    def _load(self):
+        # Users archived by the SQLite backend are kept in memory too; compact() moves them back once written
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT {USER_COLUMNS} FROM users UNION ALL SELECT {USER_COLUMNS} FROM users_archive")
+        for row in cur:
+            user = UserRow.from_db(row)
+            self._restore('users', user.user_id, user)
+        cur.execute("""
+            SELECT user_id, item_name, quantity FROM items
+            UNION ALL SELECT user_id, item_name, quantity FROM items_archive
+        """)
+        for user_id, item_name, quantity in cur:
+            self.items.setdefault(str(user_id), {})[item_name] = quantity
+        cur.execute("""
+            SELECT user_id, succubus_id, acquired_date, xp, level FROM user_succubus
+            UNION ALL SELECT user_id, succubus_id, acquired_date, xp, level FROM user_succubus_archive
+        """)
+        for user_id, succubus_id, acquired_date, xp, level in cur:
+            user_id = str(user_id)
+            self.user_succubus.setdefault(user_id, {})[succubus_id] = UserSuccubusRow(
+                user_id, succubus_id, acquired_date, xp, level)
+
+    def _replay(self, segment: int):
+        path = self._segment_path(segment)
+        with open(path, encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A write cut short by a crash; the commit it belonged to never returned
+                    print(f"Skipping damaged line {number} of {path}")
+                    continue
+                for table, key, value in entry['rows']:
+                    key = key if table == 'users' else tuple(key)
+                    self._restore(table, key, _decode(table, value))
+                    self._dirty[(table, key)] = None
+                self._coin_entries.extend(tuple(coins) for coins in entry['coins'])
+
+    def _log_commit(self, tx: MemoryTransaction):
+        if not tx._undo:
+            return
+        rows = [
+            [table, key if table == 'users' else list(key), _encode(self._current(table, key))]
+            for table, key in tx._undo
+        ]
+        self.journal.write(json.dumps({'rows': rows, 'coins': tx._coins}, separators=(',', ':')) + '\n')
+        self.journal.flush()
+        if self.fsync:
+            os.fsync(self.journal.fileno())
+        for key in tx._undo:
+            self._dirty[key] = None
+        self._coin_entries.extend(tx._coins)
+
+    def compact(self) -> int:
+        """
+        Fold the journal into the SQLite file. Blocking, run it with `async_db.run`.
+
+        Commits keep going while the rows are written: the journal moves on to
+        a new segment first, and only the segments before it are deleted.
+        Afterwards the active segment is the only one left on disk.
+
+        Returns:
+            int: Number of rows written.
+        """
+        with self._compact_lock:
+            with self.lock:
+                active = self.segment
+                if not self._dirty and not self._coin_entries:
+                    # Every older segment was compacted already, or left empty by a restart
+                    self._remove_segments(active)
+                    return 0
+                # Rows are replaced, never mutated, so these references are a consistent snapshot
+                rows = [(table, key, self._current(table, key)) for table, key in self._dirty]
+                coins = self._coin_entries
+                self._dirty = {}
+                self._coin_entries = []
+                segment = self.segment
+                self.journal.close()
+                self.segment = active = segment + 1
+                self.journal = open(self._segment_path(self.segment), 'a', encoding='utf-8')
+
+            try:
+                self._write_tables(rows, coins, segment)
+            except Exception:
+                with self.lock:
+                    # Retried by the next compaction, which also covers the segments kept on disk
+                    for table, key, _ in rows:
+                        self._dirty.setdefault((table, key), None)
+                    self._coin_entries[:0] = coins
+                raise
+
+            self._remove_segments(active)
+        return len(rows)
+
+    def _write_tables(self, rows: List[Tuple[str, Any, Any]], coins: List[Tuple[str, int, str]], segment: int):
+        # Rows written since the last compaction count as seen now, for SQLite's archival
+        now = int(time.time())
+        users, items, user_succubus = [], [], []
+        deleted_users, deleted_items, deleted_succubus = [], [], []
+        for table, key, value in rows:
+            if table == 'users':
+                if value is _MISSING:
+                    deleted_users.append((key,))
+                else:
+                    users.append((*value.astuple(), now))
+            elif table == 'items':
+                if value is _MISSING:
+                    deleted_items.append(key)
+                else:
+                    items.append((*key, value))
+            elif value is _MISSING:
+                deleted_succubus.append(key)
+            else:
+                user_succubus.append(value.astuple())
+
+        cur = self.conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            # Anyone written is active again, so move them out of the archive before writing
+            for user_id in {key if table == 'users' else key[0] for table, key, _ in rows}:
+                user_archive.restore(cur, user_id)
+            cur.executemany(f"""
+                INSERT INTO users ({USER_COLUMNS}, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    username = excluded.username, faps = excluded.faps, score = excluded.score,
+                    fapcoins = excluded.fapcoins, last_daily = excluded.last_daily,
+                    active_succubus = excluded.active_succubus,
+                    last_succubus_activation = excluded.last_succubus_activation,
+                    next_daily_at = excluded.next_daily_at, last_seen = excluded.last_seen
+            """, users)
+            cur.executemany("INSERT OR REPLACE INTO items (user_id, item_name, quantity) VALUES (?, ?, ?)", items)
+            cur.executemany("""
+                INSERT OR REPLACE INTO user_succubus (user_id, succubus_id, acquired_date, xp, level)
+                VALUES (?, ?, ?, ?, ?)
+            """, user_succubus)
+            cur.executemany("DELETE FROM user_succubus WHERE user_id = ? AND succubus_id = ?", deleted_succubus)
+            cur.executemany("DELETE FROM items WHERE user_id = ? AND item_name = ?", deleted_items)
+            cur.executemany("DELETE FROM users WHERE user_id = ?", deleted_users)
+            # After the users rows, which record_many checks for
+            coin_ledger.record_many(cur, coins)
+            cur.execute("UPDATE journal_state SET segment = ?", (segment,))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    # Scheduler jobs change a few times an hour per user at most, so they skip the journal
+    def get_scheduled_jobs(self, before: int, after: int = 0) -> List[Tuple[str, str, int]]:
+        with self._compact_lock:
+            cur = self.conn.execute("""
+                SELECT job, user_id, run_at
+                FROM scheduled_jobs
+                WHERE run_at >= ? AND run_at < ?
+                ORDER BY run_at
+            """, (after, before))
+            return [(job, str(user_id), run_at) for job, user_id, run_at in cur.fetchall()]
+
+    def set_scheduled_jobs(self, jobs: List[Tuple[str, str, Optional[int]]]):
+        with self._compact_lock:
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO scheduled_jobs (job, user_id, run_at) VALUES (?, ?, ?)",
+                    [row for row in jobs if row[2] is not None])
+                self.conn.executemany(
+                    "DELETE FROM scheduled_jobs WHERE job = ? AND user_id = ?",
+                    [(job, user_id) for job, user_id, run_at in jobs if run_at is None])
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def add_scheduled_job(self, job: str, user_id: str, run_at: int) -> int:
+        with self._compact_lock:
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.execute("INSERT OR IGNORE INTO scheduled_jobs (job, user_id, run_at) VALUES (?, ?, ?)",
+                                  (job, user_id, run_at))
+                saved = self.conn.execute("SELECT run_at FROM scheduled_jobs WHERE job = ? AND user_id = ?",
+                                          (job, user_id)).fetchone()[0]
+                self.conn.commit()
+                return saved
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def close(self):
+        """Compact one last time so the next startup has nothing to replay."""
+        try:
+            self.compact()
+        finally:
+            self.journal.close()
+            # Nothing was committed after the compaction; the next startup opens a segment of its own
+            if not os.path.getsize(self._segment_path(self.segment)):
+                os.remove(self._segment_path(self.segment))
+            self.conn.close()
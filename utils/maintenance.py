@@ -0,0 +1,351 @@
+"""
+Maintenance for fapbot.db: integrity and consistency checks, repairs,
+statistics and incremental vacuum.
+
+    python -m utils.maintenance integrity [--quick]
+    python -m utils.maintenance check
+    python -m utils.maintenance repair
+    python -m utils.maintenance analyze [--full]
+    python -m utils.maintenance vacuum [--convert]
+    python -m utils.maintenance all
+
+Every step works in chunks of `--batch` rows (or pages) with a short pause
+in between, so they can run while the bot is online. Checks read through a
+read-only connection; each batch of repairs is its own short transaction.
+With the bot's cache enabled, repaired rows show up in the bot after at most
+`cache_ttl_seconds`. `vacuum --convert` is the exception: it rewrites the
+whole file once, so stop the bot first.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from . import coin_ledger
+from .coin_ledger import CoinReason
+from .database_manager import CONNECTION_PRAGMAS
+
+# Domain checks, in the order they are reported
+CHECKS = (
+    'negative_fapcoins',
+    'unowned_active_succubus',
+    'empty_items',
+    'orphaned_items',
+    'orphaned_succubus',
+)
+
+# auto_vacuum values
+AUTO_VACUUM_INCREMENTAL = 2
+
+class Maintenance:
+    """
+    Chunked maintenance steps on a live database.
+
+    Tables are walked with keyset pagination on their primary key, `batch`
+    rows per statement, so no read holds a snapshot (and keeps the WAL from
+    being checkpointed) for long and no write holds the lock for long.
+    """
+
+    def __init__(self, db_path: str, batch: int = 1000, pause: float = 0.01):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(db_path)
+        self.db_path = db_path
+        self.batch = max(1, batch)
+        self.pause = pause
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _connect_read_only(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, isolation_level=None)
+
+    def _tables(self, conn: sqlite3.Connection) -> List[str]:
+        return [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+
+    def _scan(self, conn: sqlite3.Connection, table: str, key: Tuple[str, ...], columns: str) -> Iterator[List[tuple]]:
+        """Yield the rows of `table` in primary key order, `batch` at a time; each row starts with the key."""
+        key_sql = ', '.join(key)
+        last: Optional[tuple] = None
+        while True:
+            if last is None:
+                rows = conn.execute(f"SELECT {key_sql}, {columns} FROM {table} ORDER BY {key_sql} LIMIT ?",
+                                    (self.batch,)).fetchall()
+            else:
+                rows = conn.execute(f"""
+                    SELECT {key_sql}, {columns} FROM {table}
+                    WHERE ({key_sql}) > ({', '.join('?' * len(key))})
+                    ORDER BY {key_sql} LIMIT ?
+                """, (*last, self.batch)).fetchall()
+            if not rows:
+                return
+            yield rows
+            last = rows[-1][:len(key)]
+            time.sleep(self.pause)
+
+    def _existing_users(self, conn: sqlite3.Connection, user_ids: List[int]) -> set:
+        found = set()
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            found.update(row[0] for row in conn.execute(
+                f"SELECT user_id FROM users WHERE user_id IN ({', '.join('?' * len(chunk))})", chunk))
+        return found
+
+    def _find(self, conn: sqlite3.Connection) -> Iterator[Tuple[str, List[tuple]]]:
+        """Yield (check, rows) for every chunk that has problems."""
+        for rows in self._scan(conn, 'users', ('user_id',), 'fapcoins, active_succubus'):
+            negative = [(user_id, fapcoins) for user_id, fapcoins, _ in rows if fapcoins < 0]
+            if negative:
+                yield 'negative_fapcoins', negative
+            active = [(user_id, succubus_id) for user_id, _, succubus_id in rows if succubus_id is not None]
+            unowned = [
+                (user_id, succubus_id) for user_id, succubus_id in active
+                if conn.execute("SELECT 1 FROM user_succubus WHERE user_id = ? AND succubus_id = ?",
+                                (user_id, succubus_id)).fetchone() is None
+            ]
+            if unowned:
+                yield 'unowned_active_succubus', unowned
+
+        for rows in self._scan(conn, 'items', ('user_id', 'item_name'), 'quantity'):
+            empty = [row for row in rows if row[2] <= 0]
+            if empty:
+                yield 'empty_items', empty
+            users = self._existing_users(conn, sorted({row[0] for row in rows}))
+            orphaned = [row[:2] for row in rows if row[0] not in users]
+            if orphaned:
+                yield 'orphaned_items', orphaned
+
+        for rows in self._scan(conn, 'user_succubus', ('user_id', 'succubus_id'), 'level'):
+            users = self._existing_users(conn, sorted({row[0] for row in rows}))
+            orphaned = [row[:2] for row in rows if row[0] not in users]
+            if orphaned:
+                yield 'orphaned_succubus', orphaned
+
+    def check(self) -> Dict[str, List[tuple]]:
+        """
+        Run the domain checks.
+
+        Returns:
+            Dict[str, List[tuple]]: check name -> offending rows, for every check in CHECKS.
+        """
+        problems: Dict[str, List[tuple]] = {name: [] for name in CHECKS}
+        conn = self._connect_read_only()
+        try:
+            for name, rows in self._find(conn):
+                problems[name].extend(rows)
+        finally:
+            conn.close()
+        return problems
+
+    def _repair_chunk(self, cur: sqlite3.Cursor, name: str, rows: List[tuple]) -> int:
+        """Fix one chunk. Every statement re-checks its condition, the row may have changed since it was read."""
+        if name == 'negative_fapcoins':
+            cur.execute(f"""
+                SELECT user_id, fapcoins FROM users
+                WHERE fapcoins < 0 AND user_id IN ({', '.join('?' * len(rows))})
+            """, [user_id for user_id, _ in rows])
+            negative = cur.fetchall()
+            cur.executemany("UPDATE users SET fapcoins = 0 WHERE user_id = ?", [(user_id,) for user_id, _ in negative])
+            coin_ledger.record_many(cur, [(user_id, -fapcoins, CoinReason.REPAIR) for user_id, fapcoins in negative])
+            return len(negative)
+
+        if name == 'unowned_active_succubus':
+            sql = """
+                UPDATE users SET active_succubus = NULL
+                WHERE user_id = ? AND active_succubus = ?
+                AND NOT EXISTS (SELECT 1 FROM user_succubus s WHERE s.user_id = ? AND s.succubus_id = ?)
+            """
+            params = [(user_id, succubus_id, user_id, succubus_id) for user_id, succubus_id in rows]
+        elif name == 'empty_items':
+            sql = "DELETE FROM items WHERE user_id = ? AND item_name = ? AND quantity <= 0"
+            params = [row[:2] for row in rows]
+        elif name == 'orphaned_items':
+            sql = """
+                DELETE FROM items WHERE user_id = ? AND item_name = ?
+                AND NOT EXISTS (SELECT 1 FROM users WHERE user_id = items.user_id)
+            """
+            params = rows
+        else:
+            sql = """
+                DELETE FROM user_succubus WHERE user_id = ? AND succubus_id = ?
+                AND NOT EXISTS (SELECT 1 FROM users WHERE user_id = user_succubus.user_id)
+            """
+            params = rows
+
+        fixed = 0
+        for row in params:
+            cur.execute(sql, row)
+            fixed += cur.rowcount
+        return fixed
+
+    def repair(self) -> Dict[str, int]:
+        """
+        Fix what `check()` finds, one short write transaction per chunk.
+
+        - negative fapcoins are set to 0, with a "repair" coin ledger entry;
+        - an active succubus the user doesn't own is deactivated;
+        - items with quantity <= 0 are deleted, they count as not owned anyway;
+        - items and succubus of users that don't exist are deleted.
+
+        Returns:
+            Dict[str, int]: check name -> rows fixed.
+        """
+        fixed = {name: 0 for name in CHECKS}
+        reader = self._connect_read_only()
+        writer = self._connect()
+        try:
+            cur = writer.cursor()
+            for name, rows in self._find(reader):
+                try:
+                    cur.execute("BEGIN IMMEDIATE")
+                    fixed[name] += self._repair_chunk(cur, name, rows)
+                    cur.execute("COMMIT")
+                except Exception:
+                    cur.execute("ROLLBACK")
+                    raise
+        finally:
+            reader.close()
+            writer.close()
+        return fixed
+
+    def integrity(self, quick: bool = False) -> List[str]:
+        """
+        Run `integrity_check` (or the cheaper `quick_check`) one table and its indexes at a time.
+
+        Returns:
+            List[str]: The problems found, empty if the database is sound.
+        """
+        pragma = 'quick_check' if quick else 'integrity_check'
+        errors = []
+        conn = self._connect_read_only()
+        try:
+            for table in self._tables(conn):
+                for (result,) in conn.execute(f'PRAGMA {pragma}("{table}")'):
+                    if result != 'ok':
+                        errors.append(f"{table}: {result}")
+                time.sleep(self.pause)
+        finally:
+            conn.close()
+        return errors
+
+    def analyze(self, full: bool = False) -> List[str]:
+        """
+        Refresh the query planner statistics, one table per transaction.
+
+        Args:
+            full (bool): Read every index entry instead of a sample of about `batch` rows per index.
+
+        Returns:
+            List[str]: The tables analyzed.
+        """
+        conn = self._connect()
+        try:
+            conn.execute(f"PRAGMA analysis_limit = {0 if full else self.batch}")
+            tables = self._tables(conn)
+            for table in tables:
+                conn.execute(f'ANALYZE "{table}"')
+                time.sleep(self.pause)
+            conn.execute("PRAGMA optimize")
+        finally:
+            conn.close()
+        return tables
+
+    def vacuum(self, convert: bool = False) -> int:
+        """
+        Return free pages to the file system, `batch` pages per transaction.
+
+        Incremental vacuum only works on databases created with
+        auto_vacuum = INCREMENTAL, which new databases are. An older file
+        has to be converted once with `convert`: a full VACUUM that rewrites
+        the whole file and locks out the bot while it runs.
+
+        Returns:
+            int: The number of pages freed.
+        """
+        conn = self._connect()
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                if not convert:
+                    raise RuntimeError("auto_vacuum is not INCREMENTAL; stop the bot and run `vacuum --convert` once")
+                before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                conn.execute("VACUUM")
+                return before
+
+            freed = 0
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            while free:
+                # execute() would stop after the first page; executescript() steps the pragma to the end
+                conn.executescript(f"PRAGMA incremental_vacuum({min(free, self.batch)});")
+                remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if remaining >= free:
+                    break
+                freed += free - remaining
+                free = remaining
+                time.sleep(self.pause)
+            # Copy what's in the WAL back without waiting for readers
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            return freed
+        finally:
+            conn.close()
+
+def _print_problems(problems: Dict[str, List[tuple]], limit: int = 10) -> int:
+    total = 0
+    for name, rows in problems.items():
+        total += len(rows)
+        print(f"{name}: {len(rows)}")
+        for row in rows[:limit]:
+            print(f"    {', '.join(str(value) for value in row)}")
+        if len(rows) > limit:
+            print(f"    ... and {len(rows) - limit} more")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description='Check, repair and tidy up the FapBot database.')
+    parser.add_argument('--db', default=os.path.join('data', 'fapbot.db'), help='database file')
+    parser.add_argument('--batch', type=int, default=1000, help='rows or pages per chunk')
+    parser.add_argument('--pause-ms', type=int, default=10, help='pause between chunks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    integrity_parser = subparsers.add_parser('integrity', help='check the file structure')
+    integrity_parser.add_argument('--quick', action='store_true', help='skip the slower index checks')
+    subparsers.add_parser('check', help='look for data that breaks the game rules')
+    subparsers.add_parser('repair', help='fix what check finds')
+    analyze_parser = subparsers.add_parser('analyze', help='refresh query planner statistics')
+    analyze_parser.add_argument('--full', action='store_true', help='read every index entry')
+    vacuum_parser = subparsers.add_parser('vacuum', help='give free pages back to the file system')
+    vacuum_parser.add_argument('--convert', action='store_true',
+                               help='switch an old database to incremental vacuum (stop the bot first)')
+    subparsers.add_parser('all', help='integrity, check, analyze and vacuum')
+    args = parser.parse_args()
+
+    maintenance = Maintenance(args.db, batch=args.batch, pause=args.pause_ms / 1000)
+    failed = False
+    if args.command in ('integrity', 'all'):
+        errors = maintenance.integrity(quick=getattr(args, 'quick', False))
+        for error in errors:
+            print(error)
+        print(f"Integrity: {'ok' if not errors else f'{len(errors)} problems'}")
+        failed |= bool(errors)
+    if args.command in ('check', 'all'):
+        found = _print_problems(maintenance.check())
+        print(f"Check: {found} problems")
+        failed |= bool(found)
+    if args.command == 'repair':
+        for name, count in maintenance.repair().items():
+            print(f"{name}: {count} fixed")
+    if args.command in ('analyze', 'all'):
+        tables = maintenance.analyze(full=getattr(args, 'full', False))
+        print(f"Analyzed {len(tables)} tables")
+    if args.command in ('vacuum', 'all'):
+        try:
+            print(f"Freed {maintenance.vacuum(convert=getattr(args, 'convert', False))} pages")
+        except RuntimeError as e:
+            print(e)
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
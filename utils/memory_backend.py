@@ -0,0 +1,451 @@
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from .coin_ledger import CoinReason
+from .user_sampler import UserSampler
+from .rows import UserRow, ScoreboardRow, ActiveSuccubusRow, UserSuccubusRow
+
+# Marks a key that did not exist before the transaction touched it
+_MISSING = object()
+
+def _from_epoch(timestamp: Optional[int]) -> Optional[datetime]:
+    return datetime.utcfromtimestamp(timestamp) if timestamp is not None else None
+
+class MemoryTransaction:
+    """
+    Unit of work on a MemoryBackend, returned by `MemoryBackend.transaction()`.
+
+    Holds the backend lock from begin to commit, so transactions are
+    serialized just like SQLite's BEGIN IMMEDIATE. The value of every key
+    it writes is remembered the first time, and rollback puts those back.
+    """
+
+    def __init__(self, db: 'MemoryBackend'):
+        self.db = db
+        self._undo: Dict[Tuple[str, Any], Any] = {}
+        # (user_id, amount, reason) of every fapcoin change, for backends that keep a ledger
+        self._coins: List[Tuple[str, int, str]] = []
+        self._after_commit: List[Callable[[], None]] = []
+        self._locked = False
+
+    def begin(self) -> 'MemoryTransaction':
+        self.db.lock.acquire()
+        self._locked = True
+        return self
+
+    def commit(self):
+        try:
+            self.db._log_commit(self)
+        except Exception:
+            # Not persisted, so it must not stay visible either
+            self.rollback()
+            raise
+        self._undo.clear()
+        self._coins.clear()
+        self._release()
+        for callback in self._after_commit:
+            callback()
+
+    def rollback(self):
+        try:
+            for (table, key), previous in reversed(list(self._undo.items())):
+                self.db._restore(table, key, previous)
+            self._undo.clear()
+            self._coins.clear()
+        finally:
+            self._release()
+
+    def _release(self):
+        if self._locked:
+            self._locked = False
+            self.db.lock.release()
+
+    def __enter__(self) -> 'MemoryTransaction':
+        return self.begin()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def _save(self, table: str, key: Any):
+        # Rows are replaced, never mutated, so keeping the old reference is enough
+        if (table, key) not in self._undo:
+            self._undo[(table, key)] = self.db._current(table, key)
+
+    def _put_user(self, user_id: str, **changes) -> Optional[UserRow]:
+        user = self.db.users.get(user_id)
+        if user is None:
+            return None
+        self._save('users', user_id)
+        user = user.replace(**changes)
+        self.db._restore('users', user_id, user)
+        return user
+
+    # Reads
+    def get_user(self, user_id: str) -> Optional[UserRow]:
+        user = self.db.users.get(user_id)
+        return user.copy() if user else None
+
+    def get_fapcoins(self, user_id: str) -> int:
+        user = self.db.users.get(user_id)
+        return user.fapcoins if user else 0
+
+    def get_last_daily(self, user_id: str) -> Optional[datetime]:
+        user = self.db.users.get(user_id)
+        return _from_epoch(user.last_daily) if user else None
+
+    def get_active_succubus(self, user_id: str) -> Optional[str]:
+        user = self.db.users.get(user_id)
+        return user.active_succubus if user else None
+
+    def get_user_items(self, user_id: str) -> Dict[str, int]:
+        return {item_name: quantity for item_name, quantity in self.db.items.get(user_id, {}).items() if quantity > 0}
+
+    def get_user_succubus(self, user_id: str) -> List[UserSuccubusRow]:
+        return [row.copy() for row in self.db.user_succubus.get(user_id, {}).values()]
+
+    # Writes
+    def create_or_update_user(self, user_id: str, username: str):
+        if self._put_user(user_id, username=username) is None:
+            self._save('users', user_id)
+            self.db._restore('users', user_id, UserRow(user_id, username))
+        self._after_commit.append(lambda: self.db.sampler.add(user_id))
+
+    def update_user_score(self, user_id: str, faps: int, score: int):
+        self._put_user(user_id, faps=faps, score=score)
+
+    def update_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER):
+        self.add_fapcoins(user_id, amount, reason)
+
+    def update_item_quantity(self, user_id: str, item_name: str, quantity: int):
+        self.add_item_quantity(user_id, item_name, quantity)
+
+    def add_user_score(self, user_id: str, faps: int = 0, score: int = 0,
+                       min_score: Optional[int] = None) -> Optional[Dict[str, int]]:
+        user = self.db.users.get(user_id)
+        if user is None:
+            return None
+        new_score = user.score + score
+        if min_score is not None:
+            new_score = max(min_score, new_score)
+        user = self._put_user(user_id, faps=user.faps + faps, score=new_score)
+        return {'faps': user.faps, 'score': user.score}
+
+    def add_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER) -> Optional[int]:
+        user = self.db.users.get(user_id)
+        if user is None:
+            return None
+        if amount:
+            self._coins.append((user_id, amount, reason))
+        return self._put_user(user_id, fapcoins=user.fapcoins + amount).fapcoins
+
+    def add_item_quantity(self, user_id: str, item_name: str, quantity: int) -> int:
+        self._save('items', (user_id, item_name))
+        items = self.db.items.setdefault(user_id, {})
+        items[item_name] = items.get(item_name, 0) + quantity
+        return items[item_name]
+
+    def update_daily_timestamp(self, user_id: str, cooldown_hours: float = 12):
+        current_time = int(time.time())
+        self._put_user(user_id, last_daily=current_time, next_daily_at=current_time + int(cooldown_hours * 3600))
+
+    def init_next_daily(self, user_id: str, cooldown_hours: float = 12):
+        user = self.db.users.get(user_id)
+        if user is None or user.next_daily_at is not None:
+            return
+        if user.last_daily is None:
+            self._put_user(user_id, next_daily_at=int(time.time()))
+        else:
+            self._put_user(user_id, next_daily_at=user.last_daily + int(cooldown_hours * 3600))
+
+    def take_dailies_due(self, succubus_id: str, now: int) -> List[str]:
+        user_ids = [
+            user_id for user_id in self.db.active.get(succubus_id, {})
+            if self.db.users[user_id].next_daily_at is not None and self.db.users[user_id].next_daily_at <= now
+        ]
+        for user_id in user_ids:
+            self._put_user(user_id, next_daily_at=None)
+        return user_ids
+
+    def activate_succubus(self, user_id: str, succubus_id: str) -> bool:
+        if succubus_id not in self.db.user_succubus.get(user_id, {}):
+            return False
+        self._put_user(user_id, active_succubus=succubus_id, last_succubus_activation=int(time.time()))
+        return True
+
+    def _put_succubus(self, user_id: str, succubus_id: str, **changes) -> Optional[UserSuccubusRow]:
+        row = self.db.user_succubus.get(user_id, {}).get(succubus_id)
+        if row is None:
+            return None
+        self._save('user_succubus', (user_id, succubus_id))
+        row = row.replace(**changes)
+        self.db._restore('user_succubus', (user_id, succubus_id), row)
+        return row
+
+    def update_succubus_xp(self, user_id: str, succubus_id: str, new_xp: int):
+        self._put_succubus(user_id, succubus_id, xp=new_xp)
+
+    def update_succubus_level(self, user_id: str, succubus_id: str, new_level: int, new_xp: int):
+        self._put_succubus(user_id, succubus_id, level=new_level, xp=new_xp)
+
+    def add_succubus_xp(self, user_id: str, succubus_id: str, xp: int) -> Optional[Dict[str, int]]:
+        row = self.db.user_succubus.get(user_id, {}).get(succubus_id)
+        if row is None:
+            return None
+        row = self._put_succubus(user_id, succubus_id, xp=row.xp + xp)
+        return {'xp': row.xp, 'level': row.level}
+
+    def add_user_succubus(self, user_id: str, succubus_id: str, xp: int = 0, level: int = 1):
+        if succubus_id in self.db.user_succubus.get(user_id, {}):
+            return
+        self._save('user_succubus', (user_id, succubus_id))
+        self.db._restore('user_succubus', (user_id, succubus_id),
+                         UserSuccubusRow(user_id, succubus_id, int(time.time()), xp, level))
+
+class MemoryBackend:
+    """
+    StorageBackend that keeps everything in dicts, for load tests and
+    economy simulations that should run at CPU speed.
+
+    Behaves like DatabaseManager (str ids, datetime getters, None for
+    missing users) but nothing is persisted: the data is gone when the
+    process exits. There is no coin ledger, write-behind queue or cache.
+    """
+
+    def __init__(self):
+        # Reentrant so single calls can run inside a transaction on the same thread
+        self.lock = threading.RLock()
+        self.users: Dict[str, UserRow] = {}
+        self.items: Dict[str, Dict[str, int]] = {}
+        self.user_succubus: Dict[str, Dict[str, UserSuccubusRow]] = {}
+        # succubus_id -> user ids with it active, kept in step with users
+        self.active: Dict[str, Dict[str, None]] = {}
+        # (job, user_id) -> run_at of the scheduler's durable jobs
+        self.scheduled_jobs: Dict[Tuple[str, str], int] = {}
+        self.sampler = UserSampler(self.get_all_users)
+
+    def _current(self, table: str, key: Any) -> Any:
+        if table == 'users':
+            return self.users.get(key, _MISSING)
+        user_id, name = key
+        source = self.items if table == 'items' else self.user_succubus
+        return source.get(user_id, {}).get(name, _MISSING)
+
+    def _restore(self, table: str, key: Any, value: Any):
+        """Set or, with _MISSING, delete one row. Caller holds the lock."""
+        if table == 'users':
+            previous = self.users.get(key)
+            before = previous.active_succubus if previous else None
+            after = value.active_succubus if value is not _MISSING else None
+            if before != after:
+                if before:
+                    self.active[before].pop(key, None)
+                if after:
+                    self.active.setdefault(after, {})[key] = None
+            if value is _MISSING:
+                self.users.pop(key, None)
+            else:
+                self.users[key] = value
+            return
+
+        user_id, name = key
+        rows = (self.items if table == 'items' else self.user_succubus).setdefault(user_id, {})
+        if value is _MISSING:
+            rows.pop(name, None)
+        else:
+            rows[name] = value
+
+    def _log_commit(self, tx: MemoryTransaction):
+        """Called with the lock held just before `tx` commits; nothing to persist here."""
+
+    def transaction(self) -> MemoryTransaction:
+        """Same contract as DatabaseManager.transaction()."""
+        return MemoryTransaction(self)
+
+    def close(self):
+        pass
+
+    # User methods
+    def get_user(self, user_id: str) -> Optional[UserRow]:
+        with self.lock:
+            user = self.users.get(user_id)
+            return user.copy() if user else None
+
+    def create_or_update_user(self, user_id: str, username: str):
+        with self.transaction() as tx:
+            tx.create_or_update_user(user_id, username)
+
+    def update_user_score(self, user_id: str, faps: int, score: int):
+        with self.transaction() as tx:
+            tx.update_user_score(user_id, faps, score)
+
+    def add_user_score(self, user_id: str, faps: int = 0, score: int = 0,
+                       min_score: Optional[int] = None) -> Optional[Dict[str, int]]:
+        with self.transaction() as tx:
+            return tx.add_user_score(user_id, faps, score, min_score)
+
+    def get_scoreboard(self) -> List[ScoreboardRow]:
+        with self.lock:
+            rows = [
+                ScoreboardRow(user.user_id, user.username, user.faps, user.score)
+                for user in self.users.values() if user.faps > 0
+            ]
+        return sorted(rows, key=lambda row: (row.score, row.username))
+
+    def get_all_users(self) -> List[str]:
+        with self.lock:
+            return list(self.users)
+
+    def sample_user(self, exclude: Optional[str] = None, seen_within: Optional[float] = None) -> Optional[str]:
+        """See DatabaseManager.sample_user."""
+        return self.sampler.sample(exclude, seen_within)
+
+    def get_users_with_active_succubus(self) -> List[ActiveSuccubusRow]:
+        with self.lock:
+            return [
+                ActiveSuccubusRow(user_id, succubus_id)
+                for succubus_id, user_ids in self.active.items() for user_id in user_ids
+            ]
+
+    def get_active_user_ids(self, succubus_id: str) -> List[str]:
+        with self.lock:
+            return list(self.active.get(succubus_id, {}))
+
+    # Batch methods
+    def get_users_many(self, user_ids: Iterable[str]) -> Dict[str, UserRow]:
+        with self.lock:
+            return {user_id: self.users[user_id].copy() for user_id in user_ids if user_id in self.users}
+
+    def get_active_succubus_many(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        with self.lock:
+            return {
+                user_id: self.users[user_id].active_succubus for user_id in user_ids
+                if user_id in self.users and self.users[user_id].active_succubus
+            }
+
+    def get_items_many(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            return {
+                user_id: {item_name: quantity for item_name, quantity in self.items.get(user_id, {}).items() if quantity > 0}
+                for user_id in user_ids
+            }
+
+    def iter_users_with_active_succubus(self, succubus_id: str, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Yield every user whose active succubus is `succubus_id`, see DatabaseManager."""
+        with self.lock:
+            rows = [
+                {'user_id': user_id, 'last_succubus_activation': _from_epoch(self.users[user_id].last_succubus_activation)}
+                for user_id in self.active.get(succubus_id, {})
+            ]
+        yield from rows
+
+    # Item methods
+    def get_user_items(self, user_id: str) -> Dict[str, int]:
+        with self.lock:
+            return {item_name: quantity for item_name, quantity in self.items.get(user_id, {}).items() if quantity > 0}
+
+    def update_item_quantity(self, user_id: str, item_name: str, quantity: int):
+        with self.transaction() as tx:
+            tx.update_item_quantity(user_id, item_name, quantity)
+
+    def add_item_quantity(self, user_id: str, item_name: str, quantity: int) -> int:
+        with self.transaction() as tx:
+            return tx.add_item_quantity(user_id, item_name, quantity)
+
+    # Fapcoin methods
+    def get_fapcoins(self, user_id: str) -> int:
+        with self.lock:
+            user = self.users.get(user_id)
+            return user.fapcoins if user else 0
+
+    def update_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER):
+        with self.transaction() as tx:
+            tx.update_fapcoins(user_id, amount, reason)
+
+    def add_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER) -> Optional[int]:
+        with self.transaction() as tx:
+            return tx.add_fapcoins(user_id, amount, reason)
+
+    def update_daily_timestamp(self, user_id: str, cooldown_hours: float = 12):
+        with self.transaction() as tx:
+            tx.update_daily_timestamp(user_id, cooldown_hours)
+
+    def init_next_daily(self, user_id: str, cooldown_hours: float = 12):
+        with self.transaction() as tx:
+            tx.init_next_daily(user_id, cooldown_hours)
+
+    def get_last_daily(self, user_id: str) -> Optional[datetime]:
+        with self.lock:
+            user = self.users.get(user_id)
+            return _from_epoch(user.last_daily) if user else None
+
+    def get_next_daily_due(self, succubus_id: str) -> Optional[int]:
+        with self.lock:
+            return min(
+                (self.users[user_id].next_daily_at for user_id in self.active.get(succubus_id, {})
+                 if self.users[user_id].next_daily_at is not None),
+                default=None
+            )
+
+    def take_dailies_due(self, succubus_id: str, now: int) -> List[str]:
+        with self.transaction() as tx:
+            return tx.take_dailies_due(succubus_id, now)
+
+    # Succubus methods
+    def get_user_succubus(self, user_id: str) -> List[UserSuccubusRow]:
+        with self.lock:
+            return [row.copy() for row in self.user_succubus.get(user_id, {}).values()]
+
+    def activate_succubus(self, user_id: str, succubus_id: str) -> bool:
+        with self.transaction() as tx:
+            return tx.activate_succubus(user_id, succubus_id)
+
+    def get_active_succubus(self, user_id: str) -> Optional[str]:
+        with self.lock:
+            user = self.users.get(user_id)
+            return user.active_succubus if user else None
+
+    def get_succubus_activation_time(self, user_id: str) -> Optional[datetime]:
+        with self.lock:
+            user = self.users.get(user_id)
+            return _from_epoch(user.last_succubus_activation) if user else None
+
+    def update_succubus_xp(self, user_id: str, succubus_id: str, new_xp: int):
+        with self.transaction() as tx:
+            tx.update_succubus_xp(user_id, succubus_id, new_xp)
+
+    def update_succubus_level(self, user_id: str, succubus_id: str, new_level: int, new_xp: int):
+        with self.transaction() as tx:
+            tx.update_succubus_level(user_id, succubus_id, new_level, new_xp)
+
+    def add_succubus_xp(self, user_id: str, succubus_id: str, xp: int) -> Optional[Dict[str, int]]:
+        with self.transaction() as tx:
+            return tx.add_succubus_xp(user_id, succubus_id, xp)
+
+    def add_user_succubus(self, user_id: str, succubus_id: str, xp: int = 0, level: int = 1):
+        with self.transaction() as tx:
+            tx.add_user_succubus(user_id, succubus_id, xp, level)
+
+    # Scheduled job methods
+    def get_scheduled_jobs(self, before: int, after: int = 0) -> List[Tuple[str, str, int]]:
+        with self.lock:
+            return sorted(
+                ((job, user_id, run_at) for (job, user_id), run_at in self.scheduled_jobs.items()
+                 if after <= run_at < before),
+                key=lambda row: row[2]
+            )
+
+    def set_scheduled_jobs(self, jobs: List[Tuple[str, str, Optional[int]]]):
+        with self.lock:
+            for job, user_id, run_at in jobs:
+                if run_at is None:
+                    self.scheduled_jobs.pop((job, user_id), None)
+                else:
+                    self.scheduled_jobs[(job, user_id)] = run_at
+
+    def add_scheduled_job(self, job: str, user_id: str, run_at: int) -> int:
+        with self.lock:
+            return self.scheduled_jobs.setdefault((job, user_id), run_at)
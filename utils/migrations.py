@@ -0,0 +1,308 @@
+import sqlite3
+import time
+from typing import Callable, List, Tuple
+
+# Discord IDs are stored as INTEGER; rows whose id isn't a plain number can't be converted
+NUMERIC_ID = "{0} <> '' AND {0} NOT GLOB '*[^0-9]*'"
+
+def _epoch(column: str) -> str:
+    """SQL expression converting an ISO timestamp column (naive UTC) to epoch seconds."""
+    return f"CAST(strftime('%s', {column}) AS INTEGER)"
+
+def _v1_initial(cur: sqlite3.Cursor):
+    """Original schema: TEXT ids and ISO timestamps."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            faps INTEGER DEFAULT 0,
+            score INTEGER DEFAULT 0,
+            fapcoins INTEGER DEFAULT 0,
+            last_daily TIMESTAMP,
+            active_succubus TEXT,
+            last_succubus_activation TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            item_name TEXT,
+            quantity INTEGER DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            UNIQUE(user_id, item_name)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_succubus (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            succubus_id TEXT,
+            acquired_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            xp INTEGER DEFAULT 0,
+            level INTEGER DEFAULT 1,
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            UNIQUE(user_id, succubus_id)
+        )
+    """)
+
+def _v2_compact(cur: sqlite3.Cursor):
+    """
+    INTEGER ids and epoch timestamps. `users` keys on the rowid itself;
+    `items` and `user_succubus` are clustered on their natural key.
+    """
+    cur.execute("""
+        CREATE TABLE users_v2 (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            faps INTEGER NOT NULL DEFAULT 0,
+            score INTEGER NOT NULL DEFAULT 0,
+            fapcoins INTEGER NOT NULL DEFAULT 0,
+            last_daily INTEGER,
+            active_succubus TEXT,
+            last_succubus_activation INTEGER
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE items_v2 (
+            user_id INTEGER NOT NULL REFERENCES users(user_id),
+            item_name TEXT NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, item_name)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("""
+        CREATE TABLE user_succubus_v2 (
+            user_id INTEGER NOT NULL REFERENCES users(user_id),
+            succubus_id TEXT NOT NULL,
+            acquired_date INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+            xp INTEGER NOT NULL DEFAULT 0,
+            level INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (user_id, succubus_id)
+        ) WITHOUT ROWID
+    """)
+
+    cur.execute(f"""
+        INSERT INTO users_v2
+        SELECT CAST(user_id AS INTEGER), username,
+               COALESCE(faps, 0), COALESCE(score, 0), COALESCE(fapcoins, 0),
+               {_epoch('last_daily')}, active_succubus, {_epoch('last_succubus_activation')}
+        FROM users
+        WHERE {NUMERIC_ID.format('user_id')}
+    """)
+    cur.execute(f"""
+        INSERT INTO items_v2
+        SELECT CAST(user_id AS INTEGER), item_name, COALESCE(quantity, 0)
+        FROM items
+        WHERE {NUMERIC_ID.format('user_id')} AND item_name IS NOT NULL
+    """)
+    cur.execute(f"""
+        INSERT INTO user_succubus_v2
+        SELECT CAST(user_id AS INTEGER), succubus_id,
+               COALESCE({_epoch('acquired_date')}, CAST(strftime('%s', 'now') AS INTEGER)),
+               COALESCE(xp, 0), COALESCE(level, 1)
+        FROM user_succubus
+        WHERE {NUMERIC_ID.format('user_id')} AND succubus_id IS NOT NULL
+    """)
+
+    cur.execute(f"SELECT COUNT(*) FROM users WHERE NOT ({NUMERIC_ID.format('user_id')})")
+    skipped = cur.fetchone()[0]
+    if skipped:
+        print(f"WARNING: schema v2 dropped {skipped} user(s) without a numeric Discord ID")
+
+    for table in ('user_succubus', 'items', 'users'):
+        cur.execute(f"DROP TABLE {table}")
+        cur.execute(f"ALTER TABLE {table}_v2 RENAME TO {table}")
+
+def _v3_indexes(cur: sqlite3.Cursor):
+    """Indexes for the scoreboard, the startup succubus scan and owned items."""
+    # Covering and already in scoreboard order, so the query never sorts or touches the table
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_users_scoreboard
+        ON users (score, username, faps) WHERE faps > 0
+    """)
+    # Only the handful of users with an active succubus are indexed
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_users_active_succubus
+        ON users (active_succubus) WHERE active_succubus IS NOT NULL
+    """)
+    # Skips used-up items without reading them
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_items_owned
+        ON items (user_id, item_name, quantity) WHERE quantity > 0
+    """)
+
+def _v4_coin_ledger(cur: sqlite3.Cursor):
+    """Append-only fapcoin ledger, see utils/coin_ledger.py."""
+    cur.execute("""
+        CREATE TABLE coin_ledger (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    """)
+    cur.execute("CREATE INDEX idx_coin_ledger_user ON coin_ledger (user_id, id)")
+    cur.execute("""
+        CREATE TABLE coin_snapshots (
+            snapshot_id INTEGER PRIMARY KEY,
+            ledger_id INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE coin_snapshot_balances (
+            snapshot_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            balance INTEGER NOT NULL,
+            PRIMARY KEY (snapshot_id, user_id)
+        ) WITHOUT ROWID
+    """)
+    # Opening snapshot: today's balances become the starting point of the ledger
+    cur.execute("INSERT INTO coin_snapshots (snapshot_id, ledger_id, created_at) VALUES (1, 0, ?)",
+                (int(time.time()),))
+    cur.execute("""
+        INSERT INTO coin_snapshot_balances (snapshot_id, user_id, balance)
+        SELECT 1, user_id, fapcoins FROM users WHERE fapcoins <> 0
+    """)
+
+def _v5_journal_state(cur: sqlite3.Cursor):
+    """Last journal segment folded into the tables, see utils/journaled_backend.py."""
+    cur.execute("""
+        CREATE TABLE journal_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            segment INTEGER NOT NULL
+        )
+    """)
+    cur.execute("INSERT INTO journal_state (id, segment) VALUES (1, 0)")
+
+def _v6_user_archive(cur: sqlite3.Cursor):
+    """last_seen on users and the cold tables inactive users are moved to, see utils/user_archive.py."""
+    cur.execute("ALTER TABLE users ADD COLUMN last_seen INTEGER")
+    # Nobody has been seen yet; count from today so no one is archived straight away
+    cur.execute("UPDATE users SET last_seen = ?", (int(time.time()),))
+    # Users with an active succubus are never archived, so they aren't indexed
+    cur.execute("""
+        CREATE INDEX idx_users_last_seen
+        ON users (last_seen) WHERE active_succubus IS NULL
+    """)
+    cur.execute("""
+        CREATE TABLE users_archive (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            faps INTEGER NOT NULL DEFAULT 0,
+            score INTEGER NOT NULL DEFAULT 0,
+            fapcoins INTEGER NOT NULL DEFAULT 0,
+            last_daily INTEGER,
+            active_succubus TEXT,
+            last_succubus_activation INTEGER,
+            last_seen INTEGER,
+            archived_at INTEGER NOT NULL
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE items_archive (
+            user_id INTEGER NOT NULL,
+            item_name TEXT NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, item_name)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("""
+        CREATE TABLE user_succubus_archive (
+            user_id INTEGER NOT NULL,
+            succubus_id TEXT NOT NULL,
+            acquired_date INTEGER NOT NULL,
+            xp INTEGER NOT NULL DEFAULT 0,
+            level INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (user_id, succubus_id)
+        ) WITHOUT ROWID
+    """)
+
+def _v7_scheduled_jobs(cur: sqlite3.Cursor):
+    """Next run of every durable succubus timer, see utils/scheduler.py."""
+    cur.execute("""
+        CREATE TABLE scheduled_jobs (
+            job TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            run_at INTEGER NOT NULL,
+            PRIMARY KEY (job, user_id)
+        ) WITHOUT ROWID
+    """)
+    # Startup and the scheduler's refills only read the jobs due in the next window
+    cur.execute("CREATE INDEX idx_scheduled_jobs_run_at ON scheduled_jobs (run_at)")
+
+def _v8_next_daily_at(cur: sqlite3.Cursor):
+    """When each user's daily is next available, for Eryndra's notifications."""
+    cur.execute("ALTER TABLE users ADD COLUMN next_daily_at INTEGER")
+    cur.execute("ALTER TABLE users_archive ADD COLUMN next_daily_at INTEGER")
+    # Dailies that are already available, or never claimed, count as due, so Eryndra users hear about them
+    # once after the upgrade
+    now = _epoch("'now'")
+    cur.execute(f"UPDATE users SET next_daily_at = COALESCE(last_daily + 12 * 3600, {now})")
+    # Due notifications are a range scan of one succubus' users
+    cur.execute("""
+        CREATE INDEX idx_users_next_daily
+        ON users (active_succubus, next_daily_at) WHERE active_succubus IS NOT NULL
+    """)
+    # Eryndra's 5-minute checks are replaced by the column
+    cur.execute("DELETE FROM scheduled_jobs WHERE job = 'eryndra_daily'")
+
+# (version, migration) pairs, applied in order. Never edit a released step, add a new one.
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Cursor], None]]] = [
+    (1, _v1_initial),
+    (2, _v2_compact),
+    (3, _v3_indexes),
+    (4, _v4_coin_ledger),
+    (5, _v5_journal_state),
+    (6, _v6_user_archive),
+    (7, _v7_scheduled_jobs),
+    (8, _v8_next_daily_at),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(cur: sqlite3.Cursor) -> int:
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('schema_version', 'users')")
+    tables = {row[0] for row in cur.fetchall()}
+    if 'schema_version' in tables:
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        version = cur.fetchone()[0]
+        if version:
+            return version
+    # Databases created before versioning already have the v1 tables
+    return 1 if 'users' in tables else 0
+
+def run_migrations(conn: sqlite3.Connection):
+    """
+    Bring the database up to SCHEMA_VERSION.
+
+    Everything runs in one BEGIN IMMEDIATE transaction, so other connections
+    keep working on the old schema until the commit and a failed step leaves
+    the database untouched. Safe to call on every startup.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        # Read the version under the write lock so two processes can't both migrate
+        version = get_schema_version(cur)
+        if version >= SCHEMA_VERSION:
+            conn.rollback()
+            return
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                applied_at INTEGER NOT NULL
+            )
+        """)
+        for step, migration in MIGRATIONS:
+            if step > version:
+                migration(cur)
+                cur.execute("INSERT OR REPLACE INTO schema_version (version, applied_at) VALUES (?, ?)",
+                            (step, int(time.time())))
+                print(f"Database migrated to schema v{step}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
@@ -0,0 +1,225 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+import discord
+
+# Discord's limits for one message
+MAX_CONTENT = 2000
+MAX_EMBEDS = 10
+MAX_DESCRIPTION = 4096
+MAX_EMBED_TOTAL = 6000
+
+class Notification:
+    """One user's line in an embed; notifications with the same title, color and footer share an embed."""
+
+    __slots__ = ('user_id', 'title', 'description', 'color', 'footer')
+
+    def __init__(self, user_id: str, title: str, description: str, color: discord.Color, footer: Optional[str]):
+        self.user_id = user_id
+        self.title = title
+        self.description = description
+        self.color = color
+        self.footer = footer
+
+    @property
+    def group(self) -> Tuple[str, int, Optional[str]]:
+        return (self.title, self.color.value, self.footer)
+
+    @property
+    def line(self) -> str:
+        return f"<@{self.user_id}> {self.description}"
+
+class _Outgoing:
+    """A message being put together, kept under Discord's size limits."""
+
+    __slots__ = ('mentions', 'embeds', 'content_length', 'embed_total')
+
+    def __init__(self):
+        # Ordered set of the users to ping
+        self.mentions: Dict[str, None] = {}
+        # (first notification, lines, description length) per embed
+        self.embeds: List[Tuple[Notification, List[str], int]] = []
+        self.content_length = 0
+        self.embed_total = 0
+
+    def add(self, notification: Notification) -> bool:
+        """Add the notification's mention and line. Returns False, changing nothing, if they don't fit."""
+        line = notification.line
+        mention = f"<@{notification.user_id}>"
+        content_length = self.content_length
+        if notification.user_id not in self.mentions:
+            content_length += len(mention) + (1 if self.mentions else 0)
+        if content_length > MAX_CONTENT:
+            return False
+
+        last = self.embeds[-1] if self.embeds else None
+        if last and last[0].group == notification.group and last[2] + 1 + len(line) <= MAX_DESCRIPTION:
+            added = 1 + len(line)
+        elif len(self.embeds) >= MAX_EMBEDS or len(line) > MAX_DESCRIPTION:
+            return False
+        else:
+            last = None
+            added = len(notification.title) + len(notification.footer or '') + len(line)
+        if self.embed_total + added > MAX_EMBED_TOTAL:
+            return False
+
+        if last:
+            first, lines, length = self.embeds[-1]
+            lines.append(line)
+            self.embeds[-1] = (first, lines, length + added)
+        else:
+            self.embeds.append((notification, [line], len(line)))
+        self.mentions[notification.user_id] = None
+        self.content_length = content_length
+        self.embed_total += added
+        return True
+
+    def build(self) -> Tuple[str, List[discord.Embed]]:
+        content = ' '.join(f"<@{user_id}>" for user_id in self.mentions)
+        embeds = []
+        for first, lines, _ in self.embeds:
+            embed = discord.Embed(title=first.title, description='\n'.join(lines), color=first.color)
+            if first.footer:
+                embed.set_footer(text=first.footer)
+            embeds.append(embed)
+        return content, embeds
+
+def pack(notifications: List[Notification]) -> List[_Outgoing]:
+    """
+    Put notifications into as few messages as Discord's limits allow. Each
+    message pings its users once and has one embed per title, color and
+    footer, listing a line per notification.
+
+    Args:
+        notifications (List[Notification]): In the order they were queued.
+
+    Returns:
+        List[_Outgoing]: The messages, ready to `build()`.
+    """
+    groups: Dict[Tuple[str, int, Optional[str]], List[Notification]] = {}
+    for notification in notifications:
+        groups.setdefault(notification.group, []).append(notification)
+
+    messages: List[_Outgoing] = []
+    for group in groups.values():
+        for notification in group:
+            if messages and messages[-1].add(notification):
+                continue
+            message = _Outgoing()
+            if not message.add(notification):
+                print(f"Notification for user {notification.user_id} is too long to send: {notification.title}")
+                continue
+            messages.append(message)
+    return messages
+
+class TokenBucket:
+    """Allows `burst` sends at once, then `rate` per second."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self):
+        """Wait until a send is allowed and use it up."""
+        self._refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= 1
+
+class NotificationQueue:
+    """
+    Outgoing notifications to Discord channels, sent in batches.
+
+    Each user's ping and embed go out as one message instead of two, and the
+    notifications queued for a channel within `window` seconds of each other
+    are sent together: one ping per user, one embed per kind of notification
+    with a line per user. Each channel has a token bucket, so bursts (many
+    timers coming due at once) wait their turn instead of running into
+    Discord's rate limits.
+
+    Messages that need the sent message back, like Morvina's loot box which
+    waits for a reaction, keep sending directly.
+    """
+
+    def __init__(self, bot, window: float = 2.0, rate: float = 1.0, burst: int = 5):
+        """
+        Args:
+            bot: The Discord bot; its config has the default notification channel.
+            window (float): Seconds notifications are collected before a channel's batch is sent.
+            rate (float): Messages per second per channel, once the burst is used up.
+            burst (int): Messages a channel can take at once.
+        """
+        self.bot = bot
+        self.window = window
+        self.rate = rate
+        self.burst = burst
+        self._pending: Dict[int, List[Notification]] = {}
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    @property
+    def default_channel_id(self) -> int:
+        # The notification channel from config, fallback to first allowed channel
+        return self.bot.config.get('notification_channel', self.bot.config['allowed_channels'][0])
+
+    def notify(self, user_id: str, title: str, description: str, color: discord.Color,
+               footer: Optional[str] = None, channel_id: Optional[int] = None):
+        """
+        Queue a notification that pings the user. It is sent within `window`
+        seconds, or later if the channel is at its rate limit.
+
+        Args:
+            user_id (str): The Discord user ID to ping.
+            title (str): Embed title; notifications with the same title, color and footer share an embed.
+            description (str): The user's line in the embed, after their mention.
+            color (discord.Color): Embed color.
+            footer (Optional[str]): Embed footer.
+            channel_id (Optional[int]): Channel to send to, the notification channel by default.
+        """
+        channel_id = channel_id or self.default_channel_id
+        self._pending.setdefault(channel_id, []).append(
+            Notification(str(user_id), title, description, color, footer))
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.get_running_loop().create_task(self._drain(channel_id))
+
+    def pending(self) -> int:
+        """Notifications queued and not sent yet."""
+        return sum(len(notifications) for notifications in self._pending.values())
+
+    async def _drain(self, channel_id: int):
+        try:
+            while self._pending.get(channel_id):
+                await asyncio.sleep(self.window)
+                notifications = self._pending.pop(channel_id)
+                channel = self.bot.get_channel(channel_id)
+                if not channel:
+                    print(f"Notification channel {channel_id} not found for {len(notifications)} notifications")
+                    continue
+                bucket = self._buckets.setdefault(channel_id, TokenBucket(self.rate, self.burst))
+                for message in pack(notifications):
+                    await bucket.take()
+                    content, embeds = message.build()
+                    try:
+                        await channel.send(content, embeds=embeds)
+                    except Exception as e:
+                        print(f"Error sending {len(message.mentions)} notifications to channel {channel_id}: {e}")
+        finally:
+            # Notifications queued from here on start a new worker
+            self._workers.pop(channel_id, None)
+
+    def close(self):
+        """Stop the workers. Notifications not sent yet are dropped."""
+        dropped = self.pending()
+        if dropped:
+            print(f"Dropping {dropped} notifications that were not sent")
+        for task in list(self._workers.values()):
+            task.cancel()
+        self._pending = {}
@@ -0,0 +1,169 @@
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Upper bounds of the latency histogram buckets in milliseconds; one more bucket catches the rest
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+class _MethodStats:
+    __slots__ = ('calls', 'errors', 'total', 'max', 'rows', 'commits', 'commit_total', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.commits = 0
+        self.commit_total = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of calls, in ms."""
+        wanted = fraction * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= wanted:
+                return min(bound, self.max * 1000)
+        return self.max * 1000
+
+class _CallState(threading.local):
+    def __init__(self):
+        self.rows = 0
+        self.methods: List[str] = []
+
+class QueryStats:
+    """
+    Per-method call counts, latency histograms, rows read and commit times.
+
+    Off by default. While disabled, an instrumented method costs one
+    attribute check; `enable()` and `disable()` can be called at any time,
+    e.g. from the admin `dbstats` command. Rows are counted by the row
+    factory of the connection pool, so a method served from the cache or
+    the write-behind queue reports 0 rows. Latencies include nested calls.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.methods: Dict[str, _MethodStats] = {}
+        self.since = time.time()
+        self._state = _CallState()
+        self._row_factory = pool.row_factory
+        self._tuple_factory = pool.tuple_factory
+
+    def _counting_row_factory(self, cursor, row):
+        self._state.rows += 1
+        return self._row_factory(cursor, row)
+
+    def _counting_tuple_factory(self, cursor, row):
+        self._state.rows += 1
+        return self._tuple_factory(cursor, row) if self._tuple_factory else row
+
+    def enable(self):
+        if not self.enabled:
+            self._row_factory = self.pool.row_factory
+            self._tuple_factory = self.pool.tuple_factory
+            # Applied to each connection and tuple cursor as it's handed out by the pool
+            self.pool.row_factory = self._counting_row_factory
+            self.pool.tuple_factory = self._counting_tuple_factory
+            self.enabled = True
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            self.pool.row_factory = self._row_factory
+            self.pool.tuple_factory = self._tuple_factory
+
+    def reset(self):
+        with self.lock:
+            self.methods.clear()
+            self.since = time.time()
+
+    def _method(self, name: str) -> _MethodStats:
+        """Caller holds the lock."""
+        stats = self.methods.get(name)
+        if stats is None:
+            stats = self.methods[name] = _MethodStats()
+        return stats
+
+    def call(self, name: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `func` and record it under `name`."""
+        state = self._state
+        rows_before = state.rows
+        state.methods.append(name)
+        failed = True
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            state.methods.pop()
+            with self.lock:
+                stats = self._method(name)
+                stats.calls += 1
+                stats.errors += failed
+                stats.total += elapsed
+                stats.max = max(stats.max, elapsed)
+                stats.rows += state.rows - rows_before
+                elapsed_ms = elapsed * 1000
+                bucket = 0
+                while bucket < len(LATENCY_BUCKETS_MS) and elapsed_ms > LATENCY_BUCKETS_MS[bucket]:
+                    bucket += 1
+                stats.buckets[bucket] += 1
+
+    def record_commit(self, seconds: float, name: Optional[str] = None):
+        """Record a COMMIT, by default under the instrumented method running on this thread."""
+        if name is None:
+            methods = self._state.methods
+            # Transactions opened by cogs commit outside any instrumented method
+            name = methods[-1] if methods else 'transaction'
+        with self.lock:
+            stats = self._method(name)
+            stats.commits += 1
+            stats.commit_total += seconds
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        The numbers recorded so far, slowest total first.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: method name -> calls, errors, total_ms, mean_ms,
+            p50_ms, p95_ms, p99_ms, max_ms, rows, commits and commit_ms.
+        """
+        with self.lock:
+            report = {
+                name: {
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'total_ms': stats.total * 1000,
+                    'mean_ms': stats.total * 1000 / stats.calls if stats.calls else 0.0,
+                    'p50_ms': stats.percentile(0.5),
+                    'p95_ms': stats.percentile(0.95),
+                    'p99_ms': stats.percentile(0.99),
+                    'max_ms': stats.max * 1000,
+                    'rows': stats.rows,
+                    'commits': stats.commits,
+                    'commit_ms': stats.commit_total * 1000,
+                }
+                for name, stats in self.methods.items()
+            }
+        return dict(sorted(report.items(), key=lambda item: item[1]['total_ms'] + item[1]['commit_ms'], reverse=True))
+
+def instrumented(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Record calls of a method on any object with a `stats` QueryStats attribute."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        stats = self.stats
+        if not stats.enabled:
+            return func(self, *args, **kwargs)
+        return stats.call(name, func, self, *args, **kwargs)
+
+    return wrapper
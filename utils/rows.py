@@ -0,0 +1,94 @@
+from typing import Any, Optional, Tuple
+
+class _Row:
+    """
+    Base for the slotted records returned by the storage backends.
+
+    Fields are read as attributes (`user.score`). `user['score']` and
+    `user.get('score')` still work so code written against the old dict
+    rows keeps running while it is migrated.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, field: str) -> Any:
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def get(self, field: str, default: Any = None) -> Any:
+        return getattr(self, field, default)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+
+    def astuple(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def copy(self):
+        return self.__class__(*self.astuple())
+
+    def replace(self, **fields):
+        """A copy with some fields changed."""
+        row = self.copy()
+        for field, value in fields.items():
+            setattr(row, field, value)
+        return row
+
+    def __eq__(self, other) -> bool:
+        return type(other) is type(self) and other.astuple() == self.astuple()
+
+    def __repr__(self) -> str:
+        values = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{self.__class__.__name__}({values})"
+
+class UserRow(_Row):
+    """A `users` row. Timestamps are epoch seconds, as stored."""
+    __slots__ = ('user_id', 'username', 'faps', 'score', 'fapcoins',
+                 'last_daily', 'active_succubus', 'last_succubus_activation', 'next_daily_at')
+
+    def __init__(self, user_id: str, username: str, faps: int = 0, score: int = 0, fapcoins: int = 0,
+                 last_daily: Optional[int] = None, active_succubus: Optional[str] = None,
+                 last_succubus_activation: Optional[int] = None, next_daily_at: Optional[int] = None):
+        self.user_id = user_id
+        self.username = username
+        self.faps = faps
+        self.score = score
+        self.fapcoins = fapcoins
+        self.last_daily = last_daily
+        self.active_succubus = active_succubus
+        self.last_succubus_activation = last_succubus_activation
+        self.next_daily_at = next_daily_at
+
+    @classmethod
+    def from_db(cls, row: tuple) -> 'UserRow':
+        # Discord IDs are INTEGER in the database but str everywhere else
+        return cls(str(row[0]), *row[1:9])
+
+class ScoreboardRow(_Row):
+    """The `users` columns the scoreboard shows."""
+    __slots__ = ('user_id', 'username', 'faps', 'score')
+
+    def __init__(self, user_id: str, username: str, faps: int, score: int):
+        self.user_id = user_id
+        self.username = username
+        self.faps = faps
+        self.score = score
+
+class ActiveSuccubusRow(_Row):
+    __slots__ = ('user_id', 'active_succubus')
+
+    def __init__(self, user_id: str, active_succubus: str):
+        self.user_id = user_id
+        self.active_succubus = active_succubus
+
+class UserSuccubusRow(_Row):
+    """A `user_succubus` row. acquired_date is epoch seconds, as stored."""
+    __slots__ = ('user_id', 'succubus_id', 'acquired_date', 'xp', 'level')
+
+    def __init__(self, user_id: str, succubus_id: str, acquired_date: int, xp: int = 0, level: int = 1):
+        self.user_id = user_id
+        self.succubus_id = succubus_id
+        self.acquired_date = acquired_date
+        self.xp = xp
+        self.level = level
@@ -0,0 +1,48 @@
+import math
+import random
+from typing import List
+
+def geometric_trials(chance: float, rng: random.Random = random) -> int:
+    """
+    Number of independent trials up to and including the first success, when
+    each succeeds with probability `chance`.
+
+    Args:
+        chance (float): Probability that a trial succeeds, above 0.
+        rng (random.Random): Source of randomness, the `random` module by default.
+
+    Returns:
+        int: 1 or more.
+    """
+    if chance >= 1:
+        return 1
+    # 1 - random() is in (0, 1], so the log is finite and the result never below 1
+    return 1 + int(math.log(1.0 - rng.random()) / math.log1p(-chance))
+
+def bernoulli_hits(count: int, chance: float, rng: random.Random = random) -> List[int]:
+    """
+    Roll `count` independent trials that each succeed with probability `chance`.
+
+    Rather than one draw per trial, it draws the number of misses before the
+    next hit from the geometric distribution and jumps over them, so the cost
+    is one random number per hit: about 30 for 100 users at 30%.
+
+    Args:
+        count (int): Number of trials.
+        chance (float): Probability that a trial succeeds.
+        rng (random.Random): Source of randomness, the `random` module by default.
+
+    Returns:
+        List[int]: Indices of the trials that succeeded, in increasing order.
+    """
+    if chance <= 0 or count <= 0:
+        return []
+    if chance >= 1:
+        return list(range(count))
+    hits = []
+    index = -1
+    while True:
+        index += geometric_trials(chance, rng)
+        if index >= count:
+            return hits
+        hits.append(index)
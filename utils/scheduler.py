@@ -0,0 +1,360 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+from .sampling import geometric_trials
+
+# Seconds durable changes are held so the ones made around the same time are saved together
+SAVE_DELAY = 1.0
+
+def advance(when: float, now: float, interval: float, chance: Optional[float] = None) -> float:
+    """
+    The run after the one due at `when`, for a job repeating every `interval`
+    seconds. With a `chance`, the job stands for an "every interval, this
+    chance" roll and only its hits run: the next one is a geometric number of
+    intervals away, which fires exactly as often as rolling every interval.
+
+    A run that fell behind (the bot was down, say) is followed by the next
+    tick after `now`, so the job keeps its phase.
+
+    Args:
+        when (float): Epoch seconds the run was due.
+        now (float): Epoch seconds now, at or after `when`.
+        interval (float): Seconds between ticks.
+        chance (Optional[float]): Probability that a tick runs; None runs every tick.
+
+    Returns:
+        float: Epoch seconds of the next run.
+    """
+    missed = (now - when) // interval
+    # The ticks skipped while behind don't roll; rolls are independent, so the ones after are unaffected
+    ticks = geometric_trials(chance) if chance is not None else 1
+    return when + (missed + ticks) * interval
+
+class ScheduledJob:
+    """One pending callback. `interval` makes it repeat until cancelled, `chance` only on some ticks."""
+
+    __slots__ = ('key', 'when', 'seq', 'callback', 'args', 'interval', 'chance')
+
+    def __init__(self, key: Hashable, when: float, callback: Callable[..., Awaitable[Any]],
+                 args: Tuple, interval: Optional[float], chance: Optional[float] = None):
+        self.key = key
+        self.when = when
+        self.seq = 0
+        self.callback = callback
+        self.args = args
+        self.interval = interval
+        self.chance = chance
+
+class Scheduler:
+    """
+    Runs timed callbacks for every user from a single asyncio task.
+
+    Jobs are kept in a heap ordered by due time, plus a dict from key to job.
+    Cancelling or moving a job only updates the dict; its old heap entry is
+    skipped when it comes up, and the heap is rebuilt once most of it is
+    stale. Keys are any hashable, by convention `(effect, user_id)`.
+
+    Due callbacks run in their own short-lived task, so a slow one (waiting
+    for a reaction, say) doesn't hold back the others. A repeating job is
+    rescheduled before its callback runs; the callback may `reschedule` or
+    `cancel` its own key to change that. A repeating job with a `chance`
+    sleeps straight to its next hit instead of waking every interval to roll,
+    see `advance`.
+
+    Effects registered with `register` are durable: their next run is saved
+    in the scheduled_jobs table, so restarts don't reset the clocks. Only
+    the durable jobs due within `horizon` seconds are kept in memory; the
+    rest are loaded from the run_at index as their time comes. Start them
+    with `await start()` once every durable effect is registered: saved
+    jobs of effects that aren't registered are deleted as they are loaded.
+    """
+
+    def __init__(self, db=None, horizon: float = 7200):
+        """
+        Args:
+            db: AsyncDatabaseManager the durable jobs are saved to; None keeps them in memory only.
+            horizon (float): Seconds ahead of now that durable jobs are kept in memory.
+        """
+        self.db = db
+        self.horizon = horizon
+        self._jobs: Dict[Hashable, ScheduledJob] = {}
+        self._heap: List[Tuple[float, int, ScheduledJob]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._running = set()
+        # effect -> (callback, interval, chance) of the durable jobs
+        self._durable: Dict[str, Tuple[Callable[..., Awaitable[Any]], Optional[float], Optional[float]]] = {}
+        # (effect, user_id) -> next run to save, None to delete
+        self._unsaved: Dict[Tuple[str, str], Optional[float]] = {}
+        self._save_at: Optional[float] = None
+        # Durable jobs due before this are in memory. Until start() that's none of them.
+        self._loaded_until = 0 if db else math.inf
+        self._store_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._jobs
+
+    def register(self, effect: str, callback: Callable[..., Awaitable[Any]], interval: Optional[float] = None,
+                 chance: Optional[float] = None):
+        """
+        Make `(effect, user_id)` jobs durable. They run `await callback(user_id)`.
+
+        Args:
+            effect (str): First element of the job keys.
+            callback: Coroutine function taking the user ID.
+            interval (Optional[float]): Seconds between runs; None runs each job once.
+            chance (Optional[float]): Probability that each interval runs, see `advance`.
+        """
+        self._durable[effect] = (callback, interval, chance)
+
+    def _is_durable(self, key: Hashable) -> bool:
+        # Without a database durable effects are plain in-memory jobs
+        return self.db is not None and isinstance(key, tuple) and len(key) == 2 and key[0] in self._durable
+
+    def _push(self, job: ScheduledJob):
+        if self._is_durable(job.key):
+            if not self._unsaved:
+                self._wakeup.set()
+            self._unsaved[job.key] = job.when
+            if job.when >= self._loaded_until:
+                # Saved only; loaded back from the table when it's due soon
+                self._jobs.pop(job.key, None)
+                return
+        self._add(job)
+
+    def _add(self, job: ScheduledJob):
+        self._jobs[job.key] = job
+        job.seq = next(self._counter)
+        heapq.heappush(self._heap, (job.when, job.seq, job))
+        # Only an earlier deadline changes how long the loop should sleep
+        if self._heap[0][2] is job:
+            self._wakeup.set()
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[..., Awaitable[Any]], *args,
+                 interval: Optional[float] = None, chance: Optional[float] = None) -> ScheduledJob:
+        """
+        Run `await callback(*args)` in `delay` seconds, replacing any job with the same key.
+
+        Args:
+            key (Hashable): Identifies the job for cancel, reschedule and lookups.
+            delay (float): Seconds from now.
+            callback: Coroutine function to run.
+            *args: Passed to the callback.
+            interval (Optional[float]): Seconds between later runs; None runs it once.
+            chance (Optional[float]): Probability that each later interval runs, see `advance`.
+
+        Returns:
+            ScheduledJob: The new job.
+        """
+        job = ScheduledJob(key, time.time() + delay, callback, args, interval, chance)
+        self._push(job)
+        return job
+
+    async def ensure(self, key: Tuple[str, str], delay: Optional[float] = None) -> bool:
+        """
+        Schedule a durable job in `delay` seconds unless it is already scheduled,
+        in memory or in the table. Use it instead of `key in scheduler`, which
+        only sees the jobs due soon.
+
+        Args:
+            key (Tuple[str, str]): (effect, user_id) of a registered effect.
+            delay (Optional[float]): Seconds from now; None waits for the first
+                interval of the effect that runs.
+
+        Returns:
+            bool: True if the job was created.
+        """
+        effect, user_id = key
+        callback, interval, chance = self._durable[effect]
+        if key in self._jobs or self._unsaved.get(key) is not None:
+            return False
+        now = time.time()
+        when = now + delay if delay is not None else advance(now, now, interval, chance)
+        if self.db and key not in self._unsaved:
+            async with self._store_lock:
+                run_at = await self.db.add_scheduled_job(effect, user_id, math.ceil(when))
+            if key in self._jobs or key in self._unsaved:
+                # Scheduled or cancelled while we waited for the database
+                return False
+            # Either just saved or saved before; in memory only if it's due soon
+            created = run_at == math.ceil(when)
+            if run_at < self._loaded_until:
+                self._add(ScheduledJob(key, when if created else run_at, callback, (user_id,), interval, chance))
+            return created
+        self._push(ScheduledJob(key, when, callback, (user_id,), interval, chance))
+        return True
+
+    def reschedule(self, key: Hashable, delay: float) -> bool:
+        """
+        Move the next run of a job to `delay` seconds from now. Durable jobs
+        must be in memory or changed since the last save, which they always
+        are from inside their callback.
+
+        Returns:
+            bool: False if there is no job with that key.
+        """
+        job = self._jobs.get(key)
+        if not job:
+            if not self._is_durable(key) or self._unsaved.get(key) is None:
+                return False
+            callback, interval, chance = self._durable[key[0]]
+            job = ScheduledJob(key, 0, callback, (key[1],), interval, chance)
+        job.when = time.time() + delay
+        self._push(job)
+        return True
+
+    def cancel(self, key: Hashable) -> bool:
+        """
+        Drop a job, and its saved row for durable ones. A run that already started is not interrupted.
+
+        Returns:
+            bool: False if there is no job with that key in memory.
+        """
+        if self._is_durable(key):
+            if not self._unsaved:
+                self._wakeup.set()
+            self._unsaved[key] = None
+        return self._jobs.pop(key, None) is not None
+
+    def next_run(self, key: Hashable) -> Optional[float]:
+        """Epoch seconds of the job's next run, or None if it isn't scheduled (or is a durable job not loaded yet)."""
+        job = self._jobs.get(key)
+        if job:
+            return job.when
+        return self._unsaved.get(key)
+
+    def jobs(self) -> Iterator[ScheduledJob]:
+        """Every job in memory, in no particular order."""
+        return iter(list(self._jobs.values()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {'scheduled': len(self._jobs), 'heap': len(self._heap), 'running': len(self._running),
+                'unsaved': len(self._unsaved), 'loaded_until': self._loaded_until}
+
+    async def start(self):
+        """Load the durable jobs due within the horizon. Call it after every `register`."""
+        if self.db:
+            await self._load(time.time() + self.horizon)
+
+    async def _load(self, until: float):
+        previous = self._loaded_until
+        # Moved first, so jobs scheduled into the window while we wait stay in memory
+        self._loaded_until = until = math.ceil(until)
+        try:
+            async with self._store_lock:
+                # Saved first, so the table agrees with memory for the window we read
+                await self._save()
+                rows = await self.db.get_scheduled_jobs(until, previous)
+        except Exception:
+            self._loaded_until = previous
+            raise
+        for effect, user_id, run_at in rows:
+            key = (effect, user_id)
+            # Jobs changed since the save are newer than the row
+            if key in self._jobs or key in self._unsaved:
+                continue
+            if effect not in self._durable:
+                # Nothing runs it any more, e.g. an effect that chance_rolls switched to a shared job
+                if not self._unsaved:
+                    self._wakeup.set()
+                self._unsaved[key] = None
+                continue
+            callback, interval, chance = self._durable[effect]
+            self._add(ScheduledJob(key, run_at, callback, (user_id,), interval, chance))
+
+    def take_unsaved(self) -> List[Tuple[str, str, Optional[int]]]:
+        """Durable changes not saved yet, as set_scheduled_jobs rows; the caller saves them."""
+        rows = [(effect, user_id, None if when is None else math.ceil(when))
+                for (effect, user_id), when in self._unsaved.items()]
+        self._unsaved = {}
+        self._save_at = None
+        return rows
+
+    async def _save(self):
+        rows = self.take_unsaved()
+        if not rows:
+            return
+        try:
+            await self.db.set_scheduled_jobs(rows)
+        except Exception as e:
+            print(f"Error saving {len(rows)} scheduled jobs: {e}")
+            # Retried with the next save, unless the job changed again in the meantime
+            for effect, user_id, run_at in rows:
+                self._unsaved.setdefault((effect, user_id), run_at)
+
+    def _is_current(self, seq: int, job: ScheduledJob) -> bool:
+        return self._jobs.get(job.key) is job and job.seq == seq
+
+    def _fire(self, job: ScheduledJob, now: float):
+        if job.interval is None:
+            del self._jobs[job.key]
+            if self._is_durable(job.key):
+                self._unsaved[job.key] = None
+        else:
+            # A job that fell behind (the bot was down, say) runs once and keeps its phase
+            job.when = advance(job.when, now, job.interval, job.chance)
+            self._push(job)
+        task = asyncio.create_task(self._run_job(job))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_job(self, job: ScheduledJob):
+        try:
+            await job.callback(*job.args)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error in scheduled job {job.key}: {e}")
+
+    async def run(self):
+        """Fire due jobs until cancelled. Start it once, with `loop.create_task`."""
+        try:
+            while True:
+                self._wakeup.clear()
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    _, seq, job = heapq.heappop(self._heap)
+                    if self._is_current(seq, job):
+                        self._fire(job, now)
+                # Every job in memory has exactly one current entry, the rest are stale
+                if len(self._heap) > 2 * len(self._jobs) + 64:
+                    self._heap = [entry for entry in self._heap if self._is_current(entry[1], entry[2])]
+                    heapq.heapify(self._heap)
+
+                deadlines = [self._heap[0][0]] if self._heap else []
+                if self.db and self._loaded_until:
+                    # Load the next window halfway through this one
+                    if now + self.horizon / 2 >= self._loaded_until:
+                        try:
+                            await self._load(now + self.horizon)
+                        except Exception as e:
+                            print(f"Error loading scheduled jobs: {e}")
+                            await asyncio.sleep(SAVE_DELAY)
+                        continue
+                    deadlines.append(self._loaded_until - self.horizon / 2)
+                if self.db and self._unsaved:
+                    if self._save_at is None:
+                        self._save_at = now + SAVE_DELAY
+                    if now >= self._save_at:
+                        async with self._store_lock:
+                            await self._save()
+                    else:
+                        deadlines.append(self._save_at)
+
+                # A timer that sets the event rather than wait_for, which can swallow a cancel on 3.11
+                timer = asyncio.get_running_loop().call_later(
+                    max(0, min(deadlines) - time.time()), self._wakeup.set) if deadlines else None
+                try:
+                    await self._wakeup.wait()
+                finally:
+                    if timer:
+                        timer.cancel()
+        finally:
+            for task in list(self._running):
+                task.cancel()
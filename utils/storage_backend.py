@@ -0,0 +1,146 @@
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Protocol, Tuple
+from .coin_ledger import CoinReason
+from .rows import UserRow, ScoreboardRow, ActiveSuccubusRow, UserSuccubusRow
+
+class StorageTransaction(Protocol):
+    """
+    The unit of work returned by `StorageBackend.transaction()`.
+
+    Used as a context manager: everything inside the `with` block commits
+    together on a clean exit and is rolled back if it raises.
+    """
+
+    def begin(self) -> 'StorageTransaction': ...
+    def commit(self): ...
+    def rollback(self): ...
+    def __enter__(self) -> 'StorageTransaction': ...
+    def __exit__(self, exc_type, exc, tb): ...
+
+    # Reads
+    def get_user(self, user_id: str) -> Optional[UserRow]: ...
+    def get_fapcoins(self, user_id: str) -> int: ...
+    def get_last_daily(self, user_id: str) -> Optional[datetime]: ...
+    def get_active_succubus(self, user_id: str) -> Optional[str]: ...
+    def get_user_items(self, user_id: str) -> Dict[str, int]: ...
+    def get_user_succubus(self, user_id: str) -> List[UserSuccubusRow]: ...
+
+    # Writes
+    def create_or_update_user(self, user_id: str, username: str): ...
+    def update_user_score(self, user_id: str, faps: int, score: int): ...
+    def update_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER): ...
+    def update_item_quantity(self, user_id: str, item_name: str, quantity: int): ...
+    def add_user_score(self, user_id: str, faps: int = 0, score: int = 0,
+                       min_score: Optional[int] = None) -> Optional[Dict[str, int]]: ...
+    def add_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER) -> Optional[int]: ...
+    def add_item_quantity(self, user_id: str, item_name: str, quantity: int) -> int: ...
+    def update_daily_timestamp(self, user_id: str, cooldown_hours: float = 12): ...
+    def init_next_daily(self, user_id: str, cooldown_hours: float = 12): ...
+    def take_dailies_due(self, succubus_id: str, now: int) -> List[str]: ...
+    def activate_succubus(self, user_id: str, succubus_id: str) -> bool: ...
+    def update_succubus_xp(self, user_id: str, succubus_id: str, new_xp: int): ...
+    def update_succubus_level(self, user_id: str, succubus_id: str, new_level: int, new_xp: int): ...
+    def add_succubus_xp(self, user_id: str, succubus_id: str, xp: int) -> Optional[Dict[str, int]]: ...
+    def add_user_succubus(self, user_id: str, succubus_id: str, xp: int = 0, level: int = 1): ...
+
+class StorageBackend(Protocol):
+    """
+    Everything cogs and succubus handlers may call on `file_manager.db`
+    (and, awaitable, on `file_manager.async_db`).
+
+    Implemented by DatabaseManager (SQLite, the default), MemoryBackend
+    (plain dicts, nothing on disk) and JournaledBackend (dicts persisted
+    through an append-only journal). Features that only make sense for a
+    database file, such as the coin ledger and backups, are not part of it.
+    """
+
+    def transaction(self) -> StorageTransaction: ...
+    def close(self): ...
+
+    # Users
+    def get_user(self, user_id: str) -> Optional[UserRow]: ...
+    def create_or_update_user(self, user_id: str, username: str): ...
+    def update_user_score(self, user_id: str, faps: int, score: int): ...
+    def add_user_score(self, user_id: str, faps: int = 0, score: int = 0,
+                       min_score: Optional[int] = None) -> Optional[Dict[str, int]]: ...
+    def get_scoreboard(self) -> List[ScoreboardRow]: ...
+    def get_all_users(self) -> List[str]: ...
+    def sample_user(self, exclude: Optional[str] = None, seen_within: Optional[float] = None) -> Optional[str]: ...
+    def get_users_with_active_succubus(self) -> List[ActiveSuccubusRow]: ...
+    def get_active_user_ids(self, succubus_id: str) -> List[str]: ...
+
+    # Batches
+    def get_users_many(self, user_ids: Iterable[str]) -> Dict[str, UserRow]: ...
+    def get_active_succubus_many(self, user_ids: Iterable[str]) -> Dict[str, str]: ...
+    def get_items_many(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, int]]: ...
+    def iter_users_with_active_succubus(self, succubus_id: str, batch_size: int = ...) -> Iterator[Dict[str, Any]]: ...
+
+    # Items
+    def get_user_items(self, user_id: str) -> Dict[str, int]: ...
+    def update_item_quantity(self, user_id: str, item_name: str, quantity: int): ...
+    def add_item_quantity(self, user_id: str, item_name: str, quantity: int) -> int: ...
+
+    # Fapcoins and daily
+    def get_fapcoins(self, user_id: str) -> int: ...
+    def update_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER): ...
+    def add_fapcoins(self, user_id: str, amount: int, reason: str = CoinReason.OTHER) -> Optional[int]: ...
+    def update_daily_timestamp(self, user_id: str, cooldown_hours: float = 12): ...
+    def get_last_daily(self, user_id: str) -> Optional[datetime]: ...
+    def get_next_daily_due(self, succubus_id: str) -> Optional[int]: ...
+    def init_next_daily(self, user_id: str, cooldown_hours: float = 12): ...
+    def take_dailies_due(self, succubus_id: str, now: int) -> List[str]: ...
+
+    # Succubus
+    def get_user_succubus(self, user_id: str) -> List[UserSuccubusRow]: ...
+    def activate_succubus(self, user_id: str, succubus_id: str) -> bool: ...
+    def get_active_succubus(self, user_id: str) -> Optional[str]: ...
+    def get_succubus_activation_time(self, user_id: str) -> Optional[datetime]: ...
+    def update_succubus_xp(self, user_id: str, succubus_id: str, new_xp: int): ...
+    def update_succubus_level(self, user_id: str, succubus_id: str, new_level: int, new_xp: int): ...
+    def add_succubus_xp(self, user_id: str, succubus_id: str, xp: int) -> Optional[Dict[str, int]]: ...
+    def add_user_succubus(self, user_id: str, succubus_id: str, xp: int = 0, level: int = 1): ...
+
+    # Scheduled jobs
+    def get_scheduled_jobs(self, before: int, after: int = 0) -> List[Tuple[str, str, int]]: ...
+    def set_scheduled_jobs(self, jobs: List[Tuple[str, str, Optional[int]]]): ...
+    def add_scheduled_job(self, job: str, user_id: str, run_at: int) -> int: ...
+
+BACKENDS = ('sqlite', 'memory', 'journaled')
+
+def create_backend(db_config: Dict[str, Any], data_folder: str = 'data') -> StorageBackend:
+    """
+    Build the backend named by `database.backend` in config.json.
+
+    Args:
+        db_config (Dict[str, Any]): The "database" section of config.json.
+        data_folder (str): Where the SQLite file (and the journal) lives.
+
+    Returns:
+        StorageBackend: A DatabaseManager for "sqlite" (the default), a MemoryBackend
+        for "memory" or a JournaledBackend for "journaled".
+    """
+    backend = db_config.get('backend', 'sqlite')
+    if backend == 'memory':
+        from .memory_backend import MemoryBackend
+        return MemoryBackend()
+    if backend == 'journaled':
+        from .journaled_backend import JournaledBackend
+        return JournaledBackend(
+            os.path.join(data_folder, 'fapbot.db'),
+            fsync=db_config.get('journal_fsync', False)
+        )
+    if backend != 'sqlite':
+        raise ValueError(f"Unknown database backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+    from .database_manager import DatabaseManager
+    return DatabaseManager(
+        os.path.join(data_folder, 'fapbot.db'),
+        pool_size=db_config.get('pool_size', 4),
+        write_behind=db_config.get('write_behind', False),
+        flush_interval_ms=db_config.get('flush_interval_ms', 50),
+        flush_max_ops=db_config.get('flush_max_ops', 256),
+        cache_size=db_config.get('cache_size', 1024),
+        cache_ttl=db_config.get('cache_ttl_seconds', 300),
+        query_stats=db_config.get('query_stats', False)
+    )
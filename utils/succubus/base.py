@@ -1,3 +1,5 @@
+from ..sampling import bernoulli_hits
+
 class SuccubusHandler:
     """
     Base class for all succubus handlers.
@@ -26,6 +28,36 @@ class SuccubusHandler:
         """
         return self.bot.get_cog('FileManager')
     
+    @property
+    def scheduler(self):
+        """
+        Get the shared Scheduler that runs the handlers' timed effects.
+        
+        Returns:
+            Scheduler: The FileManager's scheduler
+        """
+        return self.file_manager.scheduler
+    
+    @property
+    def notifications(self):
+        """
+        Get the shared queue the handlers' channel notifications go through.
+        
+        Returns:
+            NotificationQueue: The FileManager's notification queue
+        """
+        return self.file_manager.notifications
+    
+    def register_jobs(self, scheduler):
+        """
+        Register the succubus's timed effects with the scheduler, so their saved
+        jobs can run after a restart, and schedule the ones shared by all its
+        users. Called once at startup, before the scheduler loads them.
+        
+        Args:
+            scheduler (Scheduler): The FileManager's scheduler
+        """
+    
     async def apply_ability(self, ctx, *args, **kwargs):
         """
         Apply the succubus's ability effect.
@@ -52,7 +84,7 @@ class SuccubusHandler:
         """
         raise NotImplementedError("Succubus handlers must implement apply_burden")
     
-    def is_active_for_user(self, user_id):
+    async def is_active_for_user(self, user_id):
         """
         Check if this succubus is the active one for the user.
         
@@ -62,9 +94,34 @@ class SuccubusHandler:
         Returns:
             bool: True if this succubus is active for the user, False otherwise
         """
-        active_succubus_id = self.file_manager.db.get_active_succubus(user_id)
+        active_succubus_id = await self.file_manager.async_db.get_active_succubus(user_id)
         return active_succubus_id == self.get_succubus_id()
     
+    @property
+    def sampled_rolls(self):
+        """
+        How the "every hour, X% chance" effects run, from the "chance_rolls" config.
+        
+        Returns:
+            bool: True ("sampled", the default) if each user's job sleeps until their next hit,
+                False ("hourly") if every user rolls together once an hour
+        """
+        return self.bot.config.get('chance_rolls', 'sampled') != 'hourly'
+    
+    async def roll_active_users(self, chance):
+        """
+        Roll once for every user with this succubus active: one query for the
+        users, then one batch of draws for all of them.
+        
+        Args:
+            chance (float): Probability that a user is hit
+            
+        Returns:
+            List[str]: The IDs of the users who were hit
+        """
+        user_ids = await self.file_manager.async_db.get_active_user_ids(self.get_succubus_id())
+        return [user_ids[index] for index in bernoulli_hits(len(user_ids), chance)]
+    
     def get_succubus_id(self):
         """
         Get the ID of this succubus.
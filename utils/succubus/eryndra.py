@@ -1,7 +1,6 @@
 import random
-from datetime import datetime, timedelta
+import time
 import discord
-import asyncio
 from .base import SuccubusHandler
 
 class EryndraHandler(SuccubusHandler):
@@ -16,8 +15,6 @@ class EryndraHandler(SuccubusHandler):
         super().__init__(bot)
         self.succubus_id = "eryndra"
         self.false_alarm_chance = 0.30  # 30% chance
-        self.false_alarm_users = {}  # Track users with active false alarm tasks
-        self.daily_notification_users = {}  # Track users with active daily notification tasks
         self.false_alarm_messages = [
             "Oops! False alarm! Your daily isn't ready yet.",
             "Gotcha! It's not time for your daily reward.",
@@ -40,6 +37,28 @@ class EryndraHandler(SuccubusHandler):
         """
         return self.succubus_id
     
+    def register_jobs(self, scheduler):
+        """
+        Register each user's false alarms, or schedule the hourly roll shared by every Eryndra user
+        
+        Args:
+            scheduler (Scheduler): The FileManager's scheduler
+        """
+        if self.sampled_rolls:
+            scheduler.register("eryndra_false_alarm", self.false_alarm_due, interval=3600, chance=self.false_alarm_chance)
+        else:
+            scheduler.schedule("eryndra_false_alarms", 3600, self.roll_false_alarms, interval=3600)
+    
+    async def on_activate(self, user_id):
+        """
+        Called when a user activates Eryndra: their daily counts as due from when it is
+        available, even if they never claimed one or it was announced before
+        
+        Args:
+            user_id (str): The Discord user ID
+        """
+        await self.file_manager.async_db.init_next_daily(user_id, self.get_daily_cooldown())
+    
     async def apply_ability(self, ctx, **kwargs):
         """
         Apply Eryndra's ability: Notify user when daily is available
@@ -51,75 +70,59 @@ class EryndraHandler(SuccubusHandler):
         Returns:
             bool: True if the ability was applied
         """
-        user_id = str(ctx.author.id)
-        
-        # Check if user is already being monitored
-        if user_id in self.daily_notification_users:
-            # Task already exists, no need to create another one
-            return True
-            
-        # Create a new task to monitor daily availability
-        task = asyncio.create_task(self.monitor_daily_availability(user_id, ctx.author))
-        self.daily_notification_users[user_id] = task
-        
+        # The user's next_daily_at may be earlier than the next notification round
+        await self.schedule_daily_notifications()
         return True
     
-    async def monitor_daily_availability(self, user_id, user):
+    async def schedule_daily_notifications(self):
+        """
+        Make sure a notification round is scheduled, no later than the earliest
+        next_daily_at among Eryndra users
+        """
+        delay = await self.next_round_delay()
+        scheduled = self.scheduler.next_run("eryndra_daily")
+        if scheduled is None or time.time() + delay < scheduled:
+            self.scheduler.schedule("eryndra_daily", delay, self.send_daily_notifications)
+    
+    async def next_round_delay(self):
         """
-        Monitor daily availability for a user and send a notification to the configured channel
+        Seconds until the next notification round: when the next daily is due,
+        and one cooldown at most.
         
-        Args:
-            user_id (str): The Discord user ID
-            user (discord.User): The Discord user object
-        """
-        try:
-            while self.is_active_for_user(user_id):
-                # Get the last daily timestamp
-                last_daily = self.file_manager.db.get_last_daily(user_id)
-                now = datetime.utcnow()
-                
-                # If no last daily or it was more than 12 hours ago
-                if not last_daily or (now - last_daily) >= timedelta(hours=12):
-                    # Get the notification channel from config, fallback to first allowed channel
-                    notification_channel_id = self.bot.config.get('notification_channel', self.bot.config['allowed_channels'][0])
-                    channel = self.bot.get_channel(notification_channel_id)
-                    if channel:
-                        await channel.send(f"<@{user_id}>")
-                        embed = discord.Embed(
-                            title="✨ Daily Available! ✨",
-                            description=f"<@{user_id}>, your daily reward is now available! Use the `daily` command to claim it.",
-                            color=discord.Color.green()
-                        )
-                        embed.set_footer(text="Eryndra's ability: Daily notification")
-                        await channel.send(embed=embed)
-                        
-                        # Wait for 12 hours before checking again to avoid spam
-                        await asyncio.sleep(12 * 3600)
-                    else:
-                        print(f"Notification channel {notification_channel_id} not found for daily notification to user {user_id}")
-                        break  # Stop monitoring if channel is not found
-                
-                # Check every 5 minutes
-                await asyncio.sleep(300)  # 5 minutes
-                
-            # Clean up when no longer active
-            if user_id in self.daily_notification_users:
-                del self.daily_notification_users[user_id]
-                
-        except asyncio.CancelledError:
-            # Task was cancelled, clean up
-            if user_id in self.daily_notification_users:
-                del self.daily_notification_users[user_id]
-        except Exception as e:
-            # Log the error
-            print(f"Error in monitor_daily_availability for user {user_id}: {e}")
-            if user_id in self.daily_notification_users:
-                del self.daily_notification_users[user_id]
+        Returns:
+            float: The delay in seconds
+        """
+        # A daily claimed from now on is due at least one cooldown away, so
+        # looking again by then finds it without being told about the claim
+        next_due = await self.file_manager.async_db.get_next_daily_due(self.succubus_id)
+        delay = self.get_daily_cooldown() * 3600
+        if next_due is not None:
+            delay = min(delay, max(0, next_due - time.time()))
+        return delay
+    
+    async def send_daily_notifications(self):
+        """
+        Notify every Eryndra user whose daily just became available in the configured channel,
+        then schedule the next round for the next daily to come
+        """
+        user_ids = await self.file_manager.async_db.take_dailies_due(self.succubus_id, int(time.time()))
+        for user_id in user_ids:
+            self.notifications.notify(
+                user_id,
+                "✨ Daily Available! ✨",
+                "Your daily reward is now available! Use the `daily` command to claim it.",
+                discord.Color.green(),
+                footer="Eryndra's ability: Daily notification"
+            )
+        
+        self.scheduler.schedule("eryndra_daily", await self.next_round_delay(), self.send_daily_notifications)
     
     async def apply_burden(self, ctx, **kwargs):
         """
         Apply Eryndra's burden: 30% chance of False Alarm every hour
         
+        Note: With hourly rolls, roll_false_alarms covers every user with Eryndra active.
+        
         Args:
             ctx: The command context
             **kwargs: Additional arguments
@@ -127,79 +130,53 @@ class EryndraHandler(SuccubusHandler):
         Returns:
             bool: True if the burden was applied
         """
-        user_id = str(ctx.author.id)
-        
-        # Check if user is already being monitored
-        if user_id in self.false_alarm_users:
-            # Task already exists, no need to create another one
-            return True
-            
-        # Create a new task to send false alarms
-        task = asyncio.create_task(self.send_false_alarms(user_id, ctx.author))
-        self.false_alarm_users[user_id] = task
-        
+        if self.sampled_rolls:
+            # Sleeps until the user's next false alarm, unless the job already exists
+            await self.scheduler.ensure(("eryndra_false_alarm", str(ctx.author.id)))
         return True
     
-    async def send_false_alarms(self, user_id, user):
+    async def false_alarm_due(self, user_id):
         """
-        Send false alarms to the configured channel for a user
+        Send a user's false alarm, at the hour their job drew for it
         
         Args:
             user_id (str): The Discord user ID
-            user (discord.User): The Discord user object
-        """
-        try:
-            while self.is_active_for_user(user_id):
-                # Wait for 1 hour
-                await asyncio.sleep(3600)  # 1 hour
-                
-                # Check if still active
-                if not self.is_active_for_user(user_id):
-                    break
-                    
-                # 30% chance of false alarm
-                if random.random() < self.false_alarm_chance:
-                    # Get the notification channel from config, fallback to first allowed channel
-                    notification_channel_id = self.bot.config.get('notification_channel', self.bot.config['allowed_channels'][0])
-                    channel = self.bot.get_channel(notification_channel_id)
-                    if channel:
-                        await channel.send(f"<@{user_id}>")
-                        embed = discord.Embed(
-                            title="⚠️ False Alarm! ⚠️",
-                            description=f"<@{user_id}>, {random.choice(self.false_alarm_messages)}",
-                            color=discord.Color.red()
-                        )
-                        embed.set_footer(text="Eryndra's burden: False Alarm!")
-                        await channel.send(embed=embed)
-                    else:
-                        print(f"Notification channel {notification_channel_id} not found for false alarm to user {user_id}")
-                        break  # Stop monitoring if channel is not found
-            
-            # Clean up when no longer active
-            if user_id in self.false_alarm_users:
-                del self.false_alarm_users[user_id]
-                
-        except asyncio.CancelledError:
-            # Task was cancelled, clean up
-            if user_id in self.false_alarm_users:
-                del self.false_alarm_users[user_id]
-        except Exception as e:
-            # Log the error
-            print(f"Error in send_false_alarms for user {user_id}: {e}")
-            if user_id in self.false_alarm_users:
-                del self.false_alarm_users[user_id]
-                
+        """
+        if not await self.is_active_for_user(user_id):
+            self.scheduler.cancel(("eryndra_false_alarm", user_id))
+            return
+        self.send_false_alarms([user_id])
+    
+    async def roll_false_alarms(self):
+        """
+        Roll the hourly 30% false alarm chance for every Eryndra user at once
+        and alarm the unlucky ones
+        """
+        user_ids = await self.roll_active_users(self.false_alarm_chance)
+        self.send_false_alarms(user_ids)
+    
+    def send_false_alarms(self, user_ids):
+        """
+        Queue a false alarm for each user in the notification channel
+        
+        Args:
+            user_ids (List[str]): The Discord user IDs
+        """
+        for user_id in user_ids:
+            self.notifications.notify(
+                user_id,
+                "⚠️ False Alarm! ⚠️",
+                random.choice(self.false_alarm_messages),
+                discord.Color.red(),
+                footer="Eryndra's burden: False Alarm!"
+            )
+    
     def cleanup_tasks(self, user_id):
         """
-        Clean up any running tasks for a user
+        Cancel the user's false alarms. Daily notifications only go to users
+        who still have Eryndra active, so they need nothing.
         
         Args:
             user_id (str): The Discord user ID
         """
-        if user_id in self.daily_notification_users:
-            self.daily_notification_users[user_id].cancel()
-            del self.daily_notification_users[user_id]
-            
-        if user_id in self.false_alarm_users:
-            self.false_alarm_users[user_id].cancel()
-            del self.false_alarm_users[user_id]
\ No newline at end of file
+        self.scheduler.cancel(("eryndra_false_alarm", user_id))
\ No newline at end of file
@@ -44,7 +44,7 @@ class SuccubusManager:
         """
         return self.bot.get_cog('FileManager')
     
-    def get_handler_for_user(self, user_id):
+    async def get_handler_for_user(self, user_id):
         """
         Get the appropriate handler for a user's active succubus.
         
@@ -55,13 +55,13 @@ class SuccubusManager:
             SuccubusHandler or None: The handler for the user's active succubus,
             or None if the user has no active succubus
         """
-        active_succubus_id = self.file_manager.db.get_active_succubus(user_id)
+        active_succubus_id = await self.file_manager.async_db.get_active_succubus(user_id)
         if not active_succubus_id:
             return None
         
         return self.handlers.get(active_succubus_id)
     
-    def get_daily_cooldown(self, user_id):
+    async def get_daily_cooldown(self, user_id):
         """
         Get the daily cooldown for a user, taking into account any active succubus effects.
         
@@ -71,13 +71,13 @@ class SuccubusManager:
         Returns:
             int: The cooldown time in hours (default: 12)
         """
-        handler = self.get_handler_for_user(user_id)
+        handler = await self.get_handler_for_user(user_id)
         if handler and isinstance(handler, AstarielleHandler):
             cooldown = handler.get_daily_cooldown()
             return cooldown
         return 12  # Default cooldown
     
-    def get_modified_price(self, user_id, original_price):
+    async def get_modified_price(self, user_id, original_price):
         """
         Get the modified price for store items based on active succubus.
         
@@ -88,12 +88,12 @@ class SuccubusManager:
         Returns:
             int: The modified price
         """
-        handler = self.get_handler_for_user(user_id)
+        handler = await self.get_handler_for_user(user_id)
         if handler and isinstance(handler, AstarielleHandler):
             return handler.get_modified_price(original_price)
         return original_price  # Default price
     
-    def get_modified_item_effect(self, user_id, item_name, original_value):
+    async def get_modified_item_effect(self, user_id, item_name, original_value):
         """
         Get the modified effect value for an item based on active succubus.
         
@@ -105,12 +105,12 @@ class SuccubusManager:
         Returns:
             float or int: The modified effect value
         """
-        handler = self.get_handler_for_user(user_id)
+        handler = await self.get_handler_for_user(user_id)
         if handler and isinstance(handler, RaviennaHandler):
             return handler.get_modified_item_effect(item_name, original_value)
         return original_value
     
-    def check_item_failure(self, user_id):
+    async def check_item_failure(self, user_id):
         """
         Check if an item fails to work due to active succubus burden.
         
@@ -120,7 +120,7 @@ class SuccubusManager:
         Returns:
             bool: True if the item fails, False if it works
         """
-        handler = self.get_handler_for_user(user_id)
+        handler = await self.get_handler_for_user(user_id)
         if handler and isinstance(handler, RaviennaHandler):
             return handler.check_item_failure()
         return False
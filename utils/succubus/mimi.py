@@ -1,6 +1,6 @@
 from .base import SuccubusHandler
+from ..coin_ledger import CoinReason
 from datetime import datetime, timedelta
-import asyncio
 import random
 import discord
 
@@ -16,7 +16,6 @@ class MimiHandler(SuccubusHandler):
         super().__init__(bot)
         self.succubus_id = "mimi"  # Unique identifier for Mimi
         self.failure_chance = 0.20  # 20% chance of not receiving the daily
-        self.daily_users = {}  # Dictionary to track users with active daily tasks
         
     def get_succubus_id(self):
         """
@@ -27,6 +26,15 @@ class MimiHandler(SuccubusHandler):
         """
         return self.succubus_id
     
+    def register_jobs(self, scheduler):
+        """
+        Registers the automatic daily reward
+        
+        Args:
+            scheduler (Scheduler): The FileManager's scheduler
+        """
+        scheduler.register("mimi_daily", self.auto_grant_daily, interval=12 * 3600)
+    
     async def apply_ability(self, ctx, **kwargs):
         """
         Applies Mimi's ability: Automatically grants the daily reward
@@ -40,94 +48,59 @@ class MimiHandler(SuccubusHandler):
         """
         user_id = str(ctx.author.id)
         
-        # Check if the user is already being monitored for automatic daily rewards
-        if user_id in self.daily_users:
-            return True
-            
-        # Create a new task to automatically grant the daily reward every 12 hours
-        task = asyncio.create_task(self.auto_grant_daily(user_id))
-        self.daily_users[user_id] = task
+        # Schedule the automatic daily reward every 12 hours, unless the job already exists
+        await self.scheduler.ensure(("mimi_daily", user_id), 12 * 3600)
         
         return True
     
     async def auto_grant_daily(self, user_id):
         """
-        Automatically grants the daily reward to the user every 12 hours
+        Automatically grants the daily reward to the user; runs every 12 hours
         
         Args:
             user_id (str): The Discord user ID
         """
-        try:
-            while self.is_active_for_user(user_id):
-                # Wait for 12 hours before granting the next daily reward
-                await asyncio.sleep(12 * 3600)
-                
-                # Check if the succubus is still active for the user
-                if not self.is_active_for_user(user_id):
-                    break
-                    
-                # Apply the burden: 20% chance to skip the reward
-                if random.random() < self.failure_chance:
-                    print(f"Mimi's burden: User {user_id} did not receive the daily reward")
-                    await self.send_daily_notification(user_id, success=False)
-                else:
-                    # Grant the daily reward (1 fapcoin)
-                    file_manager = self.bot.get_cog('FileManager')
-                    file_manager.db.update_fapcoins(user_id, 1)
-                    file_manager.db.update_daily_timestamp(user_id)
-                    current_fapcoins = file_manager.db.get_fapcoins(user_id)
-                    print(f"Mimi's ability: Automatically granted daily reward to user {user_id}")
-                    await self.send_daily_notification(user_id, success=True, total=current_fapcoins)
+        # Check if the succubus is still active for the user
+        if not await self.is_active_for_user(user_id):
+            self.scheduler.cancel(("mimi_daily", user_id))
+            return
             
-            # Clean up when the succubus is no longer active for the user
-            if user_id in self.daily_users:
-                del self.daily_users[user_id]
-                
-        except asyncio.CancelledError:
-            # Task was cancelled, clean up
-            if user_id in self.daily_users:
-                del self.daily_users[user_id]
-        except Exception as e:
-            # Log any errors and clean up
-            print(f"Error in auto_grant_daily for user {user_id}: {e}")
-            if user_id in self.daily_users:
-                del self.daily_users[user_id]
+        # Apply the burden: 20% chance to skip the reward
+        if random.random() < self.failure_chance:
+            print(f"Mimi's burden: User {user_id} did not receive the daily reward")
+            self.send_daily_notification(user_id, success=False)
+        else:
+            # Grant the daily reward (1 fapcoin)
+            file_manager = self.bot.get_cog('FileManager')
+            async with file_manager.async_db.transaction() as tx:
+                current_fapcoins = await tx.add_fapcoins(user_id, 1, CoinReason.MIMI_DAILY)
+                await tx.update_daily_timestamp(user_id)
+            print(f"Mimi's ability: Automatically granted daily reward to user {user_id}")
+            self.send_daily_notification(user_id, success=True, total=current_fapcoins)
     
-    async def send_daily_notification(self, user_id, success, total=None):
+    def send_daily_notification(self, user_id, success, total=None):
         """
-        Sends a notification to the configured channel about the automatic daily reward status
+        Queues a notification in the notification channel about the automatic daily reward status
         
         Args:
             user_id (str): The Discord user ID
             success (bool): Whether the daily reward was granted or not
             total (int, optional): The user's current fapcoin total (only for success)
         """
-        # Get the notification channel from config, fallback to first allowed channel
-        notification_channel_id = self.bot.config.get('notification_channel', self.bot.config['allowed_channels'][0])
-        channel = self.bot.get_channel(notification_channel_id)
-        if channel:
-            if success:
-                # Send text message with mention
-                await channel.send(f"<@{user_id}>, you received your automatic daily reward!")
-                # Send embed with details
-                embed = discord.Embed(
-                    title="✨ Automatic Daily Reward ✨",
-                    description=f"You have received 1 fapcoin thanks to Mimi's ability! Total: {total} fapcoins.",
-                    color=discord.Color.green()
-                )
-                await channel.send(embed=embed)
-            else:
-                # Send text message with mention
-                await channel.send(f"<@{user_id}>, your automatic daily reward failed this time.")
-                # Send embed with details
-                embed = discord.Embed(
-                    title="💀 Automatic Daily Failed 💀",
-                    description="Due to Mimi's burden, you did not receive your daily reward.",
-                    color=discord.Color.red()
-                )
-                await channel.send(embed=embed)
+        if success:
+            self.notifications.notify(
+                user_id,
+                "✨ Automatic Daily Reward ✨",
+                f"You have received 1 fapcoin thanks to Mimi's ability! Total: {total} fapcoins.",
+                discord.Color.green()
+            )
         else:
-            print(f"Notification channel {notification_channel_id} not found for user {user_id}")
+            self.notifications.notify(
+                user_id,
+                "💀 Automatic Daily Failed 💀",
+                "Due to Mimi's burden, you did not receive your daily reward.",
+                discord.Color.red()
+            )
     
     async def apply_burden(self, ctx, **kwargs):
         """
@@ -147,11 +120,9 @@ class MimiHandler(SuccubusHandler):
     
     def cleanup_tasks(self, user_id):
         """
-        Cleans up any running tasks for a user
+        Cancels the scheduled daily reward for a user
         
         Args:
             user_id (str): The Discord user ID
         """
-        if user_id in self.daily_users:
-            self.daily_users[user_id].cancel()
-            del self.daily_users[user_id]
\ No newline at end of file
+        self.scheduler.cancel(("mimi_daily", user_id))
\ No newline at end of file
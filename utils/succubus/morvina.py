@@ -19,7 +19,6 @@ class MorvinaHandler(SuccubusHandler):
         self.loot_box_chance = 0.10  # 10% chance per hour
         self.loot_box_duration = 5  # 5 seconds to claim
         self.burden_cost = 3  # Lose 3 Fapcoins per fap
-        self.loot_box_users = {}  # Track users with active loot box tasks
         self.config = self.load_config()  # Load config for channel ID
         
     def load_config(self):
@@ -36,10 +35,24 @@ class MorvinaHandler(SuccubusHandler):
         """
         return self.succubus_id
     
+    def register_jobs(self, scheduler):
+        """
+        Registers each user's loot boxes, or schedules the hourly roll shared by every Morvina user
+        
+        Args:
+            scheduler (Scheduler): The FileManager's scheduler
+        """
+        if self.sampled_rolls:
+            scheduler.register("morvina_loot_box", self.loot_box_due, interval=3600, chance=self.loot_box_chance)
+        else:
+            scheduler.schedule("morvina_loot_boxes", 3600, self.roll_loot_boxes, interval=3600)
+    
     async def apply_ability(self, ctx, **kwargs):
         """
         Applies Morvina's ability: Periodically spawns a Loot Box for the user
         
+        Note: With hourly rolls, roll_loot_boxes covers every user with Morvina active.
+        
         Args:
             ctx: The command context
             **kwargs: Additional arguments
@@ -47,78 +60,74 @@ class MorvinaHandler(SuccubusHandler):
         Returns:
             bool: True if the ability was applied
         """
-        user_id = str(ctx.author.id)
-        
-        # Check if the user is already being monitored for loot boxes
-        if user_id in self.loot_box_users:
-            return True
-            
-        # Create a new task to spawn loot boxes periodically
-        task = asyncio.create_task(self.spawn_loot_boxes(user_id))
-        self.loot_box_users[user_id] = task
-        
+        if self.sampled_rolls:
+            # Sleeps until the user's next loot box, unless the job already exists
+            await self.scheduler.ensure(("morvina_loot_box", str(ctx.author.id)))
         return True
     
-    async def spawn_loot_boxes(self, user_id):
+    async def loot_box_due(self, user_id):
+        """
+        Spawns a user's loot box, at the hour their job drew for it
+        
+        Args:
+            user_id (str): The Discord user ID
+        """
+        if not await self.is_active_for_user(user_id):
+            self.scheduler.cancel(("morvina_loot_box", user_id))
+            return
+        await self.spawn_loot_box(user_id)
+    
+    async def roll_loot_boxes(self):
+        """
+        Rolls the hourly 10% loot box chance for every Morvina user at once
+        and spawns the boxes that came up
         """
-        Periodically spawns loot boxes for the user in the configured channel
+        user_ids = await self.roll_active_users(self.loot_box_chance)
+        # Side by side, each box waits for its own claim
+        results = await asyncio.gather(*(self.spawn_loot_box(user_id) for user_id in user_ids), return_exceptions=True)
+        for user_id, result in zip(user_ids, results):
+            if isinstance(result, Exception):
+                print(f"Error spawning loot box for user {user_id}: {result}")
+    
+    async def spawn_loot_box(self, user_id):
+        """
+        Spawns a loot box for the user in the configured channel
         
         Args:
             user_id (str): The Discord user ID
         """
+        # Get the configured channel
+        channel_id = self.config['allowed_channels'][0]  # Assuming the first channel
+        channel = self.bot.get_channel(channel_id)
+        if not channel:
+            print(f"Channel {channel_id} not found")
+            return
+        
+        # Send the loot box message, ping and embed together
+        embed = discord.Embed(
+            title="✨ Loot Box Appeared! ✨",
+            description=f"<@{user_id}>, clique no 🎁 para reivindicar em 5 segundos!",
+            color=discord.Color.gold()
+        )
+        message = await channel.send(f"<@{user_id}>", embed=embed)
+        await message.add_reaction("🎁")  # Add the emoji reaction
+        
+        # Define check for claiming (only the user with Morvina can claim)
+        def check(reaction, user):
+            return user.id == int(user_id) and str(reaction.emoji) == "🎁" and reaction.message.id == message.id
+        
         try:
-            while self.is_active_for_user(user_id):
-                # Wait for 1 hour
-                await asyncio.sleep(3600) 
-                
-                # Check if still active
-                if not self.is_active_for_user(user_id):
-                    break
-                    
-                # 10% chance to spawn a loot box
-                if random.random() < self.loot_box_chance:
-                    # Get the configured channel
-                    channel_id = self.config['allowed_channels'][0]  # Assuming the first channel
-                    channel = self.bot.get_channel(channel_id)
-                    if not channel:
-                        print(f"Channel {channel_id} not found")
-                        continue
-                    
-                    # Send the loot box message
-                    await channel.send(f"<@{user_id}>")
-                    embed = discord.Embed(
-                        title="✨ Loot Box Appeared! ✨",
-                        description=f"<@{user_id}>, clique no 🎁 para reivindicar em 5 segundos!",
-                        color=discord.Color.gold()
-                    )
-                    message = await channel.send(embed=embed)
-                    await message.add_reaction("🎁")  # Add the emoji reaction
-                    
-                    # Define check for claiming (only the user with Morvina can claim)
-                    def check(reaction, user):
-                        return user.id == int(user_id) and str(reaction.emoji) == "🎁" and reaction.message.id == message.id
-                    
-                    try:
-                        reaction, user = await self.bot.wait_for('reaction_add', check=check, timeout=self.loot_box_duration)
-                        # Grant a reward (e.g., random item)
-                        reward = random.choice(["Fap Shield", "Ultra Fap Shield", "Redemption", "Supreme Redemption", "Faproll", "Ritual"])
-                        file_manager = self.bot.get_cog('FileManager')
-                        file_manager.db.update_item_quantity(user_id, reward, 1)
-                        await channel.send(f"{user.mention} claimed the loot box and received {reward}!")
-                    except asyncio.TimeoutError:
-                        await channel.send("The loot box expired!")
-                    finally:
-                        # Optionally clear reactions
-                        await message.clear_reactions()
-            
-            # Clean up when no longer active
-            if user_id in self.loot_box_users:
-                del self.loot_box_users[user_id]
-                
-        except Exception as e:
-            print(f"Error in spawn_loot_boxes for user {user_id}: {e}")
-            if user_id in self.loot_box_users:
-                del self.loot_box_users[user_id]
+            reaction, user = await self.bot.wait_for('reaction_add', check=check, timeout=self.loot_box_duration)
+            # Grant a reward (e.g., random item)
+            reward = random.choice(["Fap Shield", "Ultra Fap Shield", "Redemption", "Supreme Redemption", "Faproll", "Ritual"])
+            file_manager = self.bot.get_cog('FileManager')
+            await file_manager.async_db.update_item_quantity(user_id, reward, 1)
+            await channel.send(f"{user.mention} claimed the loot box and received {reward}!")
+        except asyncio.TimeoutError:
+            await channel.send("The loot box expired!")
+        finally:
+            # Optionally clear reactions
+            await message.clear_reactions()
     
     async def apply_burden(self, ctx, **kwargs):
         """
@@ -142,11 +151,9 @@ class MorvinaHandler(SuccubusHandler):
 
     def cleanup_tasks(self, user_id):
         """
-        Cleans up any running tasks for a user
+        Cancels the user's loot boxes
         
         Args:
             user_id (str): The Discord user ID
         """
-        if user_id in self.loot_box_users:
-            self.loot_box_users[user_id].cancel()
-            del self.loot_box_users[user_id]
\ No newline at end of file
+        self.scheduler.cancel(("morvina_loot_box", user_id))
\ No newline at end of file
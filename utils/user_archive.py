@@ -0,0 +1,101 @@
+import sqlite3
+import time
+from typing import List
+
+# The users columns kept in users_archive, besides last_seen and archived_at
+ARCHIVED_COLUMNS = ("user_id, username, faps, score, fapcoins, last_daily, active_succubus, last_succubus_activation, "
+                    "next_daily_at")
+
+def archive(cur: sqlite3.Cursor, cutoff: int, limit: int) -> List[str]:
+    """
+    Move up to `limit` users not seen since `cutoff` to the archive tables,
+    with their items and succubus. Users with an active succubus stay, their
+    handlers keep running. Runs inside the caller's write transaction.
+
+    Args:
+        cur (sqlite3.Cursor): Cursor of an open write transaction.
+        cutoff (int): Epoch seconds; users last seen before it are archived.
+        limit (int): Users moved at most.
+
+    Returns:
+        List[str]: The archived user IDs, least recently seen first.
+    """
+    cur.execute("""
+        SELECT user_id
+        FROM users
+        WHERE last_seen < ? AND active_succubus IS NULL
+        ORDER BY last_seen
+        LIMIT ?
+    """, (cutoff, limit))
+    user_ids = [(row[0],) for row in cur.fetchall()]
+    if not user_ids:
+        return []
+
+    now = int(time.time())
+    cur.executemany(f"""
+        INSERT OR REPLACE INTO users_archive ({ARCHIVED_COLUMNS}, last_seen, archived_at)
+        SELECT {ARCHIVED_COLUMNS}, last_seen, ?
+        FROM users
+        WHERE user_id = ?
+    """, [(now, user_id) for (user_id,) in user_ids])
+    cur.executemany("""
+        INSERT OR REPLACE INTO items_archive (user_id, item_name, quantity)
+        SELECT user_id, item_name, quantity FROM items WHERE user_id = ?
+    """, user_ids)
+    cur.executemany("""
+        INSERT OR REPLACE INTO user_succubus_archive (user_id, succubus_id, acquired_date, xp, level)
+        SELECT user_id, succubus_id, acquired_date, xp, level FROM user_succubus WHERE user_id = ?
+    """, user_ids)
+    cur.executemany("DELETE FROM items WHERE user_id = ?", user_ids)
+    cur.executemany("DELETE FROM user_succubus WHERE user_id = ?", user_ids)
+    cur.executemany("DELETE FROM users WHERE user_id = ?", user_ids)
+    return [str(user_id) for (user_id,) in user_ids]
+
+def is_archived(cur: sqlite3.Cursor, user_id: str) -> bool:
+    cur.execute("SELECT 1 FROM users_archive WHERE user_id = ?", (user_id,))
+    return cur.fetchone() is not None
+
+def archived_among(cur: sqlite3.Cursor, user_ids: List[str], batch_size: int = 500) -> List[str]:
+    """The users among `user_ids` that are archived, looked up `batch_size` at a time."""
+    found = []
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start:start + batch_size]
+        cur.execute(f"SELECT user_id FROM users_archive WHERE user_id IN ({', '.join('?' * len(chunk))})", chunk)
+        found.extend(str(row[0]) for row in cur.fetchall())
+    return found
+
+def restore(cur: sqlite3.Cursor, user_id: str) -> bool:
+    """
+    Move an archived user back into the live tables, marked as seen now.
+    Runs inside the caller's write transaction.
+
+    Returns:
+        bool: True if the user was archived and their archived rows are live again.
+    """
+    # A live row wins over an archived one; that only happens if a backend without archiving created the user again
+    cur.execute(f"""
+        INSERT OR IGNORE INTO users ({ARCHIVED_COLUMNS}, last_seen)
+        SELECT {ARCHIVED_COLUMNS}, ?
+        FROM users_archive
+        WHERE user_id = ?
+    """, (int(time.time()), user_id))
+    if not cur.rowcount:
+        # The archived rows are stale then: drop them, or JournaledBackend._load would read them over the live ones
+        cur.execute("DELETE FROM users_archive WHERE user_id = ?", (user_id,))
+        if cur.rowcount:
+            cur.execute("DELETE FROM items_archive WHERE user_id = ?", (user_id,))
+            cur.execute("DELETE FROM user_succubus_archive WHERE user_id = ?", (user_id,))
+        return False
+
+    cur.execute("""
+        INSERT OR IGNORE INTO items (user_id, item_name, quantity)
+        SELECT user_id, item_name, quantity FROM items_archive WHERE user_id = ?
+    """, (user_id,))
+    cur.execute("""
+        INSERT OR IGNORE INTO user_succubus (user_id, succubus_id, acquired_date, xp, level)
+        SELECT user_id, succubus_id, acquired_date, xp, level FROM user_succubus_archive WHERE user_id = ?
+    """, (user_id,))
+    cur.execute("DELETE FROM items_archive WHERE user_id = ?", (user_id,))
+    cur.execute("DELETE FROM user_succubus_archive WHERE user_id = ?", (user_id,))
+    cur.execute("DELETE FROM users_archive WHERE user_id = ?", (user_id,))
+    return True
@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+class _IdArray:
+    """A list of ids with O(1) add, remove and uniform random pick."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.positions
+
+    def add(self, user_id: str):
+        if user_id not in self.positions:
+            self.positions[user_id] = len(self.ids)
+            self.ids.append(user_id)
+
+    def remove(self, user_id: str):
+        position = self.positions.pop(user_id, None)
+        if position is None:
+            return
+        # Move the last id into the hole so the list stays dense
+        last = self.ids.pop()
+        if position < len(self.ids):
+            self.ids[position] = last
+            self.positions[last] = position
+
+    def pick(self, exclude: Optional[str] = None) -> Optional[str]:
+        """Uniform random id other than `exclude`."""
+        count = len(self.ids)
+        if exclude in self.positions:
+            if count < 2:
+                return None
+            # Draw from the other count - 1 slots: the excluded slot maps to the last one
+            position = random.randrange(count - 1)
+            if position == self.positions[exclude]:
+                position = count - 1
+            return self.ids[position]
+        return self.ids[random.randrange(count)] if count else None
+
+class UserSampler:
+    """
+    Uniform random user selection in constant time.
+
+    Keeps every user id in an `_IdArray`, loaded once on first use and kept
+    current by `add()` after each committed user insert. Users touched since
+    startup are also tracked in a second array, so the draw can be limited
+    to recently seen users.
+    """
+
+    def __init__(self, load_ids: Callable[[], List[str]]):
+        self.load_ids = load_ids
+        self.lock = threading.Lock()
+        self._all: Optional[_IdArray] = None
+        self._recent = _IdArray()
+        self._last_seen: Dict[str, float] = {}
+
+    def _loaded(self) -> _IdArray:
+        """Caller holds the lock."""
+        if self._all is None:
+            users = _IdArray()
+            for user_id in self.load_ids():
+                users.add(user_id)
+            self._all = users
+        return self._all
+
+    def add(self, user_id: str):
+        """Record a user that exists in the database and was just seen."""
+        with self.lock:
+            if self._all is not None:
+                self._all.add(user_id)
+            self._recent.add(user_id)
+            self._last_seen[user_id] = time.monotonic()
+
+    def remove(self, user_id: str):
+        with self.lock:
+            if self._all is not None:
+                self._all.remove(user_id)
+            self._recent.remove(user_id)
+            self._last_seen.pop(user_id, None)
+
+    def reset(self):
+        """Forget everything; the ids are reloaded on the next sample."""
+        with self.lock:
+            self._all = None
+            self._recent = _IdArray()
+            self._last_seen.clear()
+
+    def sample(self, exclude: Optional[str] = None, seen_within: Optional[float] = None) -> Optional[str]:
+        """
+        Pick a uniformly random user.
+
+        Args:
+            exclude (Optional[str]): A user that must not be picked, e.g. the caller.
+            seen_within (Optional[float]): Only pick users seen in the last `seen_within` seconds.
+
+        Returns:
+            Optional[str]: A user ID, or None if there is no eligible user.
+        """
+        with self.lock:
+            if seen_within is None:
+                return self._loaded().pick(exclude)
+
+            cutoff = time.monotonic() - seen_within
+            while True:
+                user_id = self._recent.pick(exclude)
+                if user_id is None or self._last_seen[user_id] >= cutoff:
+                    return user_id
+                # Stale entries are dropped as they are drawn, so each costs O(1) once
+                self._recent.remove(user_id)
+                del self._last_seen[user_id]
@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from .rows import UserRow
+
+# Marks a field that has not been loaded from the database yet
+MISSING = object()
+
+class _Entry:
+    __slots__ = ('user', 'items', 'expires')
+
+    def __init__(self):
+        self.user = MISSING
+        self.items = MISSING
+        self.expires = 0.0
+
+class UserStateCache:
+    """
+    Bounded per-user cache for the `users` row and the user's items.
+
+    Entries live in a segmented LRU: new users start in a probation segment
+    and move to a protected segment once they are hit again, so a burst of
+    one-off users can never push the regular players out. Entries older than
+    `ttl` seconds are reloaded on the next access but keep their slot.
+
+    Readers call `begin()` before querying the database and pass the token
+    to `fill_*()`. Any write to the same user in between voids the token, so
+    a slow read can never overwrite newer data. Writers that apply deltas
+    after a commit bracket it with `begin_write()` / `end_write()`, so a read
+    of the committed data can't be filled and then have the delta added again.
+    """
+
+    def __init__(self, max_users: int = 1024, ttl: float = 300, protected_ratio: float = 0.8):
+        self.max_users = max(2, max_users)
+        self.max_protected = max(1, int(self.max_users * protected_ratio))
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._probation: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._protected: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, object] = {}
+        self._writing: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, user_id: str) -> Optional[_Entry]:
+        """Find an entry and record the access. Caller holds the lock."""
+        entry = self._protected.get(user_id)
+        if entry is not None:
+            self._protected.move_to_end(user_id)
+            return entry
+        entry = self._probation.pop(user_id, None)
+        if entry is not None:
+            # Second access: promote to the protected segment
+            self._protected[user_id] = entry
+            if len(self._protected) > self.max_protected:
+                demoted_id, demoted = self._protected.popitem(last=False)
+                self._probation[demoted_id] = demoted
+        return entry
+
+    def _get(self, user_id: str, field: str) -> Tuple[bool, Any]:
+        with self.lock:
+            entry = self._lookup(user_id)
+            if entry is not None and entry.expires > time.monotonic():
+                value = getattr(entry, field)
+                if value is not MISSING:
+                    self.hits += 1
+                    return True, value
+            self.misses += 1
+            return False, None
+
+    def get_user(self, user_id: str) -> Tuple[bool, Optional[UserRow]]:
+        """Return (hit, row). A hit with row None means the user does not exist."""
+        hit, user = self._get(user_id, 'user')
+        return hit, user.copy() if user else None
+
+    def get_items(self, user_id: str) -> Tuple[bool, Optional[Dict[str, int]]]:
+        hit, items = self._get(user_id, 'items')
+        return hit, dict(items) if hit else None
+
+    def begin(self, user_id: str) -> object:
+        token = object()
+        with self.lock:
+            self._inflight[user_id] = token
+        return token
+
+    def _fill(self, user_id: str, token: object, field: str, value: Any):
+        with self.lock:
+            if self._inflight.get(user_id) is not token or user_id in self._writing:
+                return
+            del self._inflight[user_id]
+            entry = self._protected.get(user_id) or self._probation.get(user_id)
+            if entry is None:
+                entry = _Entry()
+                self._probation[user_id] = entry
+                self._evict()
+            elif entry.expires <= time.monotonic():
+                # Stale entry: drop the other field so it gets reloaded too
+                entry.user = entry.items = MISSING
+            setattr(entry, field, value)
+            entry.expires = time.monotonic() + self.ttl
+
+    def fill_user(self, user_id: str, token: object, user: Optional[UserRow]):
+        self._fill(user_id, token, 'user', user.copy() if user else None)
+
+    def fill_items(self, user_id: str, token: object, items: Dict[str, int]):
+        self._fill(user_id, token, 'items', dict(items))
+
+    def _evict(self):
+        while len(self._probation) + len(self._protected) > self.max_users:
+            segment = self._probation or self._protected
+            segment.popitem(last=False)
+            self.evictions += 1
+
+    def _entry_for_write(self, user_id: str) -> Optional[_Entry]:
+        """Void in-flight reads and return the cached entry, if any. Caller holds the lock."""
+        self._inflight.pop(user_id, None)
+        return self._protected.get(user_id) or self._probation.get(user_id)
+
+    def begin_write(self, user_id: str):
+        """Refuse fills for the user until `end_write()`; call before the write becomes visible."""
+        with self.lock:
+            self._inflight.pop(user_id, None)
+            self._writing[user_id] = self._writing.get(user_id, 0) + 1
+
+    def end_write(self, user_id: str):
+        with self.lock:
+            self._inflight.pop(user_id, None)
+            writers = self._writing.pop(user_id, 1) - 1
+            if writers:
+                self._writing[user_id] = writers
+
+    def update_user(self, user_id: str, **fields):
+        """Write-through: set columns on the cached row."""
+        with self.lock:
+            entry = self._entry_for_write(user_id)
+            if entry is None or entry.user is MISSING:
+                return
+            if entry.user is None:
+                # The row may exist now; reload it on the next read
+                entry.user = MISSING
+                return
+            for field, value in fields.items():
+                setattr(entry.user, field, value)
+
+    def add_to_user(self, user_id: str, **deltas):
+        """Write-through: add to numeric columns on the cached row."""
+        with self.lock:
+            entry = self._entry_for_write(user_id)
+            if entry is None or entry.user is MISSING or entry.user is None:
+                return
+            for field, delta in deltas.items():
+                setattr(entry.user, field, getattr(entry.user, field) + delta)
+
+    def add_item(self, user_id: str, item_name: str, quantity: int):
+        """Write-through: add to a cached item quantity, dropping it once it reaches zero."""
+        with self.lock:
+            entry = self._entry_for_write(user_id)
+            if entry is None or entry.items is MISSING:
+                return
+            if item_name not in entry.items:
+                # The stored quantity may be zero or negative; reload instead of guessing
+                entry.items = MISSING
+                return
+            new_quantity = entry.items[item_name] + quantity
+            if new_quantity > 0:
+                entry.items[item_name] = new_quantity
+            else:
+                entry.items.pop(item_name, None)
+
+    def invalidate(self, user_id: str):
+        with self.lock:
+            self._inflight.pop(user_id, None)
+            self._probation.pop(user_id, None)
+            self._protected.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self._inflight.clear()
+            self._probation.clear()
+            self._protected.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'probation': len(self._probation),
+                'protected': len(self._protected),
+                'max_users': self.max_users,
+            }
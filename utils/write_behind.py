@@ -0,0 +1,134 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from .coin_ledger import CoinReason, record_many as record_coins
+from . import user_archive
+
+class WriteBehindQueue:
+    """
+    Buffers high-frequency counter updates and commits them in groups.
+
+    Pending mutations are kept as per-row deltas, so repeated updates to the
+    same user or item coalesce into a single statement. A background writer
+    flushes everything in one transaction every `flush_interval_ms`, or
+    sooner once `flush_max_ops` mutations are waiting.
+
+    `lock` must be held by readers that combine a database read with the
+    pending deltas, so a flush cannot commit between the two.
+    """
+
+    def __init__(self, db, flush_interval_ms: int = 50, flush_max_ops: int = 256):
+        self.db = db
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_ops = flush_max_ops
+        self.lock = threading.RLock()
+        self.pending_users: Dict[str, List[int]] = {}  # user_id -> [faps, score, fapcoins]
+        self.pending_items: Dict[str, Dict[str, int]] = {}  # user_id -> {item_name: quantity}
+        self.pending_coins: Dict[Tuple[str, str], int] = {}  # (user_id, reason) -> fapcoins, for the ledger
+        self.pending_ops = 0
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name='fapbot-db-writer', daemon=True)
+        self._writer.start()
+
+    def add_user_delta(self, user_id: str, faps: int = 0, score: int = 0, fapcoins: int = 0,
+                       reason: str = CoinReason.OTHER):
+        with self.lock:
+            delta = self.pending_users.setdefault(user_id, [0, 0, 0])
+            delta[0] += faps
+            delta[1] += score
+            delta[2] += fapcoins
+            if fapcoins:
+                key = (user_id, reason)
+                self.pending_coins[key] = self.pending_coins.get(key, 0) + fapcoins
+            self._count_op()
+
+    def add_item_delta(self, user_id: str, item_name: str, quantity: int):
+        with self.lock:
+            items = self.pending_items.setdefault(user_id, {})
+            items[item_name] = items.get(item_name, 0) + quantity
+            self._count_op()
+
+    def user_delta(self, user_id: str) -> Optional[List[int]]:
+        return self.pending_users.get(user_id)
+
+    def item_deltas(self, user_id: str) -> Dict[str, int]:
+        return self.pending_items.get(user_id, {})
+
+    def has_pending(self, user_id: str) -> bool:
+        return user_id in self.pending_users or user_id in self.pending_items
+
+    def _count_op(self):
+        self.pending_ops += 1
+        if self.pending_ops >= self.flush_max_ops:
+            self._wakeup.set()
+
+    def flush(self):
+        """Commit every pending delta in a single transaction."""
+        with self.lock:
+            if not self.pending_ops:
+                return
+            user_rows = [(f, s, c, uid) for uid, (f, s, c) in self.pending_users.items()]
+            item_rows = [
+                (uid, item, qty, qty)
+                for uid, items in self.pending_items.items()
+                for item, qty in items.items()
+            ]
+            with self.db.connection() as (conn, cur):
+                try:
+                    cur.execute("BEGIN IMMEDIATE")
+                    # Deltas queued without a lookup (update_fapcoins, update_item_quantity) may be for an
+                    # archived user; bring them back so the deltas land on their rows
+                    pending = list(self.pending_users.keys() | self.pending_items.keys())
+                    restored = [uid for uid in user_archive.archived_among(cur, pending) if user_archive.restore(cur, uid)]
+                    cur.executemany("""
+                        UPDATE users
+                        SET faps = faps + ?, score = score + ?, fapcoins = fapcoins + ?
+                        WHERE user_id = ?
+                    """, user_rows)
+                    cur.executemany("""
+                        INSERT INTO items (user_id, item_name, quantity)
+                        VALUES (?, ?, ?)
+                        ON CONFLICT(user_id, item_name)
+                        DO UPDATE SET quantity = quantity + ?
+                    """, item_rows)
+                    # One ledger entry per user and reason for the whole flush window
+                    record_coins(cur, [(uid, amount, reason) for (uid, reason), amount in self.pending_coins.items()])
+                    # Swapped out while we still hold the write lock: a transaction can start as soon as
+                    # the commit releases it, and must not add these deltas to rows that already have them
+                    flushed = (self.pending_users, self.pending_items, self.pending_coins, self.pending_ops)
+                    self.pending_users, self.pending_items, self.pending_coins, self.pending_ops = {}, {}, {}, 0
+                    start = time.perf_counter()
+                    try:
+                        conn.commit()
+                    except Exception:
+                        # Put the deltas back so the next flush retries them; nothing was added
+                        # in between, adding takes the lock we hold
+                        self.pending_users, self.pending_items, self.pending_coins, self.pending_ops = flushed
+                        raise
+                except Exception:
+                    # Keep the deltas so the next flush retries them
+                    conn.rollback()
+                    raise
+            if self.db.stats.enabled:
+                self.db.stats.record_commit(time.perf_counter() - start, 'WriteBehindQueue.flush')
+            for uid in restored:
+                if self.db.cache:
+                    self.db.cache.invalidate(uid)
+                self.db.sampler.add(uid)
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing write-behind queue: {e}")
+
+    def close(self):
+        """Stop the writer and flush whatever is still pending."""
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join()
+        self.flush()